@@ -9,19 +9,67 @@ echo ===================================================
 echo  VAbitnetUI - BitNet 1.58-bit LLM
 echo ===================================================
 echo.
+REM Host CPU profile from bitnet_backend\setup_env.py (BITNET_PROFILE_THREADS etc.)
+if exist "bitnet_backend\cpu_profile.env" (
+    for /f "usebackq eol=# tokens=1,* delims==" %%A in ("bitnet_backend\cpu_profile.env") do set "%%A=%%B"
+)
+
+REM Read KEY=VALUE settings from .env (lines starting with # are comments)
+if exist ".env" (
+    for /f "usebackq eol=# tokens=1,* delims==" %%A in (".env") do set "%%A=%%B"
+)
+
+REM Model and port: BITNET_MODEL_PATH and BITNET_SERVER_PORT from .env
+REM The path is resolved here because the server starts from bitnet_backend
+if not defined BITNET_MODEL_PATH set "BITNET_MODEL_PATH=bitnet_backend\models\bitnet_b1_58-large\ggml-model-i2_s.gguf"
+for %%F in ("%BITNET_MODEL_PATH%") do set "SERVER_MODEL=%%~fF"
+if not defined BITNET_SERVER_PORT set BITNET_SERVER_PORT=8081
+
 echo Starting BitNet inference server...
 echo.
-echo Model: bitnet_b1_58-large (1.2GB, i2_s format)
-echo Port: 8081
+echo Model: %SERVER_MODEL%
+echo Port: %BITNET_SERVER_PORT%
 echo.
 echo Loading model (this takes 10-20 seconds)...
 echo.
 
+REM Threads: BITNET_THREADS from .env, else the CPU profile's performance cores, else 4
+set SERVER_THREADS=4
+if defined BITNET_PROFILE_THREADS set SERVER_THREADS=%BITNET_PROFILE_THREADS%
+if defined BITNET_THREADS if not "%BITNET_THREADS%"=="0" set SERVER_THREADS=%BITNET_THREADS%
+
+REM Context and prompt batching (see bitnet_backend\utils\sweep_launch.py --update-env)
+if not defined BITNET_CTX_SIZE set BITNET_CTX_SIZE=2048
+set BATCH_FLAGS=
+if defined BITNET_THREADS_BATCH set BATCH_FLAGS=-tb %BITNET_THREADS_BATCH%
+if defined BITNET_BATCH_SIZE set BATCH_FLAGS=%BATCH_FLAGS% -b %BITNET_BATCH_SIZE%
+if defined BITNET_UBATCH_SIZE set BATCH_FLAGS=%BATCH_FLAGS% -ub %BITNET_UBATCH_SIZE%
+
+REM KV cache storage type: f16 (default), q8_0 (~half the memory), q4_0 (~quarter)
+REM Quantized V cache needs flash attention, so -fa is added whenever V is not f16
+if not defined BITNET_CACHE_TYPE_K set BITNET_CACHE_TYPE_K=f16
+if not defined BITNET_CACHE_TYPE_V set BITNET_CACHE_TYPE_V=f16
+set CACHE_FLAGS=-ctk %BITNET_CACHE_TYPE_K% -ctv %BITNET_CACHE_TYPE_V%
+if /I not "%BITNET_CACHE_TYPE_V%"=="f16" set CACHE_FLAGS=%CACHE_FLAGS% -fa
+
+REM Speculative decoding with a small GGUF draft model (BITNET_DRAFT=model)
+REM The path is resolved here because the server starts from bitnet_backend
+set DRAFT_FLAGS=
+if not defined BITNET_DRAFT_TOKENS set BITNET_DRAFT_TOKENS=4
+if /I "%BITNET_DRAFT%"=="model" if defined BITNET_DRAFT_MODEL_PATH (
+    for %%F in ("%BITNET_DRAFT_MODEL_PATH%") do set "DRAFT_FLAGS=-md "%%~fF" --draft %BITNET_DRAFT_TOKENS%"
+)
+
+REM Parallel request slots (BITNET_PARALLEL); the -c context is shared between them
+set PARALLEL_FLAGS=
+if not defined BITNET_PARALLEL set BITNET_PARALLEL=1
+if not "%BITNET_PARALLEL%"=="1" set PARALLEL_FLAGS=-np %BITNET_PARALLEL% -cb
+
 cd bitnet_backend
 
 REM Start the server in background
 REM -n 256 limits output to 256 tokens (~200 words). Adjust higher/lower as needed.
-start /B "BitNet Server" build_mingw\bin\llama-server.exe -m models\bitnet_b1_58-large\ggml-model-i2_s.gguf --port 8081 --host 127.0.0.1 -c 2048 -n 256 -t 4
+start /B "BitNet Server" build_mingw\bin\llama-server.exe -m "%SERVER_MODEL%" --port %BITNET_SERVER_PORT% --host 127.0.0.1 -c %BITNET_CTX_SIZE% -n 256 -t %SERVER_THREADS% %BATCH_FLAGS% %CACHE_FLAGS% %DRAFT_FLAGS% %PARALLEL_FLAGS%
 
 REM Wait for server to load
 timeout /t 15 /nobreak >nul
@@ -31,20 +79,20 @@ echo ===================================================
 echo  Server Ready!
 echo ===================================================
 echo.
-echo Web UI: http://127.0.0.1:8081
+echo Web UI: http://127.0.0.1:%BITNET_SERVER_PORT%
 echo.
 echo Opening web browser...
 echo.
 
 REM Open browser to web UI
-start http://127.0.0.1:8081
+start http://127.0.0.1:%BITNET_SERVER_PORT%
 
 echo.
 echo ===================================================
 echo  Server is running in background
 echo ===================================================
 echo.
-echo - Chat via browser at http://127.0.0.1:8081
+echo - Chat via browser at http://127.0.0.1:%BITNET_SERVER_PORT%
 echo - Close this window to keep server running
 echo - Or press Ctrl+C to stop the server
 echo.
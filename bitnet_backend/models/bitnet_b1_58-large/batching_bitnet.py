@@ -0,0 +1,261 @@
+"""Continuous batching for the reference Bitnet model: per-sequence KV slots shared by one decode forward."""
+
+import time
+from dataclasses import dataclass, field
+from typing import Any, Callable, Dict, List, Optional, Tuple
+
+import torch
+
+from transformers.cache_utils import Cache
+
+from .generation_bitnet import GenerationStats, sample_next_token
+from .modeling_bitnet import BitnetForCausalLM
+
+
+class SlotKVCache(Cache):
+    """
+    A preallocated `[max_batch_size, num_kv_heads, max_cache_len, head_dim]` cache where every batch row is a slot
+    owned by one sequence, at its own position.
+
+    Before each forward the caller declares which slots take part and at which positions their tokens go
+    (`prepare`); `update` scatters the new states there and returns the participating rows truncated to the longest
+    live sequence. Slots are reused without clearing: entries past a sequence's position are hidden by its mask.
+    """
+
+    def __init__(
+        self,
+        config,
+        max_batch_size: int,
+        max_cache_len: int,
+        device=None,
+        dtype: torch.dtype = torch.float32,
+    ) -> None:
+        self.max_batch_size = max_batch_size
+        self.max_cache_len = max_cache_len
+        head_dim = config.hidden_size // config.num_attention_heads
+        num_kv_heads = getattr(config, "num_key_value_heads", None) or config.num_attention_heads
+        shape = (max_batch_size, num_kv_heads, max_cache_len, head_dim)
+        self.key_cache: List[torch.Tensor] = [
+            torch.zeros(shape, dtype=dtype, device=device) for _ in range(config.num_hidden_layers)
+        ]
+        self.value_cache: List[torch.Tensor] = [
+            torch.zeros(shape, dtype=dtype, device=device) for _ in range(config.num_hidden_layers)
+        ]
+        self._rows: Optional[torch.LongTensor] = None
+        self._positions: Optional[torch.LongTensor] = None
+        self._kv_len = 0
+
+    def prepare(self, rows: torch.LongTensor, positions: torch.LongTensor) -> None:
+        """Slots (`[batch]`) and cache positions (`[batch, q_len]`) of the next forward."""
+        self._rows = rows
+        self._positions = positions
+        self._kv_len = int(positions.max()) + 1
+
+    def update(
+        self,
+        key_states: torch.Tensor,
+        value_states: torch.Tensor,
+        layer_idx: int,
+        cache_kwargs: Optional[Dict[str, Any]] = None,
+    ) -> Tuple[torch.Tensor, torch.Tensor]:
+        k_out = self.key_cache[layer_idx]
+        v_out = self.value_cache[layer_idx]
+        # advanced indices around the head slice put `[batch, q_len]` first, hence the transpose
+        index = (self._rows[:, None], slice(None), self._positions)
+        k_out[index] = key_states.transpose(1, 2).to(k_out.dtype)
+        v_out[index] = value_states.transpose(1, 2).to(v_out.dtype)
+        return k_out[self._rows, :, : self._kv_len], v_out[self._rows, :, : self._kv_len]
+
+    def get_seq_length(self, layer_idx: Optional[int] = 0) -> int:
+        return self._kv_len
+
+    def get_max_length(self) -> Optional[int]:
+        return self.max_cache_len
+
+
+def slot_attention_mask(positions: torch.LongTensor, kv_len: int) -> torch.Tensor:
+    """
+    `[batch, 1, q_len, kv_len]` mask (1 = attend) letting each query see its own sequence's slot up to its position.
+    No padding is involved: rows of different lengths only differ in how much of the slot they unmask.
+    """
+    keys = torch.arange(kv_len, device=positions.device)
+    return (keys[None, None, :] <= positions[:, :, None])[:, None].long()
+
+
+@dataclass
+class BatchSequence:
+    """One request inside the scheduler. `generated` and `stats` fill in as it runs."""
+
+    request_id: Any
+    prompt: List[int]
+    max_new_tokens: int = 128
+    temperature: float = 0.0
+    top_k: int = 0
+    top_p: float = 1.0
+    eos_token_id: Optional[int] = None
+    on_token: Optional[Callable[[int], bool]] = None
+    generator: Optional[torch.Generator] = None
+
+    generated: List[int] = field(default_factory=list)
+    stats: GenerationStats = field(default_factory=GenerationStats)
+    slot: Optional[int] = None
+    finished: bool = False
+    cancelled: bool = False
+
+    @property
+    def position(self) -> int:
+        """Cache position of the last generated token, the next one fed to the model."""
+        return len(self.prompt) + len(self.generated) - 1
+
+    def emit(self, token: int) -> None:
+        """Record a sampled token and decide whether the sequence is done."""
+        self.generated.append(token)
+        if token == self.eos_token_id or (self.on_token is not None and self.on_token(token)):
+            self.finished = True
+        elif len(self.generated) >= self.max_new_tokens:
+            self.finished = True
+
+
+class ContinuousBatchingScheduler:
+    """
+    Runs several generation requests through one model, batching them at token granularity.
+
+    Each call to `step` first admits waiting requests into free KV slots (one prefill forward each), then decodes one
+    token for every running sequence in a single `[num_running, 1]` forward. Finished and cancelled sequences release
+    their slot at the end of the step, so a new request starts as soon as any slot frees up instead of waiting for
+    the whole batch.
+
+    The model must not carry a static cache (`BitnetCPUGenerator`); use a separate instance.
+    """
+
+    def __init__(self, model: BitnetForCausalLM, max_batch_size: int = 4, max_cache_len: Optional[int] = None):
+        if any(hasattr(layer.self_attn, "past_key_value") for layer in model.model.layers):
+            raise ValueError("model has a static cache attached; call `_reset_cache()` or use another instance")
+        self.model = model.eval()
+        self.config = model.config
+        self.max_batch_size = max_batch_size
+        self.max_cache_len = max_cache_len or self.config.max_position_embeddings
+        if self.max_cache_len > self.config.max_position_embeddings:
+            raise ValueError(
+                f"max_cache_len ({self.max_cache_len}) cannot exceed max_position_embeddings "
+                f"({self.config.max_position_embeddings})"
+            )
+
+        param = next(model.parameters())
+        self._cache = SlotKVCache(
+            self.config, max_batch_size, self.max_cache_len, device=param.device, dtype=param.dtype
+        )
+        self._device = param.device
+        self._free_slots = list(range(max_batch_size))
+        self._waiting: List[BatchSequence] = []
+        self._running: List[BatchSequence] = []
+
+    @property
+    def has_work(self) -> bool:
+        return bool(self._waiting or self._running)
+
+    @property
+    def num_running(self) -> int:
+        return len(self._running)
+
+    @property
+    def num_waiting(self) -> int:
+        return len(self._waiting)
+
+    def add_request(self, request_id: Any, input_ids: List[int], **kwargs) -> BatchSequence:
+        """
+        Queue a request. `kwargs` are the `BatchSequence` sampling fields (`max_new_tokens`, `temperature`, `top_k`,
+        `top_p`, `eos_token_id`, `on_token`, `generator`).
+        """
+        if len(input_ids) >= self.max_cache_len:
+            raise ValueError(f"prompt of {len(input_ids)} tokens does not fit the {self.max_cache_len}-token cache")
+        sequence = BatchSequence(request_id=request_id, prompt=list(input_ids), **kwargs)
+        sequence.max_new_tokens = min(sequence.max_new_tokens, self.max_cache_len - len(input_ids))
+        sequence.stats.prompt_tokens = len(input_ids)
+        self._waiting.append(sequence)
+        return sequence
+
+    def cancel(self, request_id: Any) -> bool:
+        """Stop a waiting or running request; its slot is freed by the next `step`."""
+        for sequence in self._waiting + self._running:
+            if sequence.request_id == request_id and not sequence.finished:
+                sequence.cancelled = sequence.finished = True
+                return True
+        return False
+
+    def _forward(self, input_ids: torch.LongTensor, rows: torch.LongTensor, positions: torch.LongTensor) -> torch.Tensor:
+        """Logits at the last position of every row. `input_ids`/`positions` are `[batch, q_len]`."""
+        self._cache.prepare(rows, positions)
+        logits = self.model(
+            input_ids,
+            attention_mask=slot_attention_mask(positions, self._cache.get_seq_length()),
+            position_ids=positions,
+            past_key_values=self._cache,
+            # with a 4D mask the model only needs `cache_position` to start at 0 to take the mask as is
+            cache_position=torch.arange(input_ids.shape[1], device=self._device),
+            use_cache=True,
+            return_dict=False,
+        )[0]
+        return logits[:, -1, :]
+
+    def _sample(self, sequence: BatchSequence, logits: torch.Tensor) -> int:
+        token = sample_next_token(
+            logits[None], sequence.temperature, sequence.top_k, sequence.top_p, sequence.generator
+        )
+        return int(token[0])
+
+    def _admit(self) -> None:
+        while self._waiting and self._free_slots:
+            sequence = self._waiting.pop(0)
+            sequence.slot = self._free_slots.pop(0)
+            start = time.perf_counter()
+            try:
+                logits = self._forward(
+                    torch.tensor([sequence.prompt], device=self._device),
+                    torch.tensor([sequence.slot], device=self._device),
+                    torch.arange(len(sequence.prompt), device=self._device)[None, :],
+                )
+            except Exception:
+                self._free_slots.append(sequence.slot)
+                raise
+            sequence.emit(self._sample(sequence, logits[0]))
+            sequence.stats.prefill_seconds = time.perf_counter() - start
+            self._running.append(sequence)
+
+    @torch.no_grad()
+    def step(self) -> List[BatchSequence]:
+        """Admit waiting requests, decode one token for every running one. Returns the sequences that finished."""
+        # requests cancelled before they got a slot
+        done = [sequence for sequence in self._waiting if sequence.cancelled]
+        self._waiting = [sequence for sequence in self._waiting if not sequence.cancelled]
+        self._admit()
+
+        active = [sequence for sequence in self._running if not sequence.finished]
+        if active:
+            start = time.perf_counter()
+            logits = self._forward(
+                torch.tensor([[sequence.generated[-1]] for sequence in active], device=self._device),
+                torch.tensor([sequence.slot for sequence in active], device=self._device),
+                torch.tensor([[sequence.position] for sequence in active], device=self._device),
+            )
+            for i, sequence in enumerate(active):
+                sequence.emit(self._sample(sequence, logits[i]))
+            elapsed = time.perf_counter() - start
+            for sequence in active:
+                sequence.stats.decode_seconds += elapsed
+
+        for sequence in self._running:
+            if sequence.finished:
+                sequence.stats.generated_tokens = len(sequence.generated)
+                self._free_slots.append(sequence.slot)
+                done.append(sequence)
+        self._running = [sequence for sequence in self._running if not sequence.finished]
+        return done
+
+    def run(self) -> Dict[Any, BatchSequence]:
+        """Step until every queued request has finished."""
+        finished = {}
+        while self.has_work:
+            for sequence in self.step():
+                finished[sequence.request_id] = sequence
+        return finished
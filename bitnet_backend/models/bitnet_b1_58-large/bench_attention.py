@@ -0,0 +1,92 @@
+import time
+import argparse
+import torch
+
+from transformers.cache_utils import StaticCache
+
+from .configuration_bitnet import BitnetConfig
+from .modeling_bitnet import BitnetForCausalLM
+
+torch.set_grad_enabled(False)
+
+parser = argparse.ArgumentParser()
+parser.add_argument('--config', default='config.json', type=str)
+parser.add_argument('--hf_path', default=None, type=str, help='load real weights instead of a random init')
+parser.add_argument('--layers', default=2, type=int, help='truncate the random-init model to this many layers')
+parser.add_argument('--prompt_len', default=256, type=int)
+parser.add_argument('--decode_steps', default=32, type=int)
+parser.add_argument('--threads', default=4, type=int)
+parser.add_argument('--atol', default=1e-3, type=float)
+
+
+def load_models(args):
+    if args.hf_path is not None:
+        eager = BitnetForCausalLM.from_pretrained(args.hf_path, attn_implementation="eager", torch_dtype=torch.float32)
+        sdpa = BitnetForCausalLM.from_pretrained(args.hf_path, attn_implementation="sdpa", torch_dtype=torch.float32)
+        return eager.eval(), sdpa.eval()
+
+    config = BitnetConfig.from_json_file(args.config)
+    config.num_hidden_layers = args.layers
+    torch.manual_seed(0)
+    eager = BitnetForCausalLM._from_config(config, attn_implementation="eager", torch_dtype=torch.float32)
+    sdpa = BitnetForCausalLM._from_config(config, attn_implementation="sdpa", torch_dtype=torch.float32)
+    sdpa.load_state_dict(eager.state_dict())
+    return eager.eval(), sdpa.eval()
+
+
+def run_dynamic(model, input_ids, decode_steps):
+    """Prefill then greedy decode with the default dynamic cache. Returns (logits per step, seconds)."""
+    start = time.perf_counter()
+    out = model(input_ids, use_cache=True)
+    logits = [out.logits[:, -1]]
+    past = out.past_key_values
+    for _ in range(decode_steps):
+        next_ids = logits[-1].argmax(-1, keepdim=True)
+        out = model(next_ids, past_key_values=past, use_cache=True)
+        past = out.past_key_values
+        logits.append(out.logits[:, -1])
+    return torch.stack(logits, dim=1), time.perf_counter() - start
+
+
+def run_static(model, input_ids, decode_steps):
+    """Same as `run_dynamic` but against a preallocated `StaticCache`."""
+    model._setup_cache(StaticCache, input_ids.shape[0], max_cache_len=model.config.max_position_embeddings)
+    try:
+        start = time.perf_counter()
+        cache_position = torch.arange(input_ids.shape[1])
+        out = model(input_ids, cache_position=cache_position, use_cache=False)
+        logits = [out.logits[:, -1]]
+        for step in range(decode_steps):
+            next_ids = logits[-1].argmax(-1, keepdim=True)
+            cache_position = torch.tensor([input_ids.shape[1] + step])
+            out = model(next_ids, cache_position=cache_position, use_cache=False)
+            logits.append(out.logits[:, -1])
+        return torch.stack(logits, dim=1), time.perf_counter() - start
+    finally:
+        model._reset_cache()
+
+
+def main(args):
+    torch.set_num_threads(args.threads)
+    eager, sdpa = load_models(args)
+    input_ids = torch.randint(0, eager.config.vocab_size - 2, (1, args.prompt_len))
+
+    ok = True
+    for name, runner in (("dynamic", run_dynamic), ("static", run_static)):
+        eager_logits, eager_s = runner(eager, input_ids, args.decode_steps)
+        sdpa_logits, sdpa_s = runner(sdpa, input_ids, args.decode_steps)
+        max_diff = (eager_logits - sdpa_logits).abs().max().item()
+        same_tokens = torch.equal(eager_logits.argmax(-1), sdpa_logits.argmax(-1))
+        ok = ok and max_diff <= args.atol and same_tokens
+        print(
+            f"[{name:7s}] max |eager - sdpa| = {max_diff:.2e}  greedy tokens match: {same_tokens}  "
+            f"eager {eager_s:.2f}s  sdpa {sdpa_s:.2f}s  ({eager_s / sdpa_s:.2f}x)"
+        )
+
+    print("PARITY OK" if ok else "PARITY FAILED")
+    return 0 if ok else 1
+
+
+if __name__ == '__main__':
+    args = parser.parse_args()
+    raise SystemExit(main(args))
@@ -0,0 +1,64 @@
+import time
+import argparse
+import torch
+
+from .batching_bitnet import ContinuousBatchingScheduler
+from .configuration_bitnet import BitnetConfig
+from .modeling_bitnet import BitnetForCausalLM
+
+torch.set_grad_enabled(False)
+
+parser = argparse.ArgumentParser()
+parser.add_argument('--config', default='config.json', type=str)
+parser.add_argument('--hf_path', default=None, type=str, help='load real weights instead of a random init')
+parser.add_argument('--layers', default=2, type=int, help='truncate the random-init model to this many layers')
+parser.add_argument('--requests', default=8, type=int)
+parser.add_argument('--batch_size', default=4, type=int)
+parser.add_argument('--min_prompt', default=32, type=int)
+parser.add_argument('--max_prompt', default=256, type=int)
+parser.add_argument('--max_new_tokens', default=32, type=int)
+parser.add_argument('--ctx_size', default=2048, type=int)
+parser.add_argument('--threads', default=4, type=int)
+
+
+def load(args):
+    if args.hf_path is not None:
+        return BitnetForCausalLM.from_pretrained(args.hf_path, attn_implementation="sdpa", torch_dtype=torch.float32).eval()
+    config = BitnetConfig.from_json_file(args.config)
+    config.num_hidden_layers = args.layers
+    torch.manual_seed(0)
+    return BitnetForCausalLM._from_config(config, attn_implementation="sdpa", torch_dtype=torch.float32).eval()
+
+
+def serve(model, prompts, batch_size, args):
+    """All prompts queued at once, greedy. Returns (outputs by request, seconds)."""
+    scheduler = ContinuousBatchingScheduler(model, max_batch_size=batch_size, max_cache_len=args.ctx_size)
+    # varied output lengths so requests leave the batch at different steps
+    for i, prompt in enumerate(prompts):
+        scheduler.add_request(i, prompt, max_new_tokens=args.max_new_tokens // 2 + i % (args.max_new_tokens // 2 + 1))
+    start = time.perf_counter()
+    finished = scheduler.run()
+    return {i: sequence.generated for i, sequence in finished.items()}, time.perf_counter() - start
+
+
+def main(args):
+    torch.set_num_threads(args.threads)
+    model = load(args)
+    lengths = torch.randint(args.min_prompt, args.max_prompt + 1, (args.requests,)).tolist()
+    prompts = [torch.randint(0, model.config.vocab_size - 2, (n,)).tolist() for n in lengths]
+
+    sequential, sequential_s = serve(model, prompts, 1, args)
+    batched, batched_s = serve(model, prompts, args.batch_size, args)
+
+    tokens = sum(len(out) for out in batched.values())
+    same = sum(sequential[i] == batched[i] for i in sequential)
+    print(f"{args.requests} requests, prompts {args.min_prompt}-{args.max_prompt} tokens, {tokens} tokens generated")
+    print(f"one at a time:      {tokens / sequential_s:7.2f} tok/s ({sequential_s:.2f}s)")
+    print(f"continuous batch {args.batch_size}: {tokens / batched_s:7.2f} tok/s ({batched_s:.2f}s, "
+          f"{sequential_s / batched_s:.2f}x)")
+    print(f"identical greedy outputs: {same}/{len(sequential)}")
+
+
+if __name__ == '__main__':
+    args = parser.parse_args()
+    main(args)
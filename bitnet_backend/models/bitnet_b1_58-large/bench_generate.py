@@ -0,0 +1,54 @@
+import time
+import argparse
+import torch
+
+from .generation_bitnet import BitnetCPUGenerator
+from .modeling_bitnet import BitnetForCausalLM
+from .tokenization_bitnet import BitnetTokenizer
+
+torch.set_grad_enabled(False)
+
+parser = argparse.ArgumentParser()
+parser.add_argument('--hf_path', default='1bitLLM/bitnet_b1_58-large', type=str)
+parser.add_argument('--prompt', default='The Department of Veterans Affairs provides', type=str)
+parser.add_argument('--max_new_tokens', default=64, type=int)
+parser.add_argument('--ctx_size', default=2048, type=int)
+parser.add_argument('--threads', default=4, type=int)
+parser.add_argument('--attn', default='sdpa', choices=['eager', 'sdpa'])
+parser.add_argument('--no_compile', action='store_true')
+
+
+def main(args):
+    torch.set_num_threads(args.threads)
+    model = BitnetForCausalLM.from_pretrained(
+        args.hf_path,
+        low_cpu_mem_usage=True,
+        attn_implementation=args.attn,
+        torch_dtype=torch.float32,
+    )
+    tokenizer = BitnetTokenizer.from_pretrained(args.hf_path, use_fast=False)
+    input_ids = tokenizer(args.prompt, return_tensors="pt").input_ids
+
+    # baseline: transformers generate with the dynamic cache
+    start = time.perf_counter()
+    baseline = model.generate(input_ids, max_new_tokens=args.max_new_tokens, do_sample=False, min_new_tokens=args.max_new_tokens)
+    baseline_s = time.perf_counter() - start
+    baseline_new = baseline.shape[1] - input_ids.shape[1]
+    print(f"dynamic cache generate: {baseline_new / baseline_s:6.2f} tok/s (prefill included)")
+
+    engine = BitnetCPUGenerator(model, max_cache_len=args.ctx_size, compile=not args.no_compile)
+    # first call captures the compiled decode graph
+    engine.generate(input_ids, max_new_tokens=4)
+    tokens, stats = engine.generate(input_ids, max_new_tokens=args.max_new_tokens)
+    engine.close()
+
+    total_s = stats.prefill_seconds + stats.decode_seconds
+    print(f"static cache engine:    {stats.generated_tokens / total_s:6.2f} tok/s (prefill included)")
+    print(f"  prefill {stats.prompt_tokens} tok @ {stats.prompt_tokens_per_second:.1f} tok/s, "
+          f"decode {stats.decoded_tokens} tok @ {stats.tokens_per_second:.2f} tok/s, compiled={engine.is_compiled}")
+    print(repr(tokenizer.decode(tokens)))
+
+
+if __name__ == '__main__':
+    args = parser.parse_args()
+    main(args)
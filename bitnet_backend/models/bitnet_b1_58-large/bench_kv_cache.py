@@ -0,0 +1,78 @@
+import math
+import argparse
+import torch
+
+from transformers.cache_utils import DynamicCache
+
+from .cache_bitnet import Int8KVCache
+from .configuration_bitnet import BitnetConfig
+from .modeling_bitnet import BitnetForCausalLM
+from .tokenization_bitnet import BitnetTokenizer
+
+torch.set_grad_enabled(False)
+
+parser = argparse.ArgumentParser()
+parser.add_argument('--config', default='config.json', type=str)
+parser.add_argument('--hf_path', default=None, type=str, help='load real weights instead of a random init')
+parser.add_argument('--layers', default=2, type=int, help='truncate the random-init model to this many layers')
+parser.add_argument('--text_file', default=None, type=str, help='text to score (random tokens if omitted)')
+parser.add_argument('--context', default=1024, type=int)
+parser.add_argument('--prefill', default=128, type=int, help='tokens prefilled at once before decoding one by one')
+parser.add_argument('--threads', default=4, type=int)
+
+
+def load(args):
+    if args.hf_path is not None:
+        model = BitnetForCausalLM.from_pretrained(args.hf_path, attn_implementation="sdpa", torch_dtype=torch.float32)
+        tokenizer = BitnetTokenizer.from_pretrained(args.hf_path, use_fast=False)
+        return model.eval(), tokenizer
+    config = BitnetConfig.from_json_file(args.config)
+    config.num_hidden_layers = args.layers
+    torch.manual_seed(0)
+    return BitnetForCausalLM._from_config(config, attn_implementation="sdpa", torch_dtype=torch.float32).eval(), None
+
+
+def score(model, input_ids, cache, prefill):
+    """Teacher-forced decode through `cache`. Returns (per-position logits, nll, cache)."""
+    out = model(input_ids[:, :prefill], past_key_values=cache, use_cache=True)
+    logits = [out.logits[0]]
+    cache = out.past_key_values
+    for pos in range(prefill, input_ids.shape[1]):
+        out = model(input_ids[:, pos:pos + 1], past_key_values=cache, use_cache=True)
+        cache = out.past_key_values
+        logits.append(out.logits[0])
+    logits = torch.cat(logits, dim=0)
+    nll = torch.nn.functional.cross_entropy(logits[:-1], input_ids[0, 1:], reduction="mean").item()
+    return logits, nll, cache
+
+
+def cache_bytes(cache):
+    if isinstance(cache, Int8KVCache):
+        return cache.memory_bytes()
+    return sum(t.numel() * t.element_size() for t in cache.key_cache + cache.value_cache)
+
+
+def main(args):
+    torch.set_num_threads(args.threads)
+    model, tokenizer = load(args)
+    if args.text_file and tokenizer is not None:
+        with open(args.text_file) as f:
+            input_ids = tokenizer(f.read(), return_tensors="pt").input_ids[:, :args.context]
+    else:
+        input_ids = torch.randint(0, model.config.vocab_size - 2, (1, args.context))
+
+    fp_logits, fp_nll, fp_cache = score(model, input_ids, DynamicCache(), args.prefill)
+    q_logits, q_nll, q_cache = score(model, input_ids, Int8KVCache(), args.prefill)
+
+    fp_bytes, q_bytes = cache_bytes(fp_cache), cache_bytes(q_cache)
+    agree = (fp_logits.argmax(-1) == q_logits.argmax(-1)).float().mean().item()
+    print(f"tokens={input_ids.shape[1]} layers={model.config.num_hidden_layers}")
+    print(f"KV cache  fp32: {fp_bytes / 2**20:8.1f} MiB   int8: {q_bytes / 2**20:8.1f} MiB   ({fp_bytes / q_bytes:.2f}x)")
+    print(f"max |logit diff|: {(fp_logits - q_logits).abs().max().item():.3e}")
+    print(f"argmax agreement: {agree * 100:.2f}%")
+    print(f"ppl fp32: {math.exp(fp_nll):.3f}   ppl int8: {math.exp(q_nll):.3f}")
+
+
+if __name__ == '__main__':
+    args = parser.parse_args()
+    main(args)
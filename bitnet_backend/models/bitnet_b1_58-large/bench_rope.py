@@ -0,0 +1,65 @@
+import time
+import argparse
+import torch
+
+from .configuration_bitnet import BitnetConfig
+from .modeling_bitnet import BitnetRotaryEmbedding
+
+torch.set_grad_enabled(False)
+
+parser = argparse.ArgumentParser()
+parser.add_argument('--config', default='config.json', type=str)
+parser.add_argument('--context', default=1024, type=int, help='decode position to benchmark at')
+parser.add_argument('--steps', default=2000, type=int)
+parser.add_argument('--threads', default=4, type=int)
+
+
+def recompute_rope(inv_freq, x, position_ids):
+    """Per-layer rotary computation used before the shared table (outer product + cat + cos/sin)."""
+    inv_freq_expanded = inv_freq[None, :, None].float().expand(position_ids.shape[0], -1, 1)
+    position_ids_expanded = position_ids[:, None, :].float()
+    freqs = (inv_freq_expanded @ position_ids_expanded).transpose(1, 2)
+    emb = torch.cat((freqs, freqs), dim=-1)
+    return emb.cos().to(dtype=x.dtype), emb.sin().to(dtype=x.dtype)
+
+
+def time_per_token(fn, steps):
+    for _ in range(10):
+        fn()
+    start = time.perf_counter()
+    for _ in range(steps):
+        fn()
+    return (time.perf_counter() - start) / steps
+
+
+def main(args):
+    torch.set_num_threads(args.threads)
+    config = BitnetConfig.from_json_file(args.config)
+    head_dim = config.hidden_size // config.num_attention_heads
+    num_layers = config.num_hidden_layers
+
+    rope = BitnetRotaryEmbedding(head_dim, config.max_position_embeddings, base=config.rope_theta)
+    x = torch.empty(1, config.num_key_value_heads, 1, head_dim)
+    position_ids = torch.tensor([[args.context]])
+
+    def before():
+        # every layer owned a rotary module and recomputed cos/sin
+        for _ in range(num_layers):
+            recompute_rope(rope.inv_freq, x, position_ids)
+
+    def after():
+        # one gather per forward, shared by all layers
+        rope(x, position_ids)
+
+    t_before = time_per_token(before, args.steps)
+    t_after = time_per_token(after, args.steps)
+
+    print(f"layers={num_layers} head_dim={head_dim} position={args.context} threads={args.threads}")
+    print(f"per-layer recompute: {t_before * 1e6:8.1f} us/token")
+    print(f"shared table gather: {t_after * 1e6:8.1f} us/token")
+    print(f"saved:               {(t_before - t_after) * 1e6:8.1f} us/token ({t_before / t_after:.1f}x)")
+
+
+if __name__ == '__main__':
+    args = parser.parse_args()
+    main(args)
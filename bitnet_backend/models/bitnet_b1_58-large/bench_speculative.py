@@ -0,0 +1,66 @@
+import argparse
+import torch
+
+from .generation_bitnet import BitnetCPUGenerator
+from .modeling_bitnet import BitnetForCausalLM
+from .speculative_bitnet import LayerSkipDrafter, PromptLookupDrafter
+from .tokenization_bitnet import BitnetTokenizer
+
+torch.set_grad_enabled(False)
+
+DEFAULT_PROMPT = (
+    "Transcript: patient reports mild headache since Monday, no fever, taking ibuprofen twice a day. "
+    "Follow up in two weeks if the headache persists.\n"
+    "Note: patient reports mild headache since Monday, no fever,"
+)
+
+parser = argparse.ArgumentParser()
+parser.add_argument('--hf_path', default='1bitLLM/bitnet_b1_58-large', type=str)
+parser.add_argument('--prompt', default=DEFAULT_PROMPT, type=str)
+parser.add_argument('--max_new_tokens', default=64, type=int)
+parser.add_argument('--ctx_size', default=2048, type=int)
+parser.add_argument('--threads', default=4, type=int)
+parser.add_argument('--num_draft_tokens', default=4, type=int)
+parser.add_argument('--draft_layers', default=4, type=int, help='decoder layers kept by the layer-skip drafter')
+parser.add_argument('--no_compile', action='store_true')
+
+
+def run(engine, input_ids, args, drafter=None):
+    # first call captures the compiled decode graph
+    engine.generate(input_ids, max_new_tokens=4, drafter=drafter)
+    return engine.generate(
+        input_ids, max_new_tokens=args.max_new_tokens, drafter=drafter, num_draft_tokens=args.num_draft_tokens
+    )
+
+
+def main(args):
+    torch.set_num_threads(args.threads)
+    model = BitnetForCausalLM.from_pretrained(
+        args.hf_path,
+        low_cpu_mem_usage=True,
+        attn_implementation="sdpa",
+        torch_dtype=torch.float32,
+    )
+    tokenizer = BitnetTokenizer.from_pretrained(args.hf_path, use_fast=False)
+    input_ids = tokenizer(args.prompt, return_tensors="pt").input_ids
+
+    engine = BitnetCPUGenerator(model, max_cache_len=args.ctx_size, compile=not args.no_compile)
+    layer_skip = LayerSkipDrafter(model, args.draft_layers, max_cache_len=args.ctx_size, compile=not args.no_compile)
+    baseline, base_stats = run(engine, input_ids, args)
+    print(f"{'no draft':>16}: {base_stats.tokens_per_second:6.2f} tok/s")
+
+    for name, drafter in (("prompt lookup", PromptLookupDrafter()), (f"layer-skip {args.draft_layers}", layer_skip)):
+        tokens, stats = run(engine, input_ids, args, drafter)
+        # greedy speculative decoding must reproduce the plain greedy output
+        print(f"{name:>16}: {stats.tokens_per_second:6.2f} tok/s ({stats.tokens_per_second / base_stats.tokens_per_second:.2f}x), "
+              f"accepted {stats.accepted_tokens}/{stats.draft_tokens} ({stats.acceptance_rate * 100:.1f}%), "
+              f"same output: {tokens == baseline}")
+
+    layer_skip.close()
+    engine.close()
+    print(repr(tokenizer.decode(baseline)))
+
+
+if __name__ == '__main__':
+    args = parser.parse_args()
+    main(args)
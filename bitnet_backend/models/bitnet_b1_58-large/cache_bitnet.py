@@ -0,0 +1,112 @@
+"""Int8 KV cache for long-context CPU decoding with the reference Bitnet model."""
+
+from typing import Any, Dict, List, Optional, Tuple
+
+import torch
+
+from transformers.cache_utils import Cache
+
+
+def quantize_int8(states: torch.Tensor) -> Tuple[torch.Tensor, torch.Tensor]:
+    """
+    Symmetric absmax int8 quantization with one scale per head and token.
+
+    `states` is `[batch, num_heads, seq_len, head_dim]`; returns the int8 tensor of the same shape and fp32 scales of
+    shape `[batch, num_heads, seq_len, 1]` (same absmax rule as `utils_quant.activation_quant`).
+    """
+    states = states.float()
+    scales = states.abs().amax(dim=-1, keepdim=True).clamp(min=1e-5) / 127
+    quantized = (states / scales).round().clamp(-127, 127).to(torch.int8)
+    return quantized, scales
+
+
+def dequantize_int8(quantized: torch.Tensor, scales: torch.Tensor, dtype: torch.dtype) -> torch.Tensor:
+    return (quantized.float() * scales).to(dtype)
+
+
+class Int8KVCache(Cache):
+    """
+    A cache that stores key and value states in int8 with per-head/per-token fp32 scales and dequantizes them when
+    attention reads the cache.
+
+    Memory per cached token and layer is `2 * num_kv_heads * (head_dim + 4)` bytes instead of
+    `2 * num_kv_heads * head_dim * sizeof(dtype)`, i.e. ~1.9x smaller than fp16 and ~3.8x smaller than fp32 for
+    head_dim=96. It grows like `DynamicCache`; pass an instance as `past_key_values` (e.g. to `generate`).
+    """
+
+    def __init__(self) -> None:
+        self.key_cache: List[torch.Tensor] = []
+        self.key_scales: List[torch.Tensor] = []
+        self.value_cache: List[torch.Tensor] = []
+        self.value_scales: List[torch.Tensor] = []
+        self._seen_tokens = 0
+
+    def __len__(self):
+        return len(self.key_cache)
+
+    @property
+    def seen_tokens(self):
+        return self._seen_tokens
+
+    def update(
+        self,
+        key_states: torch.Tensor,
+        value_states: torch.Tensor,
+        layer_idx: int,
+        cache_kwargs: Optional[Dict[str, Any]] = None,
+    ) -> Tuple[torch.Tensor, torch.Tensor]:
+        """
+        Quantizes and appends the new `key_states`/`value_states` for `layer_idx`, then returns the full dequantized
+        key and value states in the dtype of the inputs.
+        """
+        if layer_idx == 0:
+            self._seen_tokens += key_states.shape[-2]
+
+        q_key, key_scale = quantize_int8(key_states)
+        q_value, value_scale = quantize_int8(value_states)
+
+        if len(self.key_cache) <= layer_idx:
+            self.key_cache.append(q_key)
+            self.key_scales.append(key_scale)
+            self.value_cache.append(q_value)
+            self.value_scales.append(value_scale)
+        else:
+            self.key_cache[layer_idx] = torch.cat([self.key_cache[layer_idx], q_key], dim=-2)
+            self.key_scales[layer_idx] = torch.cat([self.key_scales[layer_idx], key_scale], dim=-2)
+            self.value_cache[layer_idx] = torch.cat([self.value_cache[layer_idx], q_value], dim=-2)
+            self.value_scales[layer_idx] = torch.cat([self.value_scales[layer_idx], value_scale], dim=-2)
+
+        return (
+            dequantize_int8(self.key_cache[layer_idx], self.key_scales[layer_idx], key_states.dtype),
+            dequantize_int8(self.value_cache[layer_idx], self.value_scales[layer_idx], value_states.dtype),
+        )
+
+    def get_seq_length(self, layer_idx: Optional[int] = 0) -> int:
+        if len(self.key_cache) <= layer_idx:
+            return 0
+        return self.key_cache[layer_idx].shape[-2]
+
+    def get_max_length(self) -> Optional[int]:
+        return None
+
+    def reorder_cache(self, beam_idx: torch.LongTensor):
+        """Reorders the cache for beam search, given the selected beam indices."""
+        for layer_idx in range(len(self.key_cache)):
+            for buffers in (self.key_cache, self.key_scales, self.value_cache, self.value_scales):
+                device = buffers[layer_idx].device
+                buffers[layer_idx] = buffers[layer_idx].index_select(0, beam_idx.to(device))
+
+    def to_legacy_cache(self) -> Tuple[Tuple[torch.Tensor, torch.Tensor], ...]:
+        """Dequantized fp32 tuples, for code that only understands the legacy format."""
+        return tuple(
+            (
+                dequantize_int8(self.key_cache[i], self.key_scales[i], torch.float32),
+                dequantize_int8(self.value_cache[i], self.value_scales[i], torch.float32),
+            )
+            for i in range(len(self))
+        )
+
+    def memory_bytes(self) -> int:
+        """Bytes held by the quantized states and their scales."""
+        buffers = self.key_cache + self.key_scales + self.value_cache + self.value_scales
+        return sum(t.numel() * t.element_size() for t in buffers)
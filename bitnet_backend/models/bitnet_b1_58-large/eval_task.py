@@ -19,17 +19,29 @@ parser.add_argument("--tasks", type=str)
 parser.add_argument("--output_path", default=None, type=str)
 parser.add_argument('--num_fewshot', type=int, default=0)
 parser.add_argument('--ctx_size', default=2048, type=int)
+parser.add_argument('--cpu', action='store_true', help='fp32 + SDPA on CPU instead of fp16 + flash attention on GPU')
+parser.add_argument('--threads', default=None, type=int, help='torch threads with --cpu')
 
 
 def main(args):
     model_str = args.hf_path
-    model = BitnetForCausalLM.from_pretrained(
-        args.hf_path,
-        device_map='auto',
-        low_cpu_mem_usage=True, 
-        use_flash_attention_2=True,
-        torch_dtype=torch.float16,
-    ).half()
+    if args.cpu:
+        if args.threads:
+            torch.set_num_threads(args.threads)
+        model = BitnetForCausalLM.from_pretrained(
+            args.hf_path,
+            low_cpu_mem_usage=True,
+            attn_implementation="sdpa",
+            torch_dtype=torch.float32,
+        )
+    else:
+        model = BitnetForCausalLM.from_pretrained(
+            args.hf_path,
+            device_map='auto',
+            low_cpu_mem_usage=True, 
+            use_flash_attention_2=True,
+            torch_dtype=torch.float16,
+        ).half()
 
     tokenizer = BitnetTokenizer.from_pretrained(args.hf_path, use_fast=False)
     glog.info('loaded model!')
@@ -3,8 +3,10 @@ import torch
 import numpy as np
 import torch.nn.functional as F
 
+from collections import defaultdict
 from lm_eval.base import BaseLM
 from datasets import load_dataset
+from tqdm import tqdm
 
 
 def set_seed(seed):
@@ -115,6 +117,103 @@ class LMEvalAdaptor(BaseLM):
 
         return self._loglikelihood_tokens(new_reqs)
 
+    def _loglikelihood_tokens(self, requests, disable_tqdm=False):
+        """
+        requests: list of ((context, continuation), context_enc, continuation_enc)
+
+        Requests that share a context (multiple-choice tasks) run the context once and score every continuation
+        from its cached KV state. The rest are sorted by length and run in right-padded batches of `batch_size`
+        (right padding needs no attention mask: real tokens never attend to later positions).
+
+        returns: list of (sum of continuation logprobs, whether the continuation is the greedy one), in request order
+        """
+        by_context = defaultdict(list)
+        singles = []
+        for i, (_, context_enc, continuation_enc) in enumerate(requests):
+            # a context that has to be truncated, or is a lone EOT, has no reusable prefix
+            if len(context_enc) < 2 or len(context_enc) + len(continuation_enc) > self.max_length + 1:
+                singles.append(i)
+            else:
+                by_context[tuple(context_enc)].append(i)
+
+        shared = []
+        for context_enc, indices in by_context.items():
+            if len(indices) > 1:
+                shared.append((list(context_enc), indices))
+            else:
+                singles.extend(indices)
+        # longest first, so similar lengths share a batch and an OOM shows up on the first one
+        singles.sort(key=lambda i: -(len(requests[i][1]) + len(requests[i][2])))
+
+        results = [None] * len(requests)
+        with torch.no_grad():
+            for context_enc, indices in tqdm(shared, disable=disable_tqdm):
+                answers = self._score_shared_context(context_enc, [requests[i][2] for i in indices])
+                for i, answer in zip(indices, answers):
+                    results[i] = answer
+
+            for start in tqdm(range(0, len(singles), self.batch_size), disable=disable_tqdm):
+                indices = singles[start:start + self.batch_size]
+                answers = self._score_batch([(requests[i][1], requests[i][2]) for i in indices])
+                for i, answer in zip(indices, answers):
+                    results[i] = answer
+
+        for (cache_key, _, _), answer in zip(requests, results):
+            if cache_key is not None:
+                self.cache_hook.add_partial("loglikelihood", cache_key, answer)
+        return results
+
+    @property
+    def _model_device(self):
+        return next(self.model.parameters()).device
+
+    @staticmethod
+    def _continuation_score(logits, continuation_enc):
+        """logits: [len(continuation), vocab] predicting each continuation token."""
+        logprobs = F.log_softmax(logits.float(), dim=-1)
+        target = torch.tensor(continuation_enc, device=logits.device)
+        is_greedy = bool((logprobs.argmax(dim=-1) == target).all())
+        return float(logprobs.gather(-1, target[:, None]).sum()), is_greedy
+
+    def _score_shared_context(self, context_enc, continuations):
+        """All continuations of one context, from a single forward over the context."""
+        device = self._model_device
+        # the last context token is fed with each continuation: its logits predict the first continuation token
+        past = self.model(torch.tensor([context_enc[:-1]], device=device), use_cache=True).past_key_values
+
+        answers = []
+        for start in range(0, len(continuations), self.batch_size):
+            chunk = continuations[start:start + self.batch_size]
+            width = max(len(continuation_enc) for continuation_enc in chunk)
+            inps = [
+                [context_enc[-1]] + continuation_enc[:-1] + [self.eot_token_id] * (width - len(continuation_enc))
+                for continuation_enc in chunk
+            ]
+            chunk_past = tuple(
+                tuple(state.expand(len(chunk), -1, -1, -1) for state in layer_past) for layer_past in past
+            )
+            logits = self.model(torch.tensor(inps, device=device), past_key_values=chunk_past, use_cache=True)[0]
+            for row, continuation_enc in enumerate(chunk):
+                answers.append(self._continuation_score(logits[row, :len(continuation_enc)], continuation_enc))
+        return answers
+
+    def _score_batch(self, pairs):
+        """Independent (context_enc, continuation_enc) pairs in one right-padded forward."""
+        inps = []
+        for context_enc, continuation_enc in pairs:
+            # same left truncation as lm-eval
+            inps.append((context_enc + continuation_enc)[-(self.max_length + 1):][:-1])
+        width = max(len(inp) for inp in inps)
+        padded = [inp + [self.eot_token_id] * (width - len(inp)) for inp in inps]
+        logits = self._model_call(torch.tensor(padded, device=self._model_device))
+
+        answers = []
+        for row, (inp, (_, continuation_enc)) in enumerate(zip(inps, pairs)):
+            answers.append(self._continuation_score(
+                logits[row, len(inp) - len(continuation_enc):len(inp)], continuation_enc
+            ))
+        return answers
+
     def _model_call(self, inps):
         """
         inps: a torch tensor of shape [batch, sequence]
@@ -0,0 +1,297 @@
+"""CPU generation engine for the reference Bitnet model: static KV cache + compiled single-token decode."""
+
+import time
+from dataclasses import dataclass
+from typing import TYPE_CHECKING, Callable, List, Optional
+
+import torch
+
+from transformers.cache_utils import StaticCache
+from transformers.utils import logging
+
+from .modeling_bitnet import BitnetForCausalLM
+
+
+if TYPE_CHECKING:
+    from .speculative_bitnet import Drafter
+
+logger = logging.get_logger(__name__)
+
+
+@dataclass
+class GenerationStats:
+    """
+    Timings of one `BitnetCPUGenerator.generate` call.
+
+    The first generated token is sampled from the prefill logits and timed in `prefill_seconds`; decode rates count
+    only the `decoded_tokens` produced by the decode steps that `decode_seconds` measures.
+    """
+
+    prompt_tokens: int = 0
+    generated_tokens: int = 0
+    prefill_seconds: float = 0.0
+    decode_seconds: float = 0.0
+    draft_tokens: int = 0
+    accepted_tokens: int = 0
+
+    @property
+    def acceptance_rate(self) -> float:
+        """Fraction of drafted tokens the target model accepted (0 without speculation)."""
+        return self.accepted_tokens / self.draft_tokens if self.draft_tokens > 0 else 0.0
+
+    @property
+    def prompt_tokens_per_second(self) -> float:
+        return self.prompt_tokens / self.prefill_seconds if self.prefill_seconds > 0 else 0.0
+
+    @property
+    def decoded_tokens(self) -> int:
+        """Generated tokens minus the one that came out of the prefill forward."""
+        return max(self.generated_tokens - 1, 0)
+
+    @property
+    def tokens_per_second(self) -> float:
+        return self.decoded_tokens / self.decode_seconds if self.decode_seconds > 0 else 0.0
+
+    def to_timings(self) -> dict:
+        """Same keys as llama-server's `timings` object so callers can treat both backends alike."""
+        timings = {
+            "prompt_n": self.prompt_tokens,
+            "prompt_ms": self.prefill_seconds * 1000,
+            "prompt_per_second": self.prompt_tokens_per_second,
+            "predicted_n": self.decoded_tokens,
+            "predicted_ms": self.decode_seconds * 1000,
+            "predicted_per_second": self.tokens_per_second,
+        }
+        if self.draft_tokens > 0:
+            timings["draft_n"] = self.draft_tokens
+            timings["draft_n_accepted"] = self.accepted_tokens
+        return timings
+
+
+def sample_next_token(
+    logits: torch.Tensor,
+    temperature: float = 0.0,
+    top_k: int = 0,
+    top_p: float = 1.0,
+    generator: Optional[torch.Generator] = None,
+) -> torch.LongTensor:
+    """Pick the next token from `[batch, vocab]` logits. `temperature <= 0` is greedy."""
+    if temperature <= 0:
+        return logits.argmax(dim=-1)
+
+    probs = filter_logits(logits, temperature, top_k, top_p).softmax(dim=-1)
+    return torch.multinomial(probs, num_samples=1, generator=generator).squeeze(-1)
+
+
+def filter_logits(logits: torch.Tensor, temperature: float, top_k: int = 0, top_p: float = 1.0) -> torch.Tensor:
+    """Temperature, top-k and top-p applied to `[..., vocab]` logits; removed tokens are set to `-inf`."""
+    logits = logits / temperature
+    if top_k > 0:
+        top_k = min(top_k, logits.shape[-1])
+        kth = torch.topk(logits, top_k, dim=-1).values[..., -1, None]
+        logits = logits.masked_fill(logits < kth, float("-inf"))
+    if top_p < 1.0:
+        sorted_logits, sorted_idx = torch.sort(logits, descending=True, dim=-1)
+        cumulative = sorted_logits.softmax(dim=-1).cumsum(dim=-1)
+        # keep the first token that crosses top_p
+        remove = cumulative - sorted_logits.softmax(dim=-1) > top_p
+        sorted_logits = sorted_logits.masked_fill(remove, float("-inf"))
+        logits = torch.full_like(logits, float("-inf")).scatter(-1, sorted_idx, sorted_logits)
+    return logits
+
+
+def verify_draft(
+    logits: torch.Tensor,
+    draft: List[int],
+    temperature: float = 0.0,
+    top_k: int = 0,
+    top_p: float = 1.0,
+    generator: Optional[torch.Generator] = None,
+) -> tuple[int, torch.LongTensor]:
+    """
+    Speculative acceptance for a deterministic draft.
+
+    `logits` is `[len(draft) + 1, vocab]`: row `i` is the target distribution for the position of `draft[i]`, the
+    last row the one after the full draft. Greedy decoding accepts a draft token iff it is the argmax. Sampling
+    accepts it with probability `p(token)` and otherwise resamples from `p` with that token removed, so the output
+    follows the target distribution exactly. Returns the number of accepted tokens and the next token (`[1]`).
+    """
+    if temperature <= 0:
+        targets = logits.argmax(dim=-1)
+        accepted = 0
+        while accepted < len(draft) and int(targets[accepted]) == draft[accepted]:
+            accepted += 1
+        return accepted, targets[accepted:accepted + 1]
+
+    probs = filter_logits(logits, temperature, top_k, top_p).softmax(dim=-1)
+    for i, token in enumerate(draft):
+        u = torch.rand((), generator=generator)
+        if u < probs[i, token]:
+            continue
+        residual = probs[i].clone()
+        residual[token] = 0
+        if residual.sum() <= 0:  # draft token held all the mass but the coin still failed (rounding)
+            return i, torch.tensor([token])
+        return i, torch.multinomial(residual / residual.sum(), num_samples=1, generator=generator)
+    return len(draft), torch.multinomial(probs[-1], num_samples=1, generator=generator)
+
+
+class BitnetCPUGenerator:
+    """
+    Greedy/sampled generation with a KV cache preallocated to the full context.
+
+    The prompt is prefilled with a regular forward; every following token goes through a single-token decode step
+    of fixed shape `[batch, 1]`, which is compiled with `torch.compile` (falls back to eager when compilation is not
+    available on the host). Because the cache never reallocates and the decode shapes never change, the compiled
+    graph is captured once and reused for every token of every request.
+    """
+
+    def __init__(
+        self,
+        model: BitnetForCausalLM,
+        max_cache_len: Optional[int] = None,
+        compile: bool = True,
+    ):
+        self.model = model.eval()
+        self.config = model.config
+        self.max_cache_len = max_cache_len or self.config.max_position_embeddings
+        if self.max_cache_len > self.config.max_position_embeddings:
+            raise ValueError(
+                f"max_cache_len ({self.max_cache_len}) cannot exceed max_position_embeddings "
+                f"({self.config.max_position_embeddings}) with the static cache causal mask"
+            )
+        # one sequence at a time; `batching_bitnet.ContinuousBatchingScheduler` serves several
+        self.model._setup_cache(StaticCache, 1, max_cache_len=self.max_cache_len)
+
+        self._decode_step = self._forward_last
+        if compile:
+            try:
+                self._decode_step = torch.compile(self._forward_last, dynamic=False)
+            except Exception as e:  # torch < 2.0 or no compiler backend on this host
+                logger.warning(f"torch.compile unavailable ({e}); decoding in eager mode")
+        self._compiled = self._decode_step is not self._forward_last
+
+    @property
+    def is_compiled(self) -> bool:
+        return self._compiled
+
+    def close(self) -> None:
+        """Release the static cache buffers."""
+        self.model._reset_cache()
+
+    def _forward(self, input_ids: torch.LongTensor, cache_position: torch.LongTensor) -> torch.Tensor:
+        # the static cache lives on the attention modules, `past_key_values` stays None
+        return self.model(
+            input_ids,
+            position_ids=cache_position.unsqueeze(0).expand(input_ids.shape[0], -1),
+            cache_position=cache_position,
+            use_cache=False,
+            return_dict=False,
+        )[0]
+
+    def _forward_last(self, input_ids: torch.LongTensor, cache_position: torch.LongTensor) -> torch.Tensor:
+        return self._forward(input_ids, cache_position)[:, -1, :]
+
+    def _decode(self, input_ids: torch.LongTensor, cache_position: torch.LongTensor) -> torch.Tensor:
+        if not self._compiled:
+            return self._forward_last(input_ids, cache_position)
+        try:
+            return self._decode_step(input_ids, cache_position)
+        except Exception as e:  # compilation happens lazily on the first call
+            logger.warning(f"compiled decode step failed ({e}); falling back to eager mode")
+            self._decode_step = self._forward_last
+            self._compiled = False
+            return self._forward_last(input_ids, cache_position)
+
+    @torch.no_grad()
+    def generate(
+        self,
+        input_ids: torch.LongTensor,
+        max_new_tokens: int = 128,
+        temperature: float = 0.0,
+        top_k: int = 0,
+        top_p: float = 1.0,
+        eos_token_id: Optional[int] = None,
+        on_token: Optional[Callable[[int], bool]] = None,
+        generator: Optional[torch.Generator] = None,
+        drafter: Optional["Drafter"] = None,
+        num_draft_tokens: int = 4,
+    ) -> tuple[List[int], GenerationStats]:
+        """
+        Generate up to `max_new_tokens` after `input_ids` (shape `[1, prompt_len]`).
+
+        `on_token` is called with every new token id; returning `True` stops generation early (stop strings,
+        cancellation). Stale cache entries from a previous request are never read: the causal mask built from
+        `cache_position` hides every slot past the current position, so no reset is needed between requests.
+
+        With a `drafter` (see `speculative_bitnet`), each step asks it for up to `num_draft_tokens` tokens and
+        verifies them together with the current token in a single forward; the accepted prefix plus one token from
+        the target model are emitted. Rejected draft slots in the cache are simply overwritten by later steps. The
+        output distribution is unchanged; `stats.draft_tokens`/`stats.accepted_tokens` report the acceptance rate.
+
+        Returns the generated token ids (prompt excluded) and the timing stats.
+        """
+        if input_ids.dim() == 1:
+            input_ids = input_ids[None, :]
+        if input_ids.shape[0] != 1:
+            raise ValueError(
+                f"generate takes one sequence, got a batch of {input_ids.shape[0]}; "
+                "use batching_bitnet.ContinuousBatchingScheduler for several"
+            )
+        prompt_len = input_ids.shape[1]
+        if prompt_len >= self.max_cache_len:
+            raise ValueError(f"prompt of {prompt_len} tokens does not fit the {self.max_cache_len}-token cache")
+        max_new_tokens = min(max_new_tokens, self.max_cache_len - prompt_len)
+
+        stats = GenerationStats(prompt_tokens=prompt_len)
+        generated: List[int] = []
+
+        start = time.perf_counter()
+        logits = self._forward_last(input_ids, torch.arange(prompt_len, device=input_ids.device))
+        next_token = sample_next_token(logits, temperature, top_k, top_p, generator)
+        stats.prefill_seconds = time.perf_counter() - start
+
+        def emit(token: int) -> bool:
+            """Record a token; True when generation has to stop after it."""
+            generated.append(token)
+            if token == eos_token_id or (on_token is not None and on_token(token)):
+                return True
+            return len(generated) == max_new_tokens
+
+        if drafter is not None:
+            drafter.reset()
+        context = input_ids[0].tolist()
+
+        start = time.perf_counter()
+        cache_position = torch.tensor([prompt_len], device=input_ids.device)
+        while not emit(int(next_token[0])):
+            # the last emitted token is always fed, so drafts may fill the remaining budget minus one
+            budget = min(num_draft_tokens, max_new_tokens - len(generated) - 1)
+            draft = drafter.propose(context + generated, budget)[:budget] if drafter is not None and budget > 0 else []
+            if not draft:
+                logits = self._decode(next_token[:, None], cache_position)
+                next_token = sample_next_token(logits, temperature, top_k, top_p, generator)
+                cache_position += 1
+                continue
+
+            step_ids = torch.tensor([[generated[-1]] + draft], device=input_ids.device)
+            step_positions = torch.arange(
+                int(cache_position), int(cache_position) + len(step_ids[0]), device=input_ids.device
+            )
+            logits = self._forward(step_ids, step_positions)[0]
+            accepted, next_token = verify_draft(logits, draft, temperature, top_k, top_p, generator)
+            drafter.observe(len(draft), accepted)
+            stats.draft_tokens += len(draft)
+            stats.accepted_tokens += accepted
+            cache_position += 1 + accepted
+            stopped = False
+            for token in draft[:accepted]:
+                stopped = emit(token)
+                if stopped:
+                    break
+            if stopped:
+                break
+        stats.decode_seconds = time.perf_counter() - start
+        stats.generated_tokens = len(generated)
+
+        return generated, stats
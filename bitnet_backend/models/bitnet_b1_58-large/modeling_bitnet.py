@@ -62,6 +62,18 @@ logger = logging.get_logger(__name__)
 _CONFIG_FOR_DOC = "BitnetConfig"
 
 
+def _is_torchdynamo_compiling():
+    try:
+        return torch.compiler.is_compiling()
+    except AttributeError:
+        try:
+            import torch._dynamo as dynamo  # noqa: F401
+
+            return dynamo.is_compiling()
+        except Exception:
+            return False
+
+
 def _get_unpad_data(attention_mask):
     seqlens_in_batch = attention_mask.sum(dim=-1, dtype=torch.int32)
     indices = torch.nonzero(attention_mask.flatten(), as_tuple=False).flatten()
@@ -102,22 +114,28 @@ class BitnetRotaryEmbedding(nn.Module):
         self.max_position_embeddings = max_position_embeddings
         self.base = base
         inv_freq = 1.0 / (self.base ** (torch.arange(0, self.dim, 2, dtype=torch.int64).float().to(device) / self.dim))
-        self.register_buffer("inv_freq", inv_freq)
-        # For BC we register cos and sin cached
-        self.max_seq_len_cached = max_position_embeddings
+        self.register_buffer("inv_freq", inv_freq, persistent=False)
+        # cos/sin are precomputed once in fp32 and gathered by `position_ids` in `forward`
+        self.max_seq_len_cached = 0
+        self._set_cos_sin_cache(max_position_embeddings, device=device)
+
+    def _set_cos_sin_cache(self, seq_len, device=None):
+        self.max_seq_len_cached = seq_len
         t = torch.arange(self.max_seq_len_cached, device=device, dtype=torch.int64).type_as(self.inv_freq)
         t = t / self.scaling_factor
         freqs = torch.outer(t, self.inv_freq)
         # Different from paper, but it uses a different permutation in order to obtain the same calculation
         emb = torch.cat((freqs, freqs), dim=-1)
-        self.register_buffer("_cos_cached", emb.cos().to(torch.get_default_dtype()), persistent=False)
-        self.register_buffer("_sin_cached", emb.sin().to(torch.get_default_dtype()), persistent=False)
+        # Keep fp32 since bfloat16 loses precision on long contexts
+        # See https://github.com/huggingface/transformers/pull/29285
+        self.register_buffer("_cos_cached", emb.cos(), persistent=False)
+        self.register_buffer("_sin_cached", emb.sin(), persistent=False)
 
     @property
     def sin_cached(self):
         logger.warning_once(
             "The sin_cached attribute will be removed in 4.39. Bear in mind that its contents changed in v4.38. Use "
-            "the forward method of RoPE from now on instead. It is not used in the `BitnetAttention` class"
+            "the forward method of RoPE from now on instead."
         )
         return self._sin_cached
 
@@ -125,25 +143,25 @@ class BitnetRotaryEmbedding(nn.Module):
     def cos_cached(self):
         logger.warning_once(
             "The cos_cached attribute will be removed in 4.39. Bear in mind that its contents changed in v4.38. Use "
-            "the forward method of RoPE from now on instead. It is not used in the `BitnetAttention` class"
+            "the forward method of RoPE from now on instead."
         )
         return self._cos_cached
 
     @torch.no_grad()
     def forward(self, x, position_ids):
         # x: [bs, num_attention_heads, seq_len, head_size]
-        inv_freq_expanded = self.inv_freq[None, :, None].float().expand(position_ids.shape[0], -1, 1)
-        position_ids_expanded = position_ids[:, None, :].float()
-        # Force float32 since bfloat16 loses precision on long contexts
-        # See https://github.com/huggingface/transformers/pull/29285
-        device_type = x.device.type
-        device_type = device_type if isinstance(device_type, str) and device_type != "mps" else "cpu"
-        with torch.autocast(device_type=device_type, enabled=False):
-            freqs = (inv_freq_expanded.float() @ position_ids_expanded.float()).transpose(1, 2)
-            emb = torch.cat((freqs, freqs), dim=-1)
-            cos = emb.cos()
-            sin = emb.sin()
-        return cos.to(dtype=x.dtype), sin.to(dtype=x.dtype)
+        # Grow the table lazily (doubling) when decoding past `max_position_embeddings`. Compiled graphs are
+        # captured against a table already sized for their cache, so the data-dependent check is skipped there.
+        max_position = 0 if _is_torchdynamo_compiling() else int(position_ids.max()) + 1
+        if max_position > self.max_seq_len_cached:
+            self._set_cos_sin_cache(
+                max(max_position, 2 * self.max_seq_len_cached), device=self.inv_freq.device
+            )
+
+        position_ids = position_ids.to(self._cos_cached.device)
+        cos = self._cos_cached[position_ids]
+        sin = self._sin_cached[position_ids]
+        return cos.to(device=x.device, dtype=x.dtype), sin.to(device=x.device, dtype=x.dtype)
 
 
 def rotate_half(x):
@@ -223,7 +241,12 @@ def repeat_kv(hidden_states: torch.Tensor, n_rep: int) -> torch.Tensor:
 class BitnetAttention(nn.Module):
     """Multi-headed attention from 'Attention Is All You Need' paper"""
 
-    def __init__(self, config: BitnetConfig, layer_idx: Optional[int] = None):
+    def __init__(
+        self,
+        config: BitnetConfig,
+        layer_idx: Optional[int] = None,
+        rotary_emb: Optional[BitnetRotaryEmbedding] = None,
+    ):
         super().__init__()
         self.config = config
         self.layer_idx = layer_idx
@@ -266,11 +289,14 @@ class BitnetAttention(nn.Module):
             self.hidden_size, self.hidden_size, bias=config.attention_bias, 
             weight_bits=config.weight_bits, input_bits=config.input_bits, 
         )
-        self._init_rope()
+        self._init_rope(rotary_emb)
         self.inner_attn_ln = BitnetRMSNorm(self.hidden_size, eps=config.rms_norm_eps)
 
-    def _init_rope(self):
-        if self.config.rope_scaling is None:
+    def _init_rope(self, rotary_emb=None):
+        if rotary_emb is not None:
+            # shared per-model table, see `BitnetModel.rotary_emb`
+            self.rotary_emb = rotary_emb
+        elif self.config.rope_scaling is None:
             self.rotary_emb = BitnetRotaryEmbedding(
                 self.head_dim,
                 max_position_embeddings=self.max_position_embeddings,
@@ -288,6 +314,7 @@ class BitnetAttention(nn.Module):
         output_attentions: bool = False,
         use_cache: bool = False,
         cache_position: Optional[torch.LongTensor] = None,
+        position_embeddings: Optional[Tuple[torch.Tensor, torch.Tensor]] = None,
         **kwargs,
     ) -> Tuple[torch.Tensor, Optional[torch.Tensor], Optional[Tuple[torch.Tensor]]]:
         bsz, q_len, _ = hidden_states.size()
@@ -301,7 +328,10 @@ class BitnetAttention(nn.Module):
         value_states = value_states.view(bsz, q_len, self.num_key_value_heads, self.head_dim).transpose(1, 2)
 
         past_key_value = getattr(self, "past_key_value", past_key_value)
-        cos, sin = self.rotary_emb(value_states, position_ids)
+        if position_embeddings is None:
+            cos, sin = self.rotary_emb(value_states, position_ids)
+        else:
+            cos, sin = position_embeddings
         query_states, key_states = apply_rotary_pos_emb(query_states, key_states, cos, sin)
 
         if past_key_value is not None:
@@ -366,6 +396,7 @@ class BitnetFlashAttention2(BitnetAttention):
         output_attentions: bool = False,
         use_cache: bool = False,
         cache_position: Optional[torch.LongTensor] = None,
+        position_embeddings: Optional[Tuple[torch.Tensor, torch.Tensor]] = None,
         **kwargs,
     ) -> Tuple[torch.Tensor, Optional[torch.Tensor], Optional[Tuple[torch.Tensor]]]:
         output_attentions = False
@@ -383,7 +414,10 @@ class BitnetFlashAttention2(BitnetAttention):
         key_states = key_states.view(bsz, q_len, self.num_key_value_heads, self.head_dim).transpose(1, 2)
         value_states = value_states.view(bsz, q_len, self.num_key_value_heads, self.head_dim).transpose(1, 2)
 
-        cos, sin = self.rotary_emb(value_states, position_ids)
+        if position_embeddings is None:
+            cos, sin = self.rotary_emb(value_states, position_ids)
+        else:
+            cos, sin = position_embeddings
         query_states, key_states = apply_rotary_pos_emb(query_states, key_states, cos, sin)
 
         past_key_value = getattr(self, "past_key_value", past_key_value)
@@ -538,19 +572,117 @@ class BitnetFlashAttention2(BitnetAttention):
         )
 
 
+class BitnetSdpaAttention(BitnetAttention):
+    """
+    Bitnet attention module using torch.nn.functional.scaled_dot_product_attention. This module inherits from
+    `BitnetAttention` as the weights of the module stays untouched. The only changes are on the forward pass to adapt to
+    SDPA API, which runs a fused CPU kernel instead of the explicit matmul / softmax / matmul of the eager path.
+    """
+
+    def forward(
+        self,
+        hidden_states: torch.Tensor,
+        attention_mask: Optional[torch.Tensor] = None,
+        position_ids: Optional[torch.LongTensor] = None,
+        past_key_value: Optional[Cache] = None,
+        output_attentions: bool = False,
+        use_cache: bool = False,
+        cache_position: Optional[torch.LongTensor] = None,
+        position_embeddings: Optional[Tuple[torch.Tensor, torch.Tensor]] = None,
+        **kwargs,
+    ) -> Tuple[torch.Tensor, Optional[torch.Tensor], Optional[Tuple[torch.Tensor]]]:
+        if output_attentions:
+            # SDPA does not return attention weights, fall back to the eager implementation
+            logger.warning_once(
+                "BitnetModel is using BitnetSdpaAttention, but `torch.nn.functional.scaled_dot_product_attention` does "
+                "not support `output_attentions=True`. Falling back to the manual attention implementation."
+            )
+            return super().forward(
+                hidden_states=hidden_states,
+                attention_mask=attention_mask,
+                position_ids=position_ids,
+                past_key_value=past_key_value,
+                output_attentions=output_attentions,
+                use_cache=use_cache,
+                cache_position=cache_position,
+                position_embeddings=position_embeddings,
+            )
+
+        bsz, q_len, _ = hidden_states.size()
+
+        query_states = self.q_proj(hidden_states)
+        key_states = self.k_proj(hidden_states)
+        value_states = self.v_proj(hidden_states)
+
+        query_states = query_states.view(bsz, q_len, self.num_heads, self.head_dim).transpose(1, 2)
+        key_states = key_states.view(bsz, q_len, self.num_key_value_heads, self.head_dim).transpose(1, 2)
+        value_states = value_states.view(bsz, q_len, self.num_key_value_heads, self.head_dim).transpose(1, 2)
+
+        past_key_value = getattr(self, "past_key_value", past_key_value)
+        if position_embeddings is None:
+            cos, sin = self.rotary_emb(value_states, position_ids)
+        else:
+            cos, sin = position_embeddings
+        query_states, key_states = apply_rotary_pos_emb(query_states, key_states, cos, sin)
+
+        if past_key_value is not None:
+            # sin and cos are specific to RoPE models; cache_position needed for the static cache
+            cache_kwargs = {"sin": sin, "cos": cos, "cache_position": cache_position}
+            key_states, value_states = past_key_value.update(key_states, value_states, self.layer_idx, cache_kwargs)
+
+        kv_len = key_states.shape[-2]
+        causal_mask = attention_mask
+        if attention_mask is not None:  # no matter the length, we just slice it
+            causal_mask = attention_mask[:, :, :, :kv_len]
+        elif q_len > 1:
+            # called without a mask (the model always builds one): the queries are the last `q_len` positions.
+            # An explicit mask rather than `is_causal`, which would misplace the diagonal for cached keys and for
+            # the folded GQA queries below.
+            causal_mask = torch.ones(q_len, kv_len, dtype=torch.bool, device=query_states.device)
+            causal_mask = causal_mask.tril(kv_len - q_len)[None, None].expand(bsz, 1, -1, -1)
+
+        # GQA without `repeat_kv`: fold the query heads of each group into the sequence axis so every key/value
+        # head is read in place instead of being materialized `num_key_value_groups` times.
+        n_rep = self.num_key_value_groups
+        if n_rep > 1:
+            query_states = query_states.reshape(bsz, self.num_key_value_heads, n_rep * q_len, self.head_dim)
+            if causal_mask is not None:
+                causal_mask = causal_mask[:, :, None].expand(-1, -1, n_rep, -1, -1)
+                causal_mask = causal_mask.reshape(bsz, 1, n_rep * q_len, kv_len)
+
+        attn_output = torch.nn.functional.scaled_dot_product_attention(
+            query_states,
+            key_states,
+            value_states,
+            attn_mask=causal_mask,
+            dropout_p=self.attention_dropout if self.training else 0.0,
+        )
+
+        attn_output = attn_output.reshape(bsz, self.num_heads, q_len, self.head_dim)
+        attn_output = attn_output.transpose(1, 2).contiguous()
+        attn_output = attn_output.reshape(bsz, q_len, self.hidden_size)
+
+        attn_output = self.inner_attn_ln(attn_output)
+        attn_output = self.o_proj(attn_output)
+
+        return attn_output, None, past_key_value
+
 
 LLAMA_ATTENTION_CLASSES = {
     "eager": BitnetAttention,
     "flash_attention_2": BitnetFlashAttention2,
+    "sdpa": BitnetSdpaAttention,
 }
 
 
 class BitnetDecoderLayer(nn.Module):
-    def __init__(self, config: BitnetConfig, layer_idx: int):
+    def __init__(self, config: BitnetConfig, layer_idx: int, rotary_emb: Optional[BitnetRotaryEmbedding] = None):
         super().__init__()
         self.hidden_size = config.hidden_size
 
-        self.self_attn = LLAMA_ATTENTION_CLASSES[config._attn_implementation](config=config, layer_idx=layer_idx)
+        self.self_attn = LLAMA_ATTENTION_CLASSES[config._attn_implementation](
+            config=config, layer_idx=layer_idx, rotary_emb=rotary_emb
+        )
 
         self.mlp = BitnetMLP(config)
         self.input_layernorm = BitnetRMSNorm(config.hidden_size, eps=config.rms_norm_eps)
@@ -565,6 +697,7 @@ class BitnetDecoderLayer(nn.Module):
         output_attentions: Optional[bool] = False,
         use_cache: Optional[bool] = False,
         cache_position: Optional[torch.LongTensor] = None,
+        position_embeddings: Optional[Tuple[torch.Tensor, torch.Tensor]] = None,
         **kwargs,
     ) -> Tuple[torch.FloatTensor, Optional[Tuple[torch.FloatTensor, torch.FloatTensor]]]:
         """
@@ -580,6 +713,8 @@ class BitnetDecoderLayer(nn.Module):
                 If set to `True`, `past_key_values` key value states are returned and can be used to speed up decoding
                 (see `past_key_values`).
             past_key_value (`Tuple(torch.FloatTensor)`, *optional*): cached past key and value projection states
+            position_embeddings (`Tuple(torch.FloatTensor)`, *optional*):
+                rotary `(cos, sin)` computed once by [`BitnetModel`]; recomputed per layer when omitted.
         """
         if "padding_mask" in kwargs:
             warnings.warn(
@@ -599,6 +734,7 @@ class BitnetDecoderLayer(nn.Module):
             output_attentions=output_attentions,
             use_cache=use_cache,
             cache_position=cache_position,
+            position_embeddings=position_embeddings,
             **kwargs,
         )
         hidden_states = residual + hidden_states
@@ -648,8 +784,10 @@ class BitnetPreTrainedModel(PreTrainedModel):
     _no_split_modules = ["BitnetDecoderLayer"]
     _skip_keys_device_placement = ["past_key_values"]
     _supports_flash_attn_2 = True
-    _supports_sdpa = False
+    _supports_sdpa = True
     _supports_cache_class = True
+    # older checkpoints persisted a per-layer `inv_freq`; the table is now rebuilt from the config
+    _keys_to_ignore_on_load_unexpected = [r"rotary_emb\.inv_freq"]
 
     def _init_weights(self, module):
         std = self.config.initializer_range
@@ -680,8 +818,11 @@ class BitnetPreTrainedModel(PreTrainedModel):
             )
 
     def _reset_cache(self):
+        # drop the attribute rather than setting it to None: attention prefers it over `past_key_values`, and the
+        # causal mask treats its presence as "static cache"
         for layer in self.model.layers:
-            layer.self_attn.past_key_value = None
+            if hasattr(layer.self_attn, "past_key_value"):
+                del layer.self_attn.past_key_value
 
 
 LLAMA_INPUTS_DOCSTRING = r"""
@@ -776,8 +917,19 @@ class BitnetModel(BitnetPreTrainedModel):
         self.vocab_size = config.vocab_size
 
         self.embed_tokens = nn.Embedding(config.vocab_size, config.hidden_size, self.padding_idx)
+        # One RoPE table for the whole model, shared by every attention layer
+        if config.rope_scaling is not None:
+            raise NotImplementedError
+        self.rotary_emb = BitnetRotaryEmbedding(
+            config.hidden_size // config.num_attention_heads,
+            max_position_embeddings=config.max_position_embeddings,
+            base=config.rope_theta,
+        )
         self.layers = nn.ModuleList(
-            [BitnetDecoderLayer(config, layer_idx) for layer_idx in range(config.num_hidden_layers)]
+            [
+                BitnetDecoderLayer(config, layer_idx, rotary_emb=self.rotary_emb)
+                for layer_idx in range(config.num_hidden_layers)
+            ]
         )
         self.norm = BitnetRMSNorm(config.hidden_size, eps=config.rms_norm_eps)
         self.gradient_checkpointing = False
@@ -827,9 +979,13 @@ class BitnetModel(BitnetPreTrainedModel):
             inputs_embeds = self.embed_tokens(input_ids)
 
         past_seen_tokens = 0
+        return_legacy_cache = False
         if use_cache:  # kept for BC (cache positions)
-            if not isinstance(past_key_values, StaticCache):
+            if not isinstance(past_key_values, Cache):
+                # legacy tuples in, legacy tuples out; `Cache` objects (e.g. `Int8KVCache`) are passed through
+                return_legacy_cache = True
                 past_key_values = DynamicCache.from_legacy_cache(past_key_values)
+            if not isinstance(past_key_values, StaticCache):
                 past_seen_tokens = past_key_values.get_seq_length()
 
         if cache_position is None:
@@ -847,6 +1003,9 @@ class BitnetModel(BitnetPreTrainedModel):
         # embed positions
         hidden_states = inputs_embeds
 
+        # rotary cos/sin are gathered once per forward and reused by every layer
+        position_embeddings = self.rotary_emb(hidden_states, position_ids)
+
         # decoder layers
         all_hidden_states = () if output_hidden_states else None
         all_self_attns = () if output_attentions else None
@@ -866,6 +1025,7 @@ class BitnetModel(BitnetPreTrainedModel):
                     output_attentions,
                     use_cache,
                     cache_position,
+                    position_embeddings,
                 )
             else:
                 layer_outputs = decoder_layer(
@@ -876,6 +1036,7 @@ class BitnetModel(BitnetPreTrainedModel):
                     output_attentions=output_attentions,
                     use_cache=use_cache,
                     cache_position=cache_position,
+                    position_embeddings=position_embeddings,
                 )
 
             hidden_states = layer_outputs[0]
@@ -894,9 +1055,7 @@ class BitnetModel(BitnetPreTrainedModel):
 
         next_cache = None
         if use_cache:
-            next_cache = (
-                next_decoder_cache.to_legacy_cache() if isinstance(next_decoder_cache, Cache) else next_decoder_cache
-            )
+            next_cache = next_decoder_cache.to_legacy_cache() if return_legacy_cache else next_decoder_cache
         if not return_dict:
             return tuple(v for v in [hidden_states, next_cache, all_hidden_states, all_self_attns] if v is not None)
         return BaseModelOutputWithPast(
@@ -0,0 +1,165 @@
+"""Draft proposers for speculative decoding with `BitnetCPUGenerator.generate(..., drafter=...)`."""
+
+import copy
+from typing import Dict, List, Optional, Tuple
+
+import torch
+
+from .generation_bitnet import BitnetCPUGenerator
+from .modeling_bitnet import BitnetForCausalLM
+
+
+class Drafter:
+    """
+    Proposes up to `k` tokens that are likely to follow `tokens` (prompt + everything generated so far).
+
+    Drafts are treated as deterministic guesses: the target model verifies all of them in one forward and keeps the
+    longest accepted prefix, so a bad draft only costs time, never changes the output distribution.
+    """
+
+    def reset(self) -> None:
+        """Forget any per-request state. Called at the start of every `generate`."""
+
+    def propose(self, tokens: List[int], k: int) -> List[int]:
+        raise NotImplementedError
+
+    def observe(self, drafted: int, accepted: int) -> None:
+        """Verification outcome of the last proposal. Lets drafters adapt their draft length."""
+
+
+class PromptLookupDrafter(Drafter):
+    """
+    Prompt-lookup (n-gram copy) drafting: find the most recent earlier occurrence of the trailing n-gram of `tokens`
+    (longest n first) and propose the tokens that followed it. Costs no model forward, and works well when the output
+    copies spans of the prompt, e.g. rewriting a transcript into a note.
+
+    Every n-gram of the context is kept in a hash table keyed by its tokens and mapping to its latest start, updated
+    incrementally as tokens are appended, so a lookup is O(max_ngram) instead of a scan over the transcript.
+
+    The draft length adapts to how well copying is going: it doubles (up to the `k` the generator allows) while whole
+    drafts are accepted, and drops to just past the accepted prefix when the copy diverges. Long verbatim spans are
+    then verified many tokens at a time, while paraphrased stretches waste little verification work.
+    """
+
+    def __init__(self, max_ngram: int = 4, min_ngram: int = 2, initial_draft_len: int = 2):
+        if not 1 <= min_ngram <= max_ngram:
+            raise ValueError(f"need 1 <= min_ngram <= max_ngram, got {min_ngram} and {max_ngram}")
+        self.max_ngram = max_ngram
+        self.min_ngram = min_ngram
+        self.initial_draft_len = initial_draft_len
+        self.reset()
+
+    def reset(self) -> None:
+        # n -> {n-gram: start of its latest occurrence that has a following token}
+        self._index: Dict[int, Dict[Tuple[int, ...], int]] = {
+            n: {} for n in range(self.min_ngram, self.max_ngram + 1)
+        }
+        self._indexed = 0
+        self._last_token: Optional[int] = None
+        self._draft_len = self.initial_draft_len
+
+    def _extend_index(self, tokens: List[int]) -> None:
+        start = self._indexed
+        # `generate` resets per request, so the context only grows; rebuild if that ever breaks
+        if start > len(tokens) or (start > 0 and tokens[start - 1] != self._last_token):
+            for table in self._index.values():
+                table.clear()
+            start = 0
+        # token `end` is the continuation of the n-grams ending right before it
+        for end in range(max(start, 1), len(tokens)):
+            for n, table in self._index.items():
+                if end >= n:
+                    table[tuple(tokens[end - n:end])] = end - n
+        self._indexed = len(tokens)
+        self._last_token = tokens[-1] if tokens else None
+
+    def propose(self, tokens: List[int], k: int) -> List[int]:
+        self._extend_index(tokens)
+        k = min(k, self._draft_len)
+        for n in range(min(self.max_ngram, len(tokens)), self.min_ngram - 1, -1):
+            start = self._index[n].get(tuple(tokens[-n:]))
+            if start is not None:
+                return tokens[start + n:start + n + k]
+        return []
+
+    def observe(self, drafted: int, accepted: int) -> None:
+        if accepted == drafted:
+            self._draft_len *= 2
+        else:
+            self._draft_len = max(self.initial_draft_len, accepted + 1)
+
+
+class LayerSkipDrafter(Drafter):
+    """
+    Self-speculative drafting with the first `num_layers` decoder layers of the target model followed by its final
+    norm and LM head. The truncated model shares every weight with the target (no extra parameters), but keeps its
+    own static KV cache, which is extended incrementally as tokens are verified.
+    """
+
+    def __init__(
+        self,
+        model: BitnetForCausalLM,
+        num_layers: int = 4,
+        max_cache_len: Optional[int] = None,
+        compile: bool = True,
+    ):
+        if not 0 < num_layers < model.config.num_hidden_layers:
+            raise ValueError(
+                f"num_layers must be between 1 and {model.config.num_hidden_layers - 1}, got {num_layers}"
+            )
+        self.num_layers = num_layers
+        self.model = truncate_layers(model, num_layers)
+        self._generator = BitnetCPUGenerator(self.model, max_cache_len=max_cache_len, compile=compile)
+        self._cached: List[int] = []
+
+    @property
+    def max_cache_len(self) -> int:
+        return self._generator.max_cache_len
+
+    def reset(self) -> None:
+        self._cached = []
+
+    def close(self) -> None:
+        self._generator.close()
+
+    @torch.no_grad()
+    def propose(self, tokens: List[int], k: int) -> List[int]:
+        k = min(k, self.max_cache_len - len(tokens))
+        if k <= 0:
+            return []
+
+        # only the tokens the draft cache has not seen yet are fed; slots past them are stale and masked out
+        common = 0
+        for cached, token in zip(self._cached, tokens):
+            if cached != token:
+                break
+            common += 1
+        common = min(common, len(tokens) - 1)
+
+        new_ids = torch.tensor([tokens[common:]])
+        logits = self._generator._forward_last(new_ids, torch.arange(common, len(tokens)))
+        draft = [int(logits.argmax(-1)[0])]
+        position = len(tokens)
+        while len(draft) < k:
+            logits = self._generator._decode(torch.tensor([[draft[-1]]]), torch.tensor([position]))
+            draft.append(int(logits.argmax(-1)[0]))
+            position += 1
+
+        self._cached = tokens + draft[:-1]
+        return draft
+
+
+def truncate_layers(model: BitnetForCausalLM, num_layers: int) -> BitnetForCausalLM:
+    """
+    Shallow copy of `model` that runs only its first `num_layers` decoder layers. Parameters and buffers are shared
+    with `model`; modules (and therefore per-layer static caches) are not.
+    """
+    memo = {id(t): t for t in list(model.parameters()) + list(model.buffers())}
+    for layer in model.model.layers:
+        cache = getattr(layer.self_attn, "past_key_value", None)
+        if cache is not None:
+            memo[id(cache)] = None
+    draft = copy.deepcopy(model, memo)
+    draft.config.num_hidden_layers = num_layers
+    draft.model.layers = draft.model.layers[:num_layers]
+    return draft.eval()
@@ -6,10 +6,14 @@ export PATH="/c/Users/VHAWRJDRESCF/OneDrive - Department of Veterans Affairs/Doc
 MODEL="models/bitnet_b1_58-large/ggml-model-tl2.gguf"
 LLAMA_CLI="./build_mingw/bin/llama-cli.exe"
 
+# Launch parameters from ../.env (fill them in with utils/sweep_launch.py --update-env ../.env)
+env_value() { grep -E "^$1=" ../.env 2>/dev/null | tail -n 1 | cut -d= -f2- | tr -d '\r'; }
+THREADS=$(env_value BITNET_THREADS)
+[ "${THREADS:-0}" = "0" ] && THREADS=4          # CPU threads for generation
+BATCH=$(env_value BITNET_BATCH_SIZE); BATCH=${BATCH:-512}          # Batch size
+CONTEXT=$(env_value BITNET_CTX_SIZE); CONTEXT=${CONTEXT:-1024}     # Context window
+
 # ADJUSTABLE PARAMETERS:
-THREADS=4              # CPU threads (4 is optimal for this machine)
-BATCH=512              # Batch size
-CONTEXT=1024           # Context window
 TEMPERATURE=0.7        # 0.0=deterministic, 1.0=creative, 2.0=very random
 REPEAT_PENALTY=1.1     # Penalty for repeating tokens (1.0=none, 1.2=strong)
 TOP_P=0.95             # Nucleus sampling (0.9-0.95 recommended)
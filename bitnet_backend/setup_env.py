@@ -13,6 +13,10 @@ import platform
 from pathlib import Path
 import urllib.request
 import json
+import hashlib
+import filecmp
+import time
+import re
 
 # Model configurations
 MODEL_CONFIGS = {
@@ -30,6 +34,55 @@ MODEL_CONFIGS = {
 
 QUANT_TYPES = ["i2_s", "tl1"]
 
+# Inputs of the native build, hashed to decide whether an existing build tree is current
+SOURCE_PATHS = ["CMakeLists.txt", "src", "include", "generated_kernels", "3rdparty/llama.cpp"]
+SOURCE_SUFFIXES = {".c", ".cc", ".cpp", ".h", ".hpp", ".inc", ".txt", ".cmake", ".in", ".ini"}
+SOURCE_SKIP_DIRS = {".git", "build", "models", "docs", "examples", "__pycache__"}
+BUILD_STAMP = ".bitnet_build.json"
+COMPILER_CACHES = ["ccache", "sccache"]
+
+# LUT kernels selected for a TL1/TL2 build (untracked; include/ keeps the shipped ones)
+KERNEL_DIR = "generated_kernels"
+
+# Host CPU profile read by START.bat and the GUI for thread defaults
+CPU_PROFILE_FILE = "cpu_profile.env"
+
+# Compiler macros (with -march=native) -> feature names in the CPU profile
+ISA_MACROS = {
+    "__AVX__": "avx",
+    "__AVX2__": "avx2",
+    "__FMA__": "fma",
+    "__F16C__": "f16c",
+    "__AVX512F__": "avx512f",
+    "__AVX512VNNI__": "avx512_vnni",
+    "__AVXVNNI__": "avx_vnni",
+    "__ARM_NEON": "neon",
+    "__ARM_FEATURE_DOTPROD": "dotprod",
+}
+
+# /proc/cpuinfo flags -> feature names
+LINUX_CPU_FLAGS = {
+    "avx": "avx", "avx2": "avx2", "fma": "fma", "f16c": "f16c", "avx512f": "avx512f",
+    "avx512_vnni": "avx512_vnni", "avx_vnni": "avx_vnni", "asimd": "neon", "asimddp": "dotprod",
+}
+
+# IsProcessorFeaturePresent ids -> feature names
+WINDOWS_PF_FEATURES = {39: "avx", 40: "avx2", 41: "avx512f", 19: "neon", 43: "dotprod"}
+# x86 features Windows has no IsProcessorFeaturePresent id for; without a gcc/clang
+# probe (MSVC builds) their CMake switches are left to llama.cpp's defaults
+WINDOWS_UNDETECTED_FEATURES = {"fma", "f16c"}
+
+# Profile features -> llama.cpp CMake switches (x86)
+GGML_ISA_OPTIONS = [
+    ("avx", "GGML_AVX"),
+    ("avx2", "GGML_AVX2"),
+    ("fma", "GGML_FMA"),
+    ("f16c", "GGML_F16C"),
+    ("avx512f", "GGML_AVX512"),
+    ("avx512_vnni", "GGML_AVX512_VNNI"),
+    ("avx_vnni", "GGML_AVX_VNNI"),
+]
+
 def print_colored(message, color="white"):
     """Print colored output for better visibility"""
     colors = {
@@ -118,10 +171,266 @@ def detect_compiler():
     print_colored("No C++ compiler found!", "red")
     return None
 
-def create_build_directory(build_dir="build"):
+def is_arm():
+    return platform.machine().lower() in ("arm64", "aarch64", "armv8l")
+
+def cpu_name():
+    """Human-readable CPU model"""
+    system = platform.system()
+    if system == "Linux":
+        try:
+            with open("/proc/cpuinfo") as f:
+                for line in f:
+                    if line.startswith(("model name", "Model")):
+                        return line.split(":", 1)[1].strip()
+        except OSError:
+            pass
+    elif system == "Darwin":
+        try:
+            return run_command(["sysctl", "-n", "machdep.cpu.brand_string"], capture_output=True)
+        except Exception:
+            pass
+    return os.environ.get("PROCESSOR_IDENTIFIER") or platform.processor() or platform.machine()
+
+def compiler_isa_features(compiler):
+    """Features the compiler enables for this CPU with native tuning (gcc/clang only)"""
+    if compiler not in ("clang++", "g++"):
+        return set()
+    arch_flag = "-mcpu=native" if is_arm() else "-march=native"
+    try:
+        result = subprocess.run([compiler, arch_flag, "-dM", "-E", "-x", "c++", os.devnull],
+                                capture_output=True, text=True, check=True)
+    except (OSError, subprocess.CalledProcessError):
+        return set()
+    defined = set(re.findall(r"#define (\w+)", result.stdout))
+    return {name for macro, name in ISA_MACROS.items() if macro in defined}
+
+def os_isa_features():
+    """Features reported by the operating system"""
+    system = platform.system()
+    if system == "Linux":
+        try:
+            with open("/proc/cpuinfo") as f:
+                for line in f:
+                    if line.startswith(("flags", "Features")):
+                        flags = set(line.split(":", 1)[1].split())
+                        return {name for flag, name in LINUX_CPU_FLAGS.items() if flag in flags}
+        except OSError:
+            pass
+    elif system == "Windows":
+        import ctypes
+        present = ctypes.windll.kernel32.IsProcessorFeaturePresent
+        return {name for pf, name in WINDOWS_PF_FEATURES.items() if present(pf)}
+    elif system == "Darwin" and is_arm():
+        # every Apple silicon core has NEON and dot product
+        return {"neon", "dotprod"}
+    return set()
+
+def _parse_cpu_list(text):
+    """'0-3,8,10-11' -> {0, 1, 2, 3, 8, 10, 11}"""
+    cpus = set()
+    for part in text.strip().split(","):
+        if "-" in part:
+            first, last = part.split("-")
+            cpus.update(range(int(first), int(last) + 1))
+        elif part:
+            cpus.add(int(part))
+    return cpus
+
+def _linux_core_topology():
+    """(physical cores, performance cores, efficiency cores)"""
+    core_of = {}
+    cpu = None
+    physical = "0"
+    with open("/proc/cpuinfo") as f:
+        for line in f:
+            key, _, value = line.partition(":")
+            key, value = key.strip(), value.strip()
+            if key == "processor":
+                cpu = int(value)
+            elif key == "physical id":
+                physical = value
+            elif key == "core id" and cpu is not None:
+                core_of[cpu] = (physical, value)
+    cores = len(set(core_of.values())) or os.cpu_count() or 1
+
+    # hybrid Intel CPUs expose P-cores as cpu_core and E-cores as cpu_atom PMUs
+    hybrid = {}
+    for kind in ("cpu_core", "cpu_atom"):
+        try:
+            with open(f"/sys/devices/{kind}/cpus") as f:
+                cpus = _parse_cpu_list(f.read())
+        except OSError:
+            continue
+        hybrid[kind] = len({core_of.get(c, c) for c in cpus})
+    if "cpu_core" in hybrid and "cpu_atom" in hybrid:
+        return cores, hybrid["cpu_core"], hybrid["cpu_atom"]
+    return cores, cores, 0
+
+def _windows_core_topology():
+    """(physical cores, performance cores, efficiency cores) from GetLogicalProcessorInformationEx"""
+    import ctypes
+    relation_processor_core = 0
+    size = ctypes.c_ulong(0)
+    get_info = ctypes.windll.kernel32.GetLogicalProcessorInformationEx
+    get_info(relation_processor_core, None, ctypes.byref(size))
+    buffer = ctypes.create_string_buffer(size.value)
+    if not get_info(relation_processor_core, buffer, ctypes.byref(size)):
+        cores = os.cpu_count() or 1
+        return cores, cores, 0
+
+    # SYSTEM_LOGICAL_PROCESSOR_INFORMATION_EX: Relationship, Size, then
+    # PROCESSOR_RELATIONSHIP.Flags (byte 8) and .EfficiencyClass (byte 9)
+    classes = []
+    offset = 0
+    while offset < size.value:
+        entry_size = int.from_bytes(buffer.raw[offset + 4:offset + 8], "little")
+        classes.append(buffer.raw[offset + 9])
+        offset += entry_size
+    performance = sum(1 for c in classes if c == max(classes))
+    return len(classes), performance, len(classes) - performance
+
+def _macos_core_topology():
+    """(physical cores, performance cores, efficiency cores) from sysctl perflevels"""
+    def sysctl(name):
+        try:
+            return int(run_command(["sysctl", "-n", name], capture_output=True))
+        except Exception:
+            return 0
+    cores = sysctl("hw.physicalcpu") or os.cpu_count() or 1
+    performance = sysctl("hw.perflevel0.physicalcpu")
+    efficiency = sysctl("hw.perflevel1.physicalcpu")
+    if performance and efficiency:
+        return cores, performance, efficiency
+    return cores, cores, 0
+
+def detect_cpu_profile(compiler):
+    """Detect ISA features and core topology, and derive build/runtime defaults"""
+    print_colored("Detecting host CPU...", "blue")
+    topology = {
+        "Linux": _linux_core_topology,
+        "Windows": _windows_core_topology,
+        "Darwin": _macos_core_topology,
+    }.get(platform.system())
+    try:
+        cores, performance, efficiency = topology()
+    except Exception:
+        cores = os.cpu_count() or 1
+        performance, efficiency = cores, 0
+    compiler_features = compiler_isa_features(compiler)
+    features = os_isa_features() | compiler_features
+    undetected = set()
+    if platform.system() == "Windows" and not is_arm() and not compiler_features:
+        undetected = WINDOWS_UNDETECTED_FEATURES - features
+
+    if is_arm():
+        kernel = "tl1" if "neon" in features else None
+    else:
+        kernel = "tl2" if "avx2" in features else None
+
+    profile = {
+        "cpu": cpu_name(),
+        "arch": platform.machine().lower(),
+        "features": sorted(features),
+        "undetected_features": sorted(undetected),
+        "physical_cores": cores,
+        "logical_cpus": os.cpu_count() or cores,
+        "performance_cores": performance,
+        "efficiency_cores": efficiency,
+        "kernel": kernel,
+        # decode is memory bound and OpenMP barriers wait for the slowest thread,
+        # so E-cores and SMT siblings cost more than they add
+        "threads": max(1, performance),
+    }
+
+    print_colored(f"✓ CPU: {profile['cpu']}", "green")
+    print_colored(f"✓ Features: {', '.join(profile['features']) or 'none detected'}", "green")
+    if undetected:
+        print_colored(f"  Not detectable here: {', '.join(profile['undetected_features'])}", "yellow")
+    cores_text = f"{cores} cores"
+    if efficiency:
+        cores_text += f" ({performance} performance + {efficiency} efficiency)"
+    print_colored(f"✓ Topology: {cores_text}, {profile['logical_cpus']} logical CPUs", "green")
+    print_colored(f"✓ Default threads: {profile['threads']}", "green")
+    return profile
+
+def write_cpu_profile(profile, path=CPU_PROFILE_FILE):
+    """Write the profile as KEY=VALUE lines (START.bat and the GUI read this)"""
+    lines = [
+        f"# Host CPU profile written by setup_env.py on {time.strftime('%Y-%m-%d %H:%M:%S')}",
+        "# BITNET_THREADS in .env overrides BITNET_PROFILE_THREADS",
+        f"BITNET_PROFILE_CPU={profile['cpu']}",
+        f"BITNET_PROFILE_ARCH={profile['arch']}",
+        f"BITNET_PROFILE_FEATURES={','.join(profile['features'])}",
+        f"BITNET_PROFILE_PHYSICAL_CORES={profile['physical_cores']}",
+        f"BITNET_PROFILE_LOGICAL_CPUS={profile['logical_cpus']}",
+        f"BITNET_PROFILE_PERFORMANCE_CORES={profile['performance_cores']}",
+        f"BITNET_PROFILE_EFFICIENCY_CORES={profile['efficiency_cores']}",
+        f"BITNET_PROFILE_KERNEL={profile['kernel'] or 'none'}",
+        f"BITNET_PROFILE_THREADS={profile['threads']}",
+    ]
+    with open(path, "w") as f:
+        f.write("\n".join(lines) + "\n")
+    print_colored(f"✓ CPU profile written to {path}", "green")
+
+def detect_compiler_cache():
+    """Find ccache/sccache to use as compiler launcher"""
+    if platform.system() == "Windows":
+        # the Visual Studio generator ignores compiler launchers
+        return None
+    for name in COMPILER_CACHES:
+        if shutil.which(name):
+            print_colored(f"✓ Using compiler cache: {name}", "green")
+            return name
+    return None
+
+def source_hash():
+    """Hash the contents of every build input under SOURCE_PATHS"""
+    digest = hashlib.sha1()
+    for root in SOURCE_PATHS:
+        root_path = Path(root)
+        if root_path.is_file():
+            files = [root_path]
+        elif root_path.is_dir():
+            files = []
+            for dirpath, dirnames, filenames in os.walk(root_path):
+                dirnames[:] = sorted(d for d in dirnames if d not in SOURCE_SKIP_DIRS)
+                files.extend(Path(dirpath) / f for f in sorted(filenames))
+        else:
+            continue
+        for path in files:
+            if path.suffix in SOURCE_SUFFIXES or path.name == "CMakeLists.txt":
+                digest.update(path.as_posix().encode())
+                digest.update(path.read_bytes())
+    return digest.hexdigest()
+
+def args_hash(cmake_args):
+    return hashlib.sha1("\0".join(cmake_args).encode()).hexdigest()
+
+def read_build_stamp(build_dir):
+    try:
+        with open(Path(build_dir) / BUILD_STAMP) as f:
+            return json.load(f)
+    except (OSError, ValueError):
+        return {}
+
+def write_build_stamp(build_dir, stamp):
+    with open(Path(build_dir) / BUILD_STAMP, "w") as f:
+        json.dump(stamp, f, indent=2)
+
+def record_build_timings(log_dir, timings):
+    """Append one build's timings to <log_dir>/build_timings.jsonl"""
+    with open(Path(log_dir) / "build_timings.jsonl", "a") as f:
+        f.write(json.dumps(timings) + "\n")
+
+def create_build_directory(build_dir="build", clean=True):
     """Create and prepare build directory"""
     build_path = Path(build_dir)
     
+    if build_path.exists() and not clean:
+        print_colored(f"Reusing build directory: {build_path}", "green")
+        return build_path
+    
     if build_path.exists():
         print_colored(f"Removing existing build directory: {build_path}", "yellow")
         shutil.rmtree(build_path)
@@ -130,21 +439,87 @@ def create_build_directory(build_dir="build"):
     print_colored(f"Created build directory: {build_path}", "green")
     return build_path
 
-def configure_cmake(build_dir, model_dir, quant_type):
-    """Configure CMake build"""
-    print_colored("Configuring CMake...", "blue")
-    
+def install_file(source, target):
+    """Copy source over target unless identical, so unchanged kernels don't trigger rebuilds"""
+    target = Path(target)
+    if target.exists() and filecmp.cmp(source, target, shallow=False):
+        return False
+    shutil.copyfile(source, target)
+    return True
+
+def prepare_kernels(model_dir, quant_type, autotune=False):
+    """
+    Put tuned kernels for this host, otherwise the preset ones, in KERNEL_DIR for a TL1/TL2 model.
+    Returns the directory, or None when the build uses the kernels shipped in include/ (i2_s)
+    """
+    if quant_type not in ("tl1", "tl2"):
+        return None
+    kernel = quant_type
+    model_name = Path(model_dir).name
+    kernel_dir = Path(KERNEL_DIR)
+    kernel_dir.mkdir(exist_ok=True)
+
+    tuner = [sys.executable, "utils/autotune_kernels.py",
+             "--model", model_name, "--kernel", kernel, "--install", "--install-dir", str(kernel_dir)]
+    if Path("utils/autotune_kernels.py").exists() and (Path(model_dir) / "config.json").exists():
+        if autotune:
+            print_colored(f"Autotuning {kernel} kernels for this CPU...", "blue")
+            if run_command(tuner, check=False):
+                return kernel_dir
+            print_colored("Autotuning failed, falling back to preset kernels", "yellow")
+        elif run_command(tuner + ["--cached-only"], check=False):
+            print_colored(f"✓ Using tuned {kernel} kernels for this CPU", "green")
+            return kernel_dir
+
+    preset_dir = Path("preset_kernels") / model_name
+    header = preset_dir / f"bitnet-lut-kernels-{kernel}.h"
+    config = preset_dir / f"kernel_config_{kernel}.ini"
+    if not (header.exists() and config.exists()):
+        print_colored(f"No preset {kernel} kernels for {model_name}, using the ones in include/", "yellow")
+        return None
+
+    install_file(header, kernel_dir / "bitnet-lut-kernels.h")
+    install_file(config, kernel_dir / "kernel_config.ini")
+    print_colored(f"✓ Using preset {kernel} kernels for {model_name}", "green")
+    return kernel_dir
+
+def cmake_arguments(quant_type, launcher=None, profile=None, portable=False, kernel_dir=None):
+    """CMake configure command line for this build"""
     cmake_args = [
         "cmake",
         "..",
         "-DCMAKE_BUILD_TYPE=Release"
     ]
     
-    # Add quantization type flags
-    if quant_type == "i2_s":
-        cmake_args.append("-DBITNET_X86_TL2=ON")
-    elif quant_type == "tl1":
+    # Add quantization type flags (the LUT kernel must match the CPU)
+    kernel = profile["kernel"] if profile else ("tl2" if quant_type == "i2_s" else None)
+    if quant_type == "tl1":
+        if profile and kernel != "tl1":
+            print_colored("tl1 kernels need an ARM CPU with NEON; this build will not run here", "yellow")
         cmake_args.append("-DBITNET_ARM_TL1=ON")
+    elif kernel == "tl2":
+        cmake_args.append("-DBITNET_X86_TL2=ON")
+    elif profile and kernel is None:
+        print_colored("No AVX2/NEON LUT kernel for this CPU, using the generic i2_s kernels", "yellow")
+    
+    # Kernels prepared for this model/CPU are found before the shipped include/ ones
+    if kernel_dir:
+        cmake_args.append(f"-DBITNET_KERNEL_DIR={Path(kernel_dir).resolve().as_posix()}")
+    
+    # Instruction sets: exactly what this CPU has, unless the build is copied to other machines
+    if profile and not portable:
+        if is_arm():
+            cmake_args.append("-DGGML_NATIVE=ON")
+        else:
+            cmake_args.append("-DGGML_NATIVE=OFF")
+            # Features detection could not answer stay unset (llama.cpp enables them without GGML_NATIVE)
+            cmake_args.extend(
+                f"-D{option}={'ON' if feature in profile['features'] else 'OFF'}"
+                for feature, option in GGML_ISA_OPTIONS
+                if feature not in profile.get("undetected_features", ())
+            )
+    elif portable:
+        cmake_args.append("-DGGML_NATIVE=OFF")
     
     # Platform-specific configurations
     if platform.system() == "Windows":
@@ -153,6 +528,17 @@ def configure_cmake(build_dir, model_dir, quant_type):
             "-A", "x64"
         ])
     
+    if launcher:
+        cmake_args.extend([
+            f"-DCMAKE_C_COMPILER_LAUNCHER={launcher}",
+            f"-DCMAKE_CXX_COMPILER_LAUNCHER={launcher}"
+        ])
+    
+    return cmake_args
+
+def configure_cmake(build_dir, cmake_args):
+    """Configure CMake build"""
+    print_colored("Configuring CMake...", "blue")
     return run_command(cmake_args, cwd=build_dir)
 
 def build_project(build_dir, jobs=None):
@@ -171,8 +557,8 @@ def build_project(build_dir, jobs=None):
     
     return run_command(build_args, cwd=build_dir)
 
-def verify_model_files(model_dir, quant_type):
-    """Verify model files exist"""
+def verify_model_files(model_dir, quant_type, kernel=None, kernel_dir=None):
+    """Check the GGUF model's header against config.json and the kernel being built (no tensor data is loaded)"""
     model_path = Path(model_dir)
     
     if not model_path.exists():
@@ -180,16 +566,45 @@ def verify_model_files(model_dir, quant_type):
         return False
     
     # Look for GGUF file
-    gguf_files = list(model_path.glob("*.gguf"))
+    gguf_files = sorted(model_path.glob("*.gguf"))
     if not gguf_files:
         print_colored(f"No GGUF model files found in {model_path}", "red")
         return False
     
+    sys.path.insert(0, str(Path(__file__).resolve().parent / "utils"))
+    from gguf_inspect import verify_model
+    kernel_config = Path(kernel_dir) / "kernel_config.ini" if kernel_dir else None
+    
+    ready = False
     for gguf_file in gguf_files:
-        size_mb = gguf_file.stat().st_size / (1024 * 1024)
-        print_colored(f"✓ Model file: {gguf_file.name} ({size_mb:.1f} MB)", "green")
+        report = verify_model(gguf_file, kernel=kernel, kernel_config=kernel_config)
+        if not report.ok:
+            print_colored(f"✗ Model file: {gguf_file.name}: {'; '.join(report.problems)}", "red")
+            continue
+        print_colored(f"✓ Model file: {report.summary()}", "green")
+        for note in report.notes:
+            print_colored(f"  {note}", "yellow")
+        if report.quant_type == quant_type:
+            ready = True
+        else:
+            print_colored(f"  {gguf_file.name} is {report.quant_type}, not the requested {quant_type}", "yellow")
     
-    return True
+    return ready
+
+def convert_model(model_dir, quant_type, jobs=None, kernel_dir=None):
+    """Build the GGUF file from a Hugging Face checkpoint in model_dir, if there is one"""
+    model_path = Path(model_dir)
+    has_checkpoint = any(model_path.glob("*.safetensors")) or any(model_path.glob("pytorch_model*.bin"))
+    if not has_checkpoint or not Path("utils/convert_hf_to_gguf.py").exists():
+        return False
+
+    print_colored(f"Converting {model_path.name} checkpoint to {quant_type} GGUF...", "blue")
+    cmd = [sys.executable, "utils/convert_hf_to_gguf.py", str(model_path), "--quant-type", quant_type]
+    if jobs:
+        cmd += ["--jobs", str(jobs)]
+    if kernel_dir:
+        cmd += ["--kernel-config", str(Path(kernel_dir) / "kernel_config.ini")]
+    return run_command(cmd, check=False)
 
 def create_server_executable(build_dir):
     """Create or find the server executable"""
@@ -232,6 +647,15 @@ def main():
                        type=int,
                        default=None,
                        help="Number of build jobs")
+    parser.add_argument("--clean",
+                       action="store_true",
+                       help="Delete the build directory and rebuild from scratch")
+    parser.add_argument("--portable",
+                       action="store_true",
+                       help="Don't target this CPU's instruction sets (build is deployed to other machines)")
+    parser.add_argument("--autotune",
+                       action="store_true",
+                       help="Benchmark kernel tilings on this CPU before building (cached per host)")
     
     args = parser.parse_args()
     
@@ -253,25 +677,61 @@ def main():
         if not compiler:
             sys.exit(1)
         
-        # Step 3: Verify model files
-        if not verify_model_files(args.model_dir, args.quant_type):
+        # Step 3: Detect the host CPU (kernel variant, ISA flags, thread default)
+        profile = detect_cpu_profile(compiler)
+        write_cpu_profile(profile)
+        
+        # Step 4: Select LUT kernels for a TL1/TL2 model (tuned for this host or preset)
+        kernel_dir = prepare_kernels(args.model_dir, args.quant_type, args.autotune)
+        
+        # Step 5: Verify model files against the kernels this build will use (same choice as cmake_arguments);
+        # converting needs the kernel tiling too, so both happen after the kernels are chosen
+        kernel = "tl1" if args.quant_type == "tl1" else profile["kernel"]
+        model_ready = verify_model_files(args.model_dir, args.quant_type, kernel, kernel_dir)
+        if not model_ready and not convert_model(args.model_dir, args.quant_type, args.jobs, kernel_dir):
             print_colored("Model files not ready - this is expected for fresh installs", "yellow")
-            print_colored("Model files should be available via Git LFS", "yellow")
+            print_colored("Model files should be available via Git LFS, or put the Hugging Face checkpoint in the model directory to convert it", "yellow")
         
-        # Step 4: Create build directory
-        build_dir = create_build_directory(args.build_dir)
+        # Step 6: Reuse the build tree if configured with the same arguments
+        launcher = detect_compiler_cache()
+        cmake_args = cmake_arguments(args.quant_type, launcher, profile, args.portable, kernel_dir)
+        stamp = read_build_stamp(args.build_dir)
+        configured = not args.clean and stamp.get("cmake_args") == args_hash(cmake_args)
+        sources = source_hash()
+        build_dir = create_build_directory(args.build_dir, clean=not configured)
+        timings = {
+            "started": time.strftime("%Y-%m-%d %H:%M:%S"),
+            "mode": "incremental" if configured else "clean",
+            "launcher": launcher,
+        }
         
-        # Step 5: Configure CMake
-        if not configure_cmake(build_dir, args.model_dir, args.quant_type):
-            print_colored("CMake configuration failed", "red")
-            sys.exit(1)
+        # Step 7: Configure CMake
+        if configured:
+            print_colored("CMake arguments unchanged, skipping configure", "green")
+        else:
+            start = time.time()
+            if not configure_cmake(build_dir, cmake_args):
+                print_colored("CMake configuration failed", "red")
+                sys.exit(1)
+            timings["configure_seconds"] = round(time.time() - start, 1)
+            stamp = {"cmake_args": args_hash(cmake_args)}
+            write_build_stamp(build_dir, stamp)
         
-        # Step 6: Build project
-        if not build_project(build_dir, args.jobs):
-            print_colored("Build failed", "red")
-            sys.exit(1)
+        # Step 8: Build project (skipped when nothing changed since the last successful build)
+        if configured and stamp.get("sources") == sources:
+            print_colored("Sources unchanged since last build, nothing to do", "green")
+            timings["mode"] = "up-to-date"
+        else:
+            start = time.time()
+            if not build_project(build_dir, args.jobs):
+                print_colored("Build failed", "red")
+                sys.exit(1)
+            timings["build_seconds"] = round(time.time() - start, 1)
+            write_build_stamp(build_dir, {**stamp, "sources": sources})
+            print_colored(f"Build finished in {timings['build_seconds']}s ({timings['mode']})", "green")
+        record_build_timings(args.log_dir, timings)
         
-        # Step 7: Verify results
+        # Step 9: Verify results
         create_server_executable(build_dir)
         
         print_colored("BitNet setup completed successfully!", "green")
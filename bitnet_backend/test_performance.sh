@@ -27,14 +27,7 @@ echo ""
 echo "================================"
 echo "Performance Summary"
 echo "================================"
-echo "Best settings for VA workstation:"
-echo "  - Threads: 12 (use all cores)"
-echo "  - Batch: 512 (optimal)"  
-echo "  - Context: 1024 (balanced)"
-echo "  - Temp: 0.7 (coherent output)"
-echo ""
-echo "Quick command:"
-echo "./build_mingw/bin/llama-cli.exe -m models/bitnet_b1_58-large/ggml-model-tl2.gguf \\"
-echo "  -p 'Your prompt' -n 100 -t 12 -b 512 -c 1024 --temp 0.7"
+echo "For measured settings (threads, batch, ubatch, context) run:"
+echo "  python utils/sweep_launch.py --update-env ../.env"
 echo "================================"
 
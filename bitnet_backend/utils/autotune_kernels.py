@@ -0,0 +1,424 @@
+#!/usr/bin/env python3
+"""
+Kernel tiling autotuner for the TL1/TL2 LUT kernels.
+
+For every matmul shape of a model, enumerates the (BM, BK, bm) tiles allowed
+by the codegen constraints (docs/codegen.md), generates kernels for them with
+utils/codegen_tl1.py / codegen_tl2.py, compiles a small microbenchmark around
+ggml_preprocessor + ggml_qgemm_lut and keeps the fastest tile per shape.
+
+Results are cached under tuned_kernels/<model>/<kernel>-<host key>/, where the
+host key hashes the CPU model, the ISA features the compiler sees with
+-march=native and the compiler version, so identical workstations reuse one
+tuning run.
+
+Usage:
+    python utils/autotune_kernels.py --model bitnet_b1_58-large --kernel tl2
+    python utils/autotune_kernels.py --model bitnet_b1_58-large --kernel tl2 --install --cached-only
+"""
+
+import argparse
+import filecmp
+import hashlib
+import json
+import os
+import platform
+import re
+import shutil
+import subprocess
+import sys
+import tempfile
+import time
+from dataclasses import asdict, dataclass
+from pathlib import Path
+
+from kernel_shapes import model_shapes
+
+BACKEND_DIR = Path(__file__).resolve().parent.parent
+INCLUDE_DIR = BACKEND_DIR / "include"
+GGML_INCLUDE_DIR = BACKEND_DIR / "3rdparty" / "llama.cpp" / "ggml" / "include"
+TUNED_DIR = BACKEND_DIR / "tuned_kernels"
+
+KERNEL_HEADER = "bitnet-lut-kernels.h"
+KERNEL_CONFIG = "kernel_config.ini"
+TUNING_REPORT = "tuning.json"
+
+KERNELS = ("tl1", "tl2")
+COMPILERS = ("clang++", "g++")
+
+# Tile search space (constraints from docs/codegen.md)
+BM_CHOICES = (64, 128, 256, 512)
+BK_CHOICES = {
+    "tl1": (32, 64, 128, 256),
+    "tl2": (96, 192, 288, 384),     # multiples of 3 weights x 32 lanes
+}
+SUB_BM_CHOICES = {
+    "tl1": (32, 64),
+    "tl2": (32,),
+}
+
+# Batch sizes the generated TL2 kernels are instantiated for
+BATCH_SIZES = (1, 8, 32, 128, 256, 512)
+
+# ISA macros worth keying the cache on
+FEATURE_MACROS = (
+    "__AVX__", "__AVX2__", "__FMA__", "__F16C__", "__AVX512F__", "__AVX512BW__",
+    "__AVX512VL__", "__AVX512VNNI__", "__AVXVNNI__", "__ARM_NEON", "__ARM_FEATURE_DOTPROD",
+    "__ARM_FEATURE_MATMUL_INT8", "__ARM_FEATURE_SVE",
+)
+
+# Exit code for --cached-only when this host has no tuning yet
+EXIT_NOT_TUNED = 2
+
+
+@dataclass(frozen=True)
+class Tile:
+    """Tiling of one (M, K) weight: BM rows x BK columns, split into bm-row compute blocks."""
+    BM: int
+    BK: int
+    bm: int
+
+
+def valid_tiles(kernel, m, k):
+    """Every tile the codegen accepts for an (M, K) weight."""
+    tiles = []
+    for BM in BM_CHOICES:
+        if m % BM:
+            continue
+        for BK in BK_CHOICES[kernel]:
+            if BK > k:
+                continue
+            if kernel == "tl1" and k % BK:
+                continue
+            # TL2 computes the K % BK remainder with the TL1 path, 32 columns at a time
+            if kernel == "tl2" and (k % BK) % 32:
+                continue
+            for bm in SUB_BM_CHOICES[kernel]:
+                if BM % bm == 0:
+                    tiles.append(Tile(BM, BK, bm))
+    return tiles
+
+
+def find_compiler():
+    for name in COMPILERS:
+        if shutil.which(name):
+            return name
+    return None
+
+
+def _arch_flag():
+    return "-mcpu=native" if platform.machine().lower() in ("arm64", "aarch64") else "-march=native"
+
+
+def compiler_features(compiler):
+    """ISA feature macros the compiler defines for this CPU with native tuning."""
+    try:
+        result = subprocess.run(
+            [compiler, _arch_flag(), "-dM", "-E", "-x", "c++", os.devnull],
+            capture_output=True, text=True, check=True
+        )
+    except (OSError, subprocess.CalledProcessError):
+        return []
+    defined = set(re.findall(r"#define (\w+)", result.stdout))
+    return [macro for macro in FEATURE_MACROS if macro in defined]
+
+
+def cpu_model():
+    """Human-readable CPU model string."""
+    if platform.system() == "Linux":
+        try:
+            with open("/proc/cpuinfo") as f:
+                for line in f:
+                    if line.startswith(("model name", "Model")):
+                        return line.split(":", 1)[1].strip()
+        except OSError:
+            pass
+    elif platform.system() == "Darwin":
+        try:
+            return subprocess.run(
+                ["sysctl", "-n", "machdep.cpu.brand_string"],
+                capture_output=True, text=True, check=True
+            ).stdout.strip()
+        except (OSError, subprocess.CalledProcessError):
+            pass
+    return os.environ.get("PROCESSOR_IDENTIFIER") or platform.processor() or platform.machine()
+
+
+def host_signature(compiler):
+    """What the tuned tiles depend on: CPU, ISA features, compiler."""
+    try:
+        version = subprocess.run(
+            [compiler, "--version"], capture_output=True, text=True, check=True
+        ).stdout.splitlines()[0]
+    except (OSError, subprocess.CalledProcessError, IndexError):
+        version = compiler
+    return {
+        "cpu": cpu_model(),
+        "machine": platform.machine(),
+        "features": compiler_features(compiler),
+        "compiler": version,
+    }
+
+
+def host_key(signature):
+    text = json.dumps(signature, sort_keys=True)
+    return hashlib.sha1(text.encode()).hexdigest()[:12]
+
+
+def cache_dir(model, kernel, signature):
+    return TUNED_DIR / model / f"{kernel}-{host_key(signature)}"
+
+
+def generate_kernels(kernel, model, tiles, output_dir):
+    """Run the codegen for one tile per shape, writing header + config to output_dir."""
+    codegen = BACKEND_DIR / "utils" / f"codegen_{kernel}.py"
+    if not codegen.exists():
+        raise FileNotFoundError(f"{codegen} not found; the autotuner needs the kernel codegen")
+    cmd = [
+        sys.executable, str(codegen),
+        "--model", model,
+        "--BM", ",".join(str(tile.BM) for tile in tiles),
+        "--BK", ",".join(str(tile.BK) for tile in tiles),
+        "--bm", ",".join(str(tile.bm) for tile in tiles),
+        "--output-dir", str(output_dir),
+    ]
+    subprocess.run(cmd, check=True, capture_output=True, text=True)
+
+
+HARNESS_TL1 = """
+static void run_shape(const Shape& s, void* A, void* B, void* lut, void* lut_scales, void* scales, void* C, int) {
+    ggml_preprocessor(s.m, s.k, B, lut_scales, lut);
+    ggml_qgemm_lut(s.m, s.k, A, lut, scales, lut_scales, C);
+}
+"""
+
+HARNESS_TL2 = """
+static void run_shape(const Shape& s, void* A, void* B, void* lut, void* lut_scales, void* scales, void* C, int bs) {
+    const int three_k = s.k / s.bk * s.bk;
+    const int two_k = s.k - three_k;
+    int8_t* three_lut = (int8_t*) lut;
+    int8_t* two_lut = three_lut + (size_t) bs * three_k / 3 * 32;
+    uint8_t* sign = (uint8_t*) A + (size_t) s.m * s.k / 2;
+    uint8_t* two_A = (uint8_t*) A + (size_t) s.m * three_k / 3 * 5 / 8;
+    ggml_preprocessor(bs, s.m, three_k, two_k, B, lut_scales, three_lut, two_lut);
+    ggml_qgemm_lut(bs, s.m, s.k, three_k, A, sign, three_lut, scales, lut_scales, C);
+    if (two_k) {
+        ggml_qgemm_lut(bs, s.m, s.k, two_k, two_A, nullptr, two_lut, scales, lut_scales, C);
+    }
+}
+"""
+
+HARNESS_MAIN = """
+int main(int argc, char** argv) {
+    const int bs = argc > 1 ? atoi(argv[1]) : 1;
+    const int iters = argc > 2 ? atoi(argv[2]) : 50;
+    srand(0);
+    for (const Shape& s : SHAPES) {
+        // generous buffers: timing only, the values are random
+        const size_t bytes = (size_t) s.m * s.k + (size_t) bs * s.k * 32 + (size_t) bs * s.m * 8 + 4096;
+        void* A = aligned_malloc(bytes);
+        void* lut = aligned_malloc(bytes);
+        void* C = aligned_malloc(bytes);
+        float* B = (float*) aligned_malloc((size_t) bs * s.k * sizeof(float) + 64);
+        float* lut_scales = (float*) aligned_malloc((size_t) (bs + 16) * sizeof(float));
+        float* scales = (float*) aligned_malloc(64 * sizeof(float));
+        for (size_t i = 0; i < bytes; i++) ((uint8_t*) A)[i] = (uint8_t) rand();
+        for (int i = 0; i < bs * s.k; i++) B[i] = (float) rand() / RAND_MAX - 0.5f;
+        for (int i = 0; i < 64; i++) scales[i] = 1.0f;
+
+        for (int i = 0; i < 5; i++) run_shape(s, A, B, lut, lut_scales, scales, C, bs);
+        std::vector<double> times;
+        for (int i = 0; i < iters; i++) {
+            auto start = std::chrono::high_resolution_clock::now();
+            run_shape(s, A, B, lut, lut_scales, scales, C, bs);
+            auto end = std::chrono::high_resolution_clock::now();
+            times.push_back(std::chrono::duration<double, std::nano>(end - start).count());
+        }
+        std::sort(times.begin(), times.end());
+        printf("%d %d %.0f\\n", s.m, s.k, times[times.size() / 2]);
+
+        aligned_free(A); aligned_free(lut); aligned_free(C);
+        aligned_free(B); aligned_free(lut_scales); aligned_free(scales);
+    }
+    return 0;
+}
+"""
+
+
+def write_harness(kernel, shapes, tiles, path):
+    """Microbenchmark source timing every shape with the tiles compiled into the header."""
+    rows = ",\n".join(f"    {{{m}, {k}, {tile.BK}}}" for (m, k), tile in zip(shapes, tiles))
+    source = "\n".join([
+        "#include <algorithm>",
+        "#include <chrono>",
+        "#include <cstdio>",
+        "#include <cstdlib>",
+        "#include <vector>",
+        f'#include "{KERNEL_HEADER}"',
+        "",
+        "struct Shape { int m; int k; int bk; };",
+        f"static const Shape SHAPES[] = {{\n{rows}\n}};",
+        HARNESS_TL1 if kernel == "tl1" else HARNESS_TL2,
+        HARNESS_MAIN,
+    ])
+    Path(path).write_text(source)
+
+
+def compile_harness(compiler, kernel, work_dir):
+    define = "GGML_BITNET_ARM_TL1" if kernel == "tl1" else "GGML_BITNET_X86_TL2"
+    exe = Path(work_dir) / ("bench.exe" if platform.system() == "Windows" else "bench")
+    cmd = [
+        compiler, "-O3", _arch_flag(), "-std=c++17", f"-D{define}", "-fpermissive",
+        f"-I{work_dir}", f"-I{INCLUDE_DIR}", f"-I{GGML_INCLUDE_DIR}",
+        str(Path(work_dir) / "bench.cpp"), "-o", str(exe),
+    ]
+    subprocess.run(cmd, check=True, capture_output=True, text=True)
+    return exe
+
+
+def run_harness(exe, batch_size, iterations):
+    """Median nanoseconds per (M, K) shape."""
+    result = subprocess.run(
+        [str(exe), str(batch_size), str(iterations)],
+        check=True, capture_output=True, text=True
+    )
+    timings = {}
+    for line in result.stdout.splitlines():
+        m, k, ns = line.split()
+        timings[(int(m), int(k))] = float(ns)
+    return timings
+
+
+def autotune(model, kernel, compiler, batch_size=1, iterations=50, max_candidates=None):
+    """
+    Benchmark every valid tile per shape. Each build uses the i-th candidate of
+    every shape at once, so the number of builds is the longest candidate list,
+    not the product of all of them.
+
+    Returns (best tile per shape, report dict).
+    """
+    shapes = model_shapes(model)
+    candidates = [valid_tiles(kernel, m, k) for m, k in shapes]
+    for (m, k), tiles in zip(shapes, candidates):
+        if not tiles:
+            raise ValueError(f"no valid {kernel} tile for shape {m}x{k}")
+    if max_candidates:
+        candidates = [tiles[:max_candidates] for tiles in candidates]
+
+    rounds = max(len(tiles) for tiles in candidates)
+    measured = [dict() for _ in shapes]
+    with tempfile.TemporaryDirectory(prefix="bitnet-autotune-") as work_dir:
+        for r in range(rounds):
+            tiles = [options[min(r, len(options) - 1)] for options in candidates]
+            print(f"[{r + 1}/{rounds}] " + ", ".join(
+                f"{m}x{k}: BM={t.BM} BK={t.BK} bm={t.bm}" for (m, k), t in zip(shapes, tiles)
+            ))
+            start = time.time()
+            try:
+                generate_kernels(kernel, model, tiles, work_dir)
+                write_harness(kernel, shapes, tiles, Path(work_dir) / "bench.cpp")
+                exe = compile_harness(compiler, kernel, work_dir)
+                timings = run_harness(exe, batch_size, iterations)
+            except subprocess.CalledProcessError as e:
+                print(f"    skipped: {(e.stderr or str(e)).strip().splitlines()[-1:]}")
+                continue
+            for i, (shape, tile) in enumerate(zip(shapes, tiles)):
+                if tile not in measured[i] and shape in timings:
+                    measured[i][tile] = timings[shape]
+            print(f"    {', '.join(f'{timings.get(s, 0) / 1000:.1f}us' for s in shapes)} "
+                  f"(build + run {time.time() - start:.0f}s)")
+
+    best = []
+    for (m, k), results in zip(shapes, measured):
+        if not results:
+            raise RuntimeError(f"no tile could be built and measured for shape {m}x{k}")
+        best.append(min(results, key=results.get))
+
+    report = {
+        "model": model,
+        "kernel": kernel,
+        "batch_size": batch_size,
+        "shapes": [
+            {
+                "m": m,
+                "k": k,
+                "best": asdict(tile),
+                "results": [
+                    {**asdict(t), "ns": ns} for t, ns in sorted(results.items(), key=lambda item: item[1])
+                ],
+            }
+            for (m, k), tile, results in zip(shapes, best, measured)
+        ],
+    }
+    return best, report
+
+
+def save_tuning(model, kernel, best, report, signature, target_dir):
+    """Generate the final kernels for the best tiles and store them with the report."""
+    target_dir.mkdir(parents=True, exist_ok=True)
+    generate_kernels(kernel, model, best, target_dir)
+    report = {**report, "host": signature, "tuned_at": time.strftime("%Y-%m-%d %H:%M:%S")}
+    (target_dir / TUNING_REPORT).write_text(json.dumps(report, indent=2))
+
+
+def install(source_dir, include_dir=INCLUDE_DIR):
+    """Copy a tuned header + config into include_dir for the build (untouched if identical, to keep builds incremental)."""
+    for name in (KERNEL_HEADER, KERNEL_CONFIG):
+        target = Path(include_dir) / name
+        if not (target.exists() and filecmp.cmp(source_dir / name, target, shallow=False)):
+            shutil.copyfile(source_dir / name, target)
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Autotune TL1/TL2 kernel tiles for this CPU")
+    parser.add_argument("--model", default="bitnet_b1_58-large",
+                        help="Model directory name under models/ (reads config.json)")
+    parser.add_argument("--kernel", choices=KERNELS, default="tl2", help="Kernel family")
+    parser.add_argument("--batch-size", type=int, default=1, choices=BATCH_SIZES,
+                        help="Activation rows per benchmark call (1 = token generation)")
+    parser.add_argument("--iterations", type=int, default=50, help="Timed runs per shape")
+    parser.add_argument("--max-candidates", type=int, default=None,
+                        help="Limit candidate tiles per shape")
+    parser.add_argument("--retune", action="store_true", help="Ignore cached results for this host")
+    parser.add_argument("--cached-only", action="store_true",
+                        help=f"Never tune; exit {EXIT_NOT_TUNED} if this host has no cached result")
+    parser.add_argument("--install", action="store_true",
+                        help="Copy the tuned kernels into --install-dir")
+    parser.add_argument("--install-dir", default=str(INCLUDE_DIR),
+                        help="Where --install copies them (setup_env.py uses generated_kernels/)")
+    args = parser.parse_args()
+
+    compiler = find_compiler()
+    if compiler is None:
+        print(f"No C++ compiler found (tried {', '.join(COMPILERS)})")
+        sys.exit(1)
+
+    signature = host_signature(compiler)
+    target_dir = cache_dir(args.model, args.kernel, signature)
+    print(f"Host: {signature['cpu']} [{' '.join(signature['features']) or 'no SIMD macros'}]")
+    print(f"Cache: {target_dir}")
+
+    cached = (target_dir / TUNING_REPORT).exists()
+    if args.cached_only and not cached:
+        print("No tuned kernels for this host")
+        sys.exit(EXIT_NOT_TUNED)
+
+    if not cached or args.retune:
+        best, report = autotune(
+            args.model, args.kernel, compiler,
+            batch_size=args.batch_size, iterations=args.iterations,
+            max_candidates=args.max_candidates
+        )
+        save_tuning(args.model, args.kernel, best, report, signature, target_dir)
+        for shape in report["shapes"]:
+            tile = shape["best"]
+            print(f"{shape['m']}x{shape['k']}: BM={tile['BM']} BK={tile['BK']} bm={tile['bm']}")
+
+    if args.install:
+        Path(args.install_dir).mkdir(parents=True, exist_ok=True)
+        install(target_dir, args.install_dir)
+        print(f"Installed tuned {args.kernel} kernels into {args.install_dir}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,437 @@
+#!/usr/bin/env python3
+"""
+TL1 LUT kernel generator (ARM NEON).
+
+Writes include/bitnet-lut-kernels.h and include/kernel_config.ini for the
+matmul shapes of a model (read from models/<model>/config.json), with one
+(BM, BK, bm) tiling per shape. See docs/codegen.md for how the weight is cut
+into tiles and the constraints a tiling has to meet.
+
+Usage:
+    python utils/codegen_tl1.py --model bitnet_b1_58-large --BM 256,128,256 --BK 128,64,128 --bm 32,64,32
+"""
+
+import argparse
+import sys
+from pathlib import Path
+from string import Template
+
+from kernel_shapes import BACKEND_DIR, model_shapes, parse_list, write_kernel_config
+
+SUB_BM_CHOICES = (32, 64)
+
+# Shape-independent part: scale quantization, LUT construction, type check
+PREAMBLE = """#if defined(GGML_BITNET_ARM_TL1)
+#include "ggml-bitnet.h"
+#define GGML_BITNET_MAX_NODES 8192
+static bool initialized = false;
+static bitnet_tensor_extra * bitnet_tensor_extras = nullptr;
+static size_t bitnet_tensor_extras_index = 0;
+static void * aligned_malloc(size_t size) {
+#if defined(_WIN32)
+    return _aligned_malloc(size, 64);
+#else
+    void * ptr = nullptr;
+    posix_memalign(&ptr, 64, size);
+    return ptr;
+#endif
+}
+static void aligned_free(void * ptr) {
+#if defined(_WIN32)
+    _aligned_free(ptr);
+#else
+    free(ptr);
+#endif
+}
+
+void per_tensor_quant(int k, void* lut_scales_, void* b_) {
+    bitnet_float_type* lut_scales = (bitnet_float_type*)lut_scales_;
+    bitnet_float_type* b = (bitnet_float_type*)b_;
+#ifdef __ARM_NEON
+    float32x4_t temp_max = vdupq_n_f32(0);
+    for (int i=0; i < k / 4; i++) {
+      float32x4_t vec_bs = vld1q_f32(b + 4 * i);
+      float32x4_t abssum = vabsq_f32(vec_bs);
+      temp_max = vmaxq_f32(abssum, temp_max);
+    }
+    float32_t scales = 127 / vmaxvq_f32(temp_max);
+    *lut_scales = scales;
+#elif defined __AVX2__
+    __m256 max_vec = _mm256_set1_ps(0.f);
+    const __m256 vec_sign = _mm256_set1_ps(-0.0f);
+    // #pragma unroll
+    for (int i = 0; i < k / 8; i++) {
+        __m256 vec_b = _mm256_loadu_ps(b + i * 8);
+        __m256 vec_babs = _mm256_andnot_ps(vec_sign, vec_b);
+        max_vec = _mm256_max_ps(vec_babs, max_vec);
+    }
+    __m128 max1 = _mm_max_ps(_mm256_extractf128_ps(max_vec, 1), _mm256_castps256_ps128(max_vec));
+    max1 = _mm_max_ps(max1, _mm_movehl_ps(max1, max1));
+    max1 = _mm_max_ss(max1, _mm_movehdup_ps(max1));
+    float scales = 127 / _mm_cvtss_f32(max1);
+    *lut_scales = scales;
+#endif
+}
+
+void partial_max_reset(void* lut_scales_) {
+    bitnet_float_type* lut_scales = (bitnet_float_type*)lut_scales_;
+    *lut_scales = 0.0;
+}
+
+#ifdef __ARM_NEON
+inline void Transpose_8_8(
+    int16x8_t *v0,
+    int16x8_t *v1,
+    int16x8_t *v2,
+    int16x8_t *v3,
+    int16x8_t *v4,
+    int16x8_t *v5,
+    int16x8_t *v6,
+    int16x8_t *v7)
+{
+    int16x8x2_t q04 = vzipq_s16(*v0, *v4);
+    int16x8x2_t q15 = vzipq_s16(*v1, *v5);
+    int16x8x2_t q26 = vzipq_s16(*v2, *v6);
+    int16x8x2_t q37 = vzipq_s16(*v3, *v7);
+
+    int16x8x2_t q0246_0 = vzipq_s16(q04.val[0], q26.val[0]);
+    int16x8x2_t q0246_1 = vzipq_s16(q04.val[1], q26.val[1]);
+    int16x8x2_t q1357_0 = vzipq_s16(q15.val[0], q37.val[0]);
+    int16x8x2_t q1357_1 = vzipq_s16(q15.val[1], q37.val[1]);
+
+    int16x8x2_t q_fin_0 = vzipq_s16(q0246_0.val[0], q1357_0.val[0]);
+    int16x8x2_t q_fin_1 = vzipq_s16(q0246_0.val[1], q1357_0.val[1]);
+    int16x8x2_t q_fin_2 = vzipq_s16(q0246_1.val[0], q1357_1.val[0]);
+    int16x8x2_t q_fin_3 = vzipq_s16(q0246_1.val[1], q1357_1.val[1]);
+
+    *v0 = q_fin_0.val[0];
+    *v1 = q_fin_0.val[1];
+    *v2 = q_fin_1.val[0];
+    *v3 = q_fin_1.val[1];
+    *v4 = q_fin_2.val[0];
+    *v5 = q_fin_2.val[1];
+    *v6 = q_fin_3.val[0];
+    *v7 = q_fin_3.val[1];
+}
+#endif
+
+template<int act_k>
+inline void lut_ctor(int8_t* qlut, bitnet_float_type* b, bitnet_float_type* lut_scales) {
+#ifdef __ARM_NEON
+    int16x8_t vec_lut[16];
+    float32_t scales = *lut_scales;
+        uint8_t tbl_mask[16];
+        tbl_mask[0] = 0;
+        tbl_mask[1] = 2;
+        tbl_mask[2] = 4;
+        tbl_mask[3] = 6;
+        tbl_mask[4] = 8;
+        tbl_mask[5] = 10;
+        tbl_mask[6] = 12;
+        tbl_mask[7] = 14;
+        tbl_mask[8] = 1;
+        tbl_mask[9] = 3;
+        tbl_mask[10] = 5;
+        tbl_mask[11] = 7;
+        tbl_mask[12] = 9;
+        tbl_mask[13] = 11;
+        tbl_mask[14] = 13;
+        tbl_mask[15] = 15;
+        uint8x16_t tbl_mask_q = vld1q_u8(tbl_mask);
+#pragma unroll
+    for (int k = 0; k < act_k / 16; ++k) {
+        float32x4x2_t vec_bs_x0 = vld2q_f32(b + k * 16);
+        float32x4x2_t vec_bs_x1 = vld2q_f32(b + k * 16 + 8);
+        float32x4_t vec_f_0 = vmulq_n_f32(vec_bs_x0.val[0], scales);
+        float32x4_t vec_f_1 = vmulq_n_f32(vec_bs_x0.val[1], scales);
+        float32x4_t vec_f_2 = vmulq_n_f32(vec_bs_x1.val[0], scales);
+        float32x4_t vec_f_3 = vmulq_n_f32(vec_bs_x1.val[1], scales);
+        int32x4_t vec_b_0 = vcvtnq_s32_f32(vec_f_0);
+        int32x4_t vec_b_1 = vcvtnq_s32_f32(vec_f_1);
+        int32x4_t vec_b_2 = vcvtnq_s32_f32(vec_f_2);
+        int32x4_t vec_b_3 = vcvtnq_s32_f32(vec_f_3);
+        int16x4_t vec_b16_0 = vmovn_s32(vec_b_0);
+        int16x4_t vec_b16_1 = vmovn_s32(vec_b_1);
+        int16x4_t vec_b16_2 = vmovn_s32(vec_b_2);
+        int16x4_t vec_b16_3 = vmovn_s32(vec_b_3);
+        int16x8_t vec_bs_0 = vcombine_s16(vec_b16_0, vec_b16_2);
+        int16x8_t vec_bs_1 = vcombine_s16(vec_b16_1, vec_b16_3);
+        vec_lut[0] = vdupq_n_s16(0);
+        vec_lut[0] = vec_lut[0] - vec_bs_0;
+        vec_lut[0] = vec_lut[0] - vec_bs_1;
+        vec_lut[1] = vdupq_n_s16(0);
+        vec_lut[1] = vec_lut[1] - vec_bs_0;
+        vec_lut[2] = vdupq_n_s16(0);
+        vec_lut[2] = vec_lut[2] - vec_bs_0;
+        vec_lut[2] = vec_lut[2] + vec_bs_1;
+        vec_lut[3] = vdupq_n_s16(0);
+        vec_lut[3] = vec_lut[3] - vec_bs_1;
+        vec_lut[4] = vdupq_n_s16(0);
+        vec_lut[5] = vec_bs_1;
+        vec_lut[6] = vec_bs_0;
+        vec_lut[6] = vec_lut[6] - vec_bs_1;
+        vec_lut[7] = vec_bs_0;
+        vec_lut[8] = vec_bs_0;
+        vec_lut[8] = vec_lut[8] + vec_bs_1;
+        Transpose_8_8(&(vec_lut[0]), &(vec_lut[1]), &(vec_lut[2]), &(vec_lut[3]),
+                      &(vec_lut[4]), &(vec_lut[5]), &(vec_lut[6]), &(vec_lut[7]));
+        Transpose_8_8(&(vec_lut[8]), &(vec_lut[9]), &(vec_lut[10]), &(vec_lut[11]),
+                      &(vec_lut[12]), &(vec_lut[13]), &(vec_lut[14]), &(vec_lut[15]));
+#pragma unroll
+        for (int idx = 0; idx < 8; idx++) {
+            int8x16_t q0_s = vqtbl1q_s8(vreinterpretq_s8_s16(vec_lut[idx]), tbl_mask_q);
+            int8x8_t q0_low = vget_low_s8(q0_s);
+            int8x8_t q0_high = vget_high_s8(q0_s);
+            int8x16_t q1_s = vqtbl1q_s8(vreinterpretq_s8_s16(vec_lut[idx + 8]), tbl_mask_q);
+            int8x8_t q1_low = vget_low_s8(q1_s);
+            int8x8_t q1_high = vget_high_s8(q1_s);
+            vst1_s8(qlut + k * 16 * 8 * 2 + idx * 16 * 2, q0_high);
+            vst1_s8(qlut + k * 16 * 8 * 2 + idx * 16 * 2 + 8, q1_high);
+            vst1_s8(qlut + k * 16 * 8 * 2 + idx * 16 * 2 + 16, q0_low);
+            vst1_s8(qlut + k * 16 * 8 * 2 + idx * 16 * 2 + 24, q1_low);
+        }
+    }
+#endif
+}
+
+static bool is_type_supported(enum ggml_type type) {
+    if (type == GGML_TYPE_Q4_0 ||
+        type == GGML_TYPE_TL1) {
+        return true;
+    } else {
+        return false;
+    }
+}
+"""
+
+TBL_IMPL_HEAD = Template("""\
+#include <arm_neon.h>
+
+#define BM${m}_${k} ${BM}
+#define BBK${m}_${k} ${BK}
+inline void tbl_impl_${m}_${k}(int32_t* c, int8_t* lut, uint8_t* a) {
+#ifdef __ARM_NEON
+    const int KK = BBK${m}_${k} / 2;
+    const uint8x16_t vec_mask = vdupq_n_u8(0x0f);
+    const int8x16_t vec_zero = vdupq_n_s16(0x0000);
+    int8x16_t vec_lut[2 * KK];
+    int16x8_t vec_c[${acc}];
+#pragma unroll
+    for (int k = 0; k < 2 * KK; k++) {
+        vec_lut[k] = vld1q_s8(lut + k * 16);
+    }
+
+#pragma unroll
+    for (int i = 0; i < BM${m}_${k}; i += ${bm}) {
+        #pragma unroll
+        for (int i=0; i<${acc}; i++) {
+            vec_c[i] = vandq_s16(vec_c[i], vec_zero);
+        }
+
+#pragma unroll
+        for (int k = 0; k < KK / ${k_step}; k++) {
+""")
+
+# One 16-byte load of weight indices: 32 rows x 2 activation pairs
+TBL_IMPL_LOAD = Template("""\
+            uint8x16_t vec_a_${j} = vld1q_u8(a + i * KK / 2 + k * 32 * 2 + ${j} * 16);
+            uint8x16_t vec_a${j}_top = vshrq_n_u8(vec_a_${j}, 4);
+            uint8x16_t vec_a${j}_bot = vandq_u8(vec_a_${j}, vec_mask);
+            int8x16_t  vec_v_${j}_left_tmp0 = vqtbl1q_s8(vec_lut[${lut_step} * k + ${lut0}], vec_a${j}_top);
+            int8x16_t  vec_v_${j}_left_tmp1 = vqtbl1q_s8(vec_lut[${lut_step} * k + ${lut1}], vec_a${j}_top);
+            int8x16_t  vec_v_${j}_right_tmp0 = vqtbl1q_s8(vec_lut[${lut_step} * k + ${lut2}], vec_a${j}_bot);
+            int8x16_t  vec_v_${j}_right_tmp1 = vqtbl1q_s8(vec_lut[${lut_step} * k + ${lut3}], vec_a${j}_bot);
+            int8x16x2_t  vec_v_left_${j} = vzipq_s8(vec_v_${j}_left_tmp1, vec_v_${j}_left_tmp0);
+            int8x16x2_t  vec_v_right_${j} = vzipq_s8(vec_v_${j}_right_tmp1, vec_v_${j}_right_tmp0);
+            vec_c[${c0}] += vec_v_left_${j}.val[0];
+            vec_c[${c0}] += vec_v_right_${j}.val[0];
+            vec_c[${c1}] += vec_v_left_${j}.val[1];
+            vec_c[${c1}] += vec_v_right_${j}.val[1];
+""")
+
+TBL_IMPL_STORE = Template("""\
+        int32x4_t vec_v_bot_low_low_${j} = vmovl_s16(vget_low_s16(vec_c[${j}]));
+        int32x4_t vec_v_bot_low_high_${j} = vmovl_high_s16(vec_c[${j}]);
+        vst1q_s32(c + i + ${lo}, vld1q_s32(c + i + ${lo}) + vec_v_bot_low_low_${j});
+        vst1q_s32(c + i + ${hi}, vld1q_s32(c + i + ${hi}) + vec_v_bot_low_high_${j});
+""")
+
+QGEMM = Template("""\
+
+    }
+#endif
+}
+
+int32_t qgemm_lut_${m}_${k}(void* A, void* LUT, void* Scales, void* LUT_Scales, void* C) {
+    alignas(32) uint32_t CBits[BM${m}_${k}];
+    memset(&(CBits[0]), 0, BM${m}_${k} * sizeof(int32_t));
+#pragma unroll
+    for (int32_t k_outer = 0; k_outer < ${k} / BBK${m}_${k}; ++k_outer) {
+        tbl_impl_${m}_${k}((&(((int32_t*)CBits)[0])), (&(((int8_t*)LUT)[(k_outer * BBK${m}_${k} / 2 * 32)])), (&(((uint8_t*)A)[(k_outer * BBK${m}_${k} / 2 / 2 * BM${m}_${k})])));
+    }
+#pragma unroll
+    for (int i = 0; i < BM${m}_${k}; i++) {
+        ((bitnet_float_type*)C)[i] = (((int32_t*)CBits)[i]) / ((bitnet_float_type*)LUT_Scales)[0] * ((bitnet_float_type*)Scales)[0];
+    }
+  return 0;
+};
+""")
+
+PREPROCESSOR = """
+template<int K>
+void preprocessor_k(void* B, void* LUT_Scales, void* QLUT) {
+  partial_max_reset((&(((bitnet_float_type*)LUT_Scales)[0])));
+  per_tensor_quant(K, (&(((bitnet_float_type*)LUT_Scales)[0])), (&(((bitnet_float_type*)B)[0])));
+
+  lut_ctor<K>((&(((int8_t*)QLUT)[0])), (&(((bitnet_float_type*)B)[0])), (&(((bitnet_float_type*)LUT_Scales)[0])));
+}
+"""
+
+TRANSFORM_HEAD = """
+void ggml_bitnet_transform_tensor(struct ggml_tensor * tensor) {
+    if (!(is_type_supported(tensor->type) && tensor->backend == GGML_BACKEND_TYPE_CPU && tensor->extra == nullptr)) {
+        return;
+    }
+
+    int k = tensor->ne[0];
+    int m = tensor->ne[1];
+    const int lut_scales_size = 1;
+    const int scales_size = 1;
+    int bk = 0;
+    int bm = 0;
+"""
+
+TRANSFORM_TAIL = """
+    const int n_tile_num = m / bm;
+    const int BK = bk;
+    uint8_t * qweights;
+    bitnet_float_type * scales;
+
+    scales = (bitnet_float_type *) aligned_malloc(sizeof(bitnet_float_type));
+    qweights = (uint8_t *) tensor->data;
+    float * i2_scales = (float * )(qweights + k * m / 4);
+    scales[0] = (bitnet_float_type) i2_scales[0];
+
+    tensor->extra = bitnet_tensor_extras + bitnet_tensor_extras_index;
+    bitnet_tensor_extras[bitnet_tensor_extras_index++] = {
+        /* .lut_scales_size = */ lut_scales_size,
+        /* .scales_size     = */ scales_size,
+        /* .n_tile_num      = */ n_tile_num,
+        /* .qweights        = */ qweights,
+        /* .scales          = */ scales
+    };
+}
+#endif
+"""
+
+
+def check_tiles(shapes, tiles):
+    """Raise ValueError unless every (BM, BK, bm) meets the TL1 constraints for its (M, K)."""
+    if len(tiles) != len(shapes):
+        raise ValueError(f"expected {len(shapes)} values for --BM/--BK/--bm (one per shape {shapes}), got {len(tiles)}")
+    for (m, k), (BM, BK, bm) in zip(shapes, tiles):
+        shape = f"[{m}, {k}] with BM={BM}, BK={BK}, bm={bm}"
+        if m % BM:
+            raise ValueError(f"{shape}: M % BM must be 0")
+        if k % BK:
+            raise ValueError(f"{shape}: K % BK must be 0")
+        if bm not in SUB_BM_CHOICES:
+            raise ValueError(f"{shape}: bm must be one of {SUB_BM_CHOICES}")
+        if BM % bm:
+            raise ValueError(f"{shape}: BM % bm must be 0")
+
+
+def gen_tbl_impl(m, k, BM, BK, bm):
+    """Table-lookup kernel and qgemm for one shape; each i-step covers bm rows."""
+    acc = bm // 8           # int16x8 accumulators per bm rows
+    lut_step = 256 // bm    # LUT vectors consumed per k step
+    k_step = lut_step // 2
+    lines = [TBL_IMPL_HEAD.substitute(m=m, k=k, BM=BM, BK=BK, bm=bm, acc=acc, k_step=k_step) + "            \n"]
+    for j in range(4):
+        lut = [(4 * j + n) % lut_step for n in range(4)]
+        c0 = (2 * j) // (lut_step // 2) * 2
+        lines.append(TBL_IMPL_LOAD.substitute(
+            j=j, lut_step=lut_step, lut0=lut[0], lut1=lut[1], lut2=lut[2], lut3=lut[3], c0=c0, c1=c0 + 1,
+        ))
+        lines.append("        \n")
+    lines.append("       }\n\n")
+    for j in range(acc):
+        lines.append(TBL_IMPL_STORE.substitute(j=j, lo=8 * j, hi=8 * j + 4))
+    lines.append(QGEMM.substitute(m=m, k=k))
+    return "".join(lines)
+
+
+def gen_dispatch(shapes):
+    """ggml_preprocessor / ggml_qgemm_lut branching on the weight shape."""
+    preprocessor = []
+    qgemm = []
+    for i, (m, k) in enumerate(shapes):
+        branch = "if" if i == 0 else "else if"
+        preprocessor.append(
+            f"    {branch} (m == {m} && k == {k}) {{\n"
+            f"        preprocessor_k<{k}>(B, LUT_Scales, QLUT);\n"
+            f"    }}\n"
+        )
+        qgemm.append(
+            f"    {branch} (m == {m} && k == {k}) {{\n"
+            f"        qgemm_lut_{m}_{k}(A, LUT, Scales, LUT_Scales, C);\n"
+            f"    }}\n"
+        )
+    return (
+        "void ggml_preprocessor(int m, int k, void* B, void* LUT_Scales, void* QLUT) {\n"
+        + "".join(preprocessor) + "}\n"
+        "void ggml_qgemm_lut(int m, int k, void* A, void* LUT, void* Scales, void* LUT_Scales, void* C) {\n"
+        + "".join(qgemm) + "}\n"
+    )
+
+
+def gen_transform(shapes):
+    """ggml_bitnet_transform_tensor: picks the tiling of the tensor's shape."""
+    branches = []
+    for i, (m, k) in enumerate(shapes):
+        branches.append(
+            f"{'    if' if i == 0 else 'else if'} (m == {m} && k == {k}) {{\n"
+            f"        bm = BM{m}_{k};\n"
+            f"        bk = BBK{m}_{k};\n"
+            f"    }}\n"
+        )
+    return TRANSFORM_HEAD + "\n" + "".join(branches) + TRANSFORM_TAIL
+
+
+def generate(shapes, tiles):
+    """Header source for TL1 kernels of the given (M, K) shapes and (BM, BK, bm) tiles."""
+    check_tiles(shapes, tiles)
+    kernels = [gen_tbl_impl(m, k, *tile) for (m, k), tile in zip(shapes, tiles)]
+    return PREAMBLE + "".join(kernels) + PREPROCESSOR + gen_dispatch(shapes) + gen_transform(shapes)
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Generate TL1 (ARM) LUT kernels for a model")
+    parser.add_argument("--model", required=True, help="Model directory name under models/ (or a path)")
+    parser.add_argument("--BM", type=parse_list, required=True, help="Comma-separated BM, one per shape")
+    parser.add_argument("--BK", type=parse_list, required=True, help="Comma-separated BK, one per shape")
+    parser.add_argument("--bm", type=parse_list, required=True, help="Comma-separated bm, one per shape")
+    parser.add_argument("--output-dir", default=str(BACKEND_DIR / "include"),
+                        help="Where to write bitnet-lut-kernels.h and kernel_config.ini")
+    args = parser.parse_args()
+
+    shapes = model_shapes(args.model)
+    if not len(args.BM) == len(args.BK) == len(args.bm):
+        print("--BM, --BK and --bm need the same number of values")
+        sys.exit(1)
+    tiles = list(zip(args.BM, args.BK, args.bm))
+    try:
+        header = generate(shapes, tiles)
+    except ValueError as e:
+        print(f"Invalid tiling: {e}")
+        sys.exit(1)
+
+    output_dir = Path(args.output_dir)
+    output_dir.mkdir(parents=True, exist_ok=True)
+    (output_dir / "bitnet-lut-kernels.h").write_text(header)
+    write_kernel_config(output_dir / "kernel_config.ini", shapes, tiles)
+    print(f"Wrote TL1 kernels for {', '.join(f'[{m}, {k}]' for m, k in shapes)} to {output_dir}")
+
+
+if __name__ == "__main__":
+    main()
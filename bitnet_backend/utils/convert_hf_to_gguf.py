@@ -0,0 +1,362 @@
+#!/usr/bin/env python3
+"""
+Convert a Hugging Face BitNet b1.58 checkpoint to GGUF (i2_s, TL1 or TL2).
+
+Weights are read through memory maps (safetensors directly; pytorch_model.bin
+through torch.load(mmap=True)), ternarized with the absmean rule of
+utils_quant.weight_quant and packed in the layouts of utils/lut_emulator.py.
+Tensors are converted in a process pool and written to the output in table
+order as they finish, with at most --jobs tensors in flight, so peak memory
+is a few tensors rather than the whole model.
+
+TL1/TL2 pack against the tiling in the kernel config the engine is built
+with, so run setup_env.py (or the autotuner) first.
+
+Usage:
+    python utils/convert_hf_to_gguf.py models/bitnet_b1_58-large
+    python utils/convert_hf_to_gguf.py models/bitnet_b1_58-large --quant-type tl2 --jobs 4
+"""
+
+import argparse
+import json
+import os
+import re
+import struct
+import sys
+import time
+from concurrent.futures import ProcessPoolExecutor
+from dataclasses import dataclass
+from pathlib import Path
+
+import numpy as np
+
+from gguf_file import (
+    GGML_TYPE_F16, GGML_TYPE_F32, GGML_TYPE_I2_S, GGML_TYPE_NAMES, GGML_TYPE_TL1, GGML_TYPE_TL2,
+    GGUF_TYPE_ARRAY, GGUF_TYPE_BOOL, GGUF_TYPE_FLOAT32, GGUF_TYPE_INT32, GGUF_TYPE_STRING, GGUF_TYPE_UINT32,
+    LLAMA_FTYPE_MOSTLY_I2_S, LLAMA_FTYPE_MOSTLY_TL1, LLAMA_FTYPE_MOSTLY_TL2,
+    TOKEN_TYPE_BYTE, TOKEN_TYPE_CONTROL, TOKEN_TYPE_NORMAL, TOKEN_TYPE_UNKNOWN, TOKEN_TYPE_UNUSED, TOKEN_TYPE_USER_DEFINED,
+    GGUFWriter, tensor_nbytes,
+)
+from kernel_shapes import BACKEND_DIR, read_kernel_config
+from lut_emulator import pack_i2_s, tl1_pack, tl2_pack, weight_quant
+
+ARCH = "bitnet"
+
+QUANT_TYPES = {
+    "i2_s": (GGML_TYPE_I2_S, LLAMA_FTYPE_MOSTLY_I2_S),
+    "tl1": (GGML_TYPE_TL1, LLAMA_FTYPE_MOSTLY_TL1),
+    "tl2": (GGML_TYPE_TL2, LLAMA_FTYPE_MOSTLY_TL2),
+}
+
+SAFETENSORS_DTYPES = {"F32": np.float32, "F16": np.float16, "BF16": np.uint16}
+
+# HF parameter name -> (GGUF name, kind); kind is "ternary", "f16" or "f32"
+TENSOR_NAMES = [
+    (r"model\.embed_tokens\.weight", "token_embd.weight", "f16"),
+    (r"model\.norm\.weight", "output_norm.weight", "f32"),
+    (r"lm_head\.weight", "output.weight", "f16"),
+    (r"model\.layers\.(\d+)\.input_layernorm\.weight", "blk.{}.attn_norm.weight", "f32"),
+    (r"model\.layers\.(\d+)\.post_attention_layernorm\.weight", "blk.{}.ffn_norm.weight", "f32"),
+    (r"model\.layers\.(\d+)\.self_attn\.inner_attn_ln\.weight", "blk.{}.attn_sub_norm.weight", "f32"),
+    (r"model\.layers\.(\d+)\.mlp\.ffn_layernorm\.weight", "blk.{}.ffn_sub_norm.weight", "f32"),
+    (r"model\.layers\.(\d+)\.self_attn\.q_proj\.weight", "blk.{}.attn_q.weight", "ternary"),
+    (r"model\.layers\.(\d+)\.self_attn\.k_proj\.weight", "blk.{}.attn_k.weight", "ternary"),
+    (r"model\.layers\.(\d+)\.self_attn\.v_proj\.weight", "blk.{}.attn_v.weight", "ternary"),
+    (r"model\.layers\.(\d+)\.self_attn\.o_proj\.weight", "blk.{}.attn_output.weight", "ternary"),
+    (r"model\.layers\.(\d+)\.mlp\.gate_proj\.weight", "blk.{}.ffn_gate.weight", "ternary"),
+    (r"model\.layers\.(\d+)\.mlp\.up_proj\.weight", "blk.{}.ffn_up.weight", "ternary"),
+    (r"model\.layers\.(\d+)\.mlp\.down_proj\.weight", "blk.{}.ffn_down.weight", "ternary"),
+]
+
+# Buffers some checkpoints save alongside the parameters
+SKIPPED = re.compile(r".*\.rotary_emb\.inv_freq")
+
+
+@dataclass(frozen=True)
+class TensorRef:
+    """Where a checkpoint tensor lives: safetensors byte range, or a key in a torch pickle."""
+    file: str
+    key: str
+    shape: tuple
+    dtype: str = ""
+    offset: int = 0
+
+
+@dataclass(frozen=True)
+class TensorTask:
+    """One output tensor: its source, how to convert it and the resulting size."""
+    name: str
+    ref: TensorRef
+    kind: str
+    ne: tuple
+    ggml_type: int
+    nbytes: int
+    quant_type: str = ""
+    tiling: object = None
+    rope_heads: int = 0
+
+
+# ---------------------------------------------------------------------------
+# Checkpoint reading
+# ---------------------------------------------------------------------------
+
+def safetensors_refs(path):
+    """Tensor table of a .safetensors file without touching the data."""
+    with open(path, "rb") as f:
+        header_len = struct.unpack("<Q", f.read(8))[0]
+        header = json.loads(f.read(header_len))
+    refs = {}
+    for key, info in header.items():
+        if key == "__metadata__":
+            continue
+        if info["dtype"] not in SAFETENSORS_DTYPES:
+            raise ValueError(f"{path}: unsupported dtype {info['dtype']} for {key}")
+        refs[key] = TensorRef(str(path), key, tuple(info["shape"]), info["dtype"], 8 + header_len + info["data_offsets"][0])
+    return refs
+
+
+_torch_checkpoints = {}
+
+
+def torch_checkpoint(path):
+    """State dict of a pytorch_model*.bin, memory-mapped and cached per process."""
+    if path not in _torch_checkpoints:
+        try:
+            import torch
+        except ImportError:
+            raise RuntimeError(f"Reading {Path(path).name} needs PyTorch; install it or convert the checkpoint to safetensors")
+        _torch_checkpoints[path] = torch.load(path, map_location="cpu", mmap=True, weights_only=True)
+    return _torch_checkpoints[path]
+
+
+def checkpoint_refs(model_dir):
+    """Every tensor of the checkpoint in model_dir (sharded or not), by HF name."""
+    model_dir = Path(model_dir)
+    refs = {}
+    files = sorted(model_dir.glob("*.safetensors"))
+    for path in files:
+        refs.update(safetensors_refs(path))
+    if not files:
+        for path in sorted(model_dir.glob("pytorch_model*.bin")):
+            refs.update({key: TensorRef(str(path), key, tuple(value.shape))
+                         for key, value in torch_checkpoint(str(path)).items()})
+    if not refs:
+        raise FileNotFoundError(f"No *.safetensors or pytorch_model*.bin checkpoint in {model_dir}")
+    return refs
+
+
+def load_tensor(ref):
+    """The tensor as float32; only this tensor is read from the mapped file."""
+    if not ref.dtype:
+        return torch_checkpoint(ref.file)[ref.key].float().numpy()
+    data = np.memmap(ref.file, dtype=SAFETENSORS_DTYPES[ref.dtype], mode="r", offset=ref.offset, shape=ref.shape)
+    if ref.dtype == "BF16":
+        return (data.astype(np.uint32) << 16).view(np.float32)
+    return np.array(data, dtype=np.float32)
+
+
+# ---------------------------------------------------------------------------
+# Conversion
+# ---------------------------------------------------------------------------
+
+def permute_rope(weight, n_head):
+    """Reorder each head's rows from HF's half-split rotary layout to ggml's interleaved one."""
+    return weight.reshape(n_head, 2, weight.shape[0] // n_head // 2, *weight.shape[1:]).swapaxes(1, 2).reshape(weight.shape)
+
+
+def convert_tensor(task):
+    """Worker: read, ternarize and pack one tensor; returns (name, bytes)."""
+    weight = load_tensor(task.ref)
+    if task.rope_heads:
+        weight = permute_rope(weight, task.rope_heads)
+    if task.kind == "f32":
+        return task.name, weight.astype(np.float32).tobytes()
+    if task.kind == "f16":
+        return task.name, weight.astype(np.float16).tobytes()
+
+    ternary, s = weight_quant(weight)
+    scale = np.float32(1) / s
+    if task.quant_type == "i2_s":
+        packed = pack_i2_s(ternary, scale)
+    elif task.quant_type == "tl1":
+        packed = tl1_pack(ternary, scale, task.tiling)
+    else:
+        packed = tl2_pack(ternary, scale, task.tiling)
+    return task.name, packed.tobytes()
+
+
+def plan_tensors(refs, config, quant_type, tilings):
+    """Output tensors in file order; raises ValueError for unknown tensors or untiled shapes."""
+    n_head = config["num_attention_heads"]
+    n_kv_head = config.get("num_key_value_heads") or n_head
+    ggml_type = QUANT_TYPES[quant_type][0]
+    tasks = []
+    for hf_name, ref in refs.items():
+        if SKIPPED.fullmatch(hf_name):
+            continue
+        if hf_name == "lm_head.weight" and config.get("tie_word_embeddings"):
+            continue
+        for pattern, gguf_name, kind in TENSOR_NAMES:
+            match = re.fullmatch(pattern, hf_name)
+            if match:
+                break
+        else:
+            raise ValueError(f"Don't know how to convert {hf_name}")
+
+        name = gguf_name.format(*match.groups())
+        ne = tuple(reversed(ref.shape))
+        rope_heads = n_head if name.endswith("attn_q.weight") else n_kv_head if name.endswith("attn_k.weight") else 0
+        n = int(np.prod(ref.shape))
+        if kind == "f32":
+            tasks.append(TensorTask(name, ref, kind, ne, GGML_TYPE_F32, n * 4))
+        elif kind == "f16":
+            tasks.append(TensorTask(name, ref, kind, ne, GGML_TYPE_F16, n * 2))
+        else:
+            m, k = ref.shape
+            tiling = tilings.get((m, k))
+            if quant_type != "i2_s" and tiling is None:
+                raise ValueError(f"No {quant_type} kernel for {name} [{m}, {k}] in the kernel config")
+            if quant_type == "i2_s" and k % 128:
+                raise ValueError(f"{name}: row length {k} is not a multiple of 128")
+            tasks.append(TensorTask(name, ref, kind, ne, ggml_type, tensor_nbytes(ggml_type, ne, tiling and tiling.BK),
+                                    quant_type, tiling, rope_heads))
+
+    def order(task):
+        block = re.match(r"blk\.(\d+)\.", task.name)
+        return (int(block.group(1)) if block else -1, task.name)
+    return sorted(tasks, key=order)
+
+
+# ---------------------------------------------------------------------------
+# Metadata
+# ---------------------------------------------------------------------------
+
+def model_metadata(writer, model_dir, config, quant_type):
+    hidden = config["hidden_size"]
+    n_head = config["num_attention_heads"]
+    writer.add("general.architecture", GGUF_TYPE_STRING, ARCH)
+    writer.add("general.name", GGUF_TYPE_STRING, Path(model_dir).resolve().name)
+    writer.add("general.file_type", GGUF_TYPE_UINT32, QUANT_TYPES[quant_type][1])
+    writer.add("general.quantization_version", GGUF_TYPE_UINT32, 2)
+    writer.add(f"{ARCH}.vocab_size", GGUF_TYPE_UINT32, config["vocab_size"])
+    writer.add(f"{ARCH}.context_length", GGUF_TYPE_UINT32, config["max_position_embeddings"])
+    writer.add(f"{ARCH}.embedding_length", GGUF_TYPE_UINT32, hidden)
+    writer.add(f"{ARCH}.block_count", GGUF_TYPE_UINT32, config["num_hidden_layers"])
+    writer.add(f"{ARCH}.feed_forward_length", GGUF_TYPE_UINT32, config["intermediate_size"])
+    writer.add(f"{ARCH}.rope.dimension_count", GGUF_TYPE_UINT32, hidden // n_head)
+    writer.add(f"{ARCH}.rope.freq_base", GGUF_TYPE_FLOAT32, float(config.get("rope_theta", 10000.0)))
+    writer.add(f"{ARCH}.attention.head_count", GGUF_TYPE_UINT32, n_head)
+    writer.add(f"{ARCH}.attention.head_count_kv", GGUF_TYPE_UINT32, config.get("num_key_value_heads") or n_head)
+    writer.add(f"{ARCH}.attention.layer_norm_rms_epsilon", GGUF_TYPE_FLOAT32, float(config["rms_norm_eps"]))
+
+
+def tokenizer_metadata(writer, model_dir, config):
+    """
+    SentencePiece-style vocabulary from tokenizer.json (byte-fallback BPE, as
+    the LLaMA tokenizer exports). Scores follow the vocabulary order, which is
+    the merge priority SentencePiece assigned.
+    """
+    model_dir = Path(model_dir)
+    with open(model_dir / "tokenizer.json", encoding="utf-8") as f:
+        tokenizer = json.load(f)
+    model = tokenizer["model"]
+    if model.get("type") != "BPE" or not model.get("byte_fallback"):
+        raise ValueError("Only SentencePiece-style (byte-fallback BPE) tokenizers are supported")
+
+    size = config["vocab_size"]
+    tokens = [f"[PAD{i}]" for i in range(size)]
+    scores = [0.0] * size
+    types = [TOKEN_TYPE_UNUSED] * size
+    for text, token_id in model["vocab"].items():
+        if token_id < size:
+            tokens[token_id] = text
+            scores[token_id] = -float(token_id)
+            types[token_id] = TOKEN_TYPE_BYTE if re.fullmatch(r"<0x[0-9A-Fa-f]{2}>", text) else TOKEN_TYPE_NORMAL
+    unk_id = None
+    for token in tokenizer.get("added_tokens", []):
+        token_id = token["id"]
+        if token_id < size:
+            tokens[token_id] = token["content"]
+            scores[token_id] = 0.0
+            types[token_id] = TOKEN_TYPE_CONTROL if token.get("special") else TOKEN_TYPE_USER_DEFINED
+            if token["content"] == model.get("unk_token"):
+                types[token_id] = TOKEN_TYPE_UNKNOWN
+                unk_id = token_id
+
+    tokenizer_config = {}
+    if (model_dir / "tokenizer_config.json").exists():
+        with open(model_dir / "tokenizer_config.json", encoding="utf-8") as f:
+            tokenizer_config = json.load(f)
+
+    writer.add("tokenizer.ggml.model", GGUF_TYPE_STRING, "llama")
+    writer.add("tokenizer.ggml.tokens", GGUF_TYPE_ARRAY, (GGUF_TYPE_STRING, tokens))
+    writer.add("tokenizer.ggml.scores", GGUF_TYPE_ARRAY, (GGUF_TYPE_FLOAT32, scores))
+    writer.add("tokenizer.ggml.token_type", GGUF_TYPE_ARRAY, (GGUF_TYPE_INT32, types))
+    for key, value in (("bos_token_id", config.get("bos_token_id")), ("eos_token_id", config.get("eos_token_id")),
+                       ("unknown_token_id", unk_id), ("padding_token_id", config.get("pad_token_id"))):
+        if value is not None:
+            writer.add(f"tokenizer.ggml.{key}", GGUF_TYPE_UINT32, value)
+    writer.add("tokenizer.ggml.add_bos_token", GGUF_TYPE_BOOL, bool(tokenizer_config.get("add_bos_token", True)))
+    writer.add("tokenizer.ggml.add_eos_token", GGUF_TYPE_BOOL, bool(tokenizer_config.get("add_eos_token", False)))
+
+
+# ---------------------------------------------------------------------------
+# Main
+# ---------------------------------------------------------------------------
+
+def convert(model_dir, outfile, quant_type, kernel_config, jobs):
+    model_dir = Path(model_dir)
+    with open(model_dir / "config.json") as f:
+        config = json.load(f)
+    tilings = {}
+    if quant_type != "i2_s":
+        tilings = {(shape.m, shape.k): shape for shape in read_kernel_config(kernel_config)}
+    tasks = plan_tensors(checkpoint_refs(model_dir), config, quant_type, tilings)
+
+    writer = GGUFWriter(outfile)
+    model_metadata(writer, model_dir, config, quant_type)
+    tokenizer_metadata(writer, model_dir, config)
+    for task in tasks:
+        writer.add_tensor_info(task.name, task.ne, task.ggml_type, task.nbytes)
+    writer.write_header()
+
+    start = time.time()
+    try:
+        with ProcessPoolExecutor(max_workers=jobs) as pool:
+            pending = [pool.submit(convert_tensor, task) for task in tasks[:jobs]]
+            for i, task in enumerate(tasks):
+                name, data = pending.pop(0).result()
+                if i + jobs < len(tasks):
+                    pending.append(pool.submit(convert_tensor, tasks[i + jobs]))
+                writer.write_tensor_data(name, data)
+                print(f"[{i + 1}/{len(tasks)}] {name} {GGML_TYPE_NAMES[task.ggml_type]} "
+                      f"{list(task.ne)} {len(data) / 2**20:.1f} MB")
+        writer.close()
+    except BaseException:
+        writer.abort()
+        raise
+    size = Path(outfile).stat().st_size
+    print(f"Wrote {outfile} ({size / 2**20:.1f} MB) in {time.time() - start:.1f}s")
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Convert a Hugging Face BitNet b1.58 checkpoint to GGUF")
+    parser.add_argument("model_dir", help="Directory with config.json, tokenizer.json and the checkpoint")
+    parser.add_argument("--outfile", help="Output path (default: <model_dir>/ggml-model-<quant type>.gguf)")
+    parser.add_argument("-q", "--quant-type", choices=sorted(QUANT_TYPES), default="i2_s")
+    parser.add_argument("--kernel-config", default=str(BACKEND_DIR / "include" / "kernel_config.ini"),
+                        help="Tiling the TL1/TL2 kernels were generated with")
+    parser.add_argument("-j", "--jobs", type=int, default=min(os.cpu_count() or 1, 8),
+                        help="Tensors converted in parallel (each holds one tensor in memory)")
+    args = parser.parse_args()
+
+    outfile = args.outfile or str(Path(args.model_dir) / f"ggml-model-{args.quant_type}.gguf")
+    try:
+        convert(args.model_dir, outfile, args.quant_type, args.kernel_config, max(1, args.jobs))
+    except (OSError, ValueError, RuntimeError, KeyError) as e:
+        print(f"Conversion failed: {e}")
+        sys.exit(1)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,318 @@
+"""
+GGUF format constants, a header reader and a streaming writer.
+
+The reader memory-maps the file and parses the header, metadata and tensor
+table only; tensor data is never read, so inspecting a multi-GB model takes
+milliseconds. Large metadata arrays (the vocabulary) are skipped unless asked
+for.
+
+The tensor table has to precede the data, so the writer takes every
+tensor's name, shape and byte size up front and then accepts the data one
+tensor at a time in table order; nothing but the tensor being written is
+held in memory. Output goes to a temporary file that replaces the target
+only once every tensor has been written.
+"""
+
+import mmap
+import os
+import struct
+from dataclasses import dataclass, field
+from pathlib import Path
+
+GGUF_MAGIC = b"GGUF"
+GGUF_VERSION = 3
+GGUF_DEFAULT_ALIGNMENT = 32
+
+# Metadata value types
+GGUF_TYPE_UINT8 = 0
+GGUF_TYPE_INT8 = 1
+GGUF_TYPE_UINT16 = 2
+GGUF_TYPE_INT16 = 3
+GGUF_TYPE_UINT32 = 4
+GGUF_TYPE_INT32 = 5
+GGUF_TYPE_FLOAT32 = 6
+GGUF_TYPE_BOOL = 7
+GGUF_TYPE_STRING = 8
+GGUF_TYPE_ARRAY = 9
+GGUF_TYPE_UINT64 = 10
+GGUF_TYPE_INT64 = 11
+GGUF_TYPE_FLOAT64 = 12
+
+SCALAR_FORMATS = {
+    GGUF_TYPE_UINT8: "B", GGUF_TYPE_INT8: "b", GGUF_TYPE_UINT16: "H", GGUF_TYPE_INT16: "h",
+    GGUF_TYPE_UINT32: "I", GGUF_TYPE_INT32: "i", GGUF_TYPE_FLOAT32: "f", GGUF_TYPE_BOOL: "?",
+    GGUF_TYPE_UINT64: "Q", GGUF_TYPE_INT64: "q", GGUF_TYPE_FLOAT64: "d",
+}
+
+# Tensor types (ggml_type in the BitNet llama.cpp fork)
+GGML_TYPE_F32 = 0
+GGML_TYPE_F16 = 1
+GGML_TYPE_I2_S = 36
+GGML_TYPE_TL1 = 38
+GGML_TYPE_TL2 = 39
+
+GGML_TYPE_NAMES = {
+    GGML_TYPE_F32: "f32", GGML_TYPE_F16: "f16",
+    GGML_TYPE_I2_S: "i2_s", GGML_TYPE_TL1: "tl1", GGML_TYPE_TL2: "tl2",
+}
+
+# general.file_type (llama_ftype)
+LLAMA_FTYPE_MOSTLY_F16 = 1
+LLAMA_FTYPE_MOSTLY_TL1 = 38
+LLAMA_FTYPE_MOSTLY_TL2 = 39
+LLAMA_FTYPE_MOSTLY_I2_S = 40
+
+# tokenizer.ggml.token_type
+TOKEN_TYPE_NORMAL = 1
+TOKEN_TYPE_UNKNOWN = 2
+TOKEN_TYPE_CONTROL = 3
+TOKEN_TYPE_USER_DEFINED = 4
+TOKEN_TYPE_UNUSED = 5
+TOKEN_TYPE_BYTE = 6
+
+
+LFS_POINTER_PREFIX = b"version https://git-lfs"
+
+
+@dataclass(frozen=True)
+class GGUFArray:
+    """A metadata array that was skipped rather than decoded."""
+    item_type: int
+    count: int
+
+
+@dataclass(frozen=True)
+class GGUFTensorInfo:
+    name: str
+    ne: tuple            # ggml order: row length first
+    ggml_type: int
+    offset: int          # absolute file offset of the data
+
+    @property
+    def n_elements(self):
+        n = 1
+        for dim in self.ne:
+            n *= dim
+        return n
+
+    @property
+    def type_name(self):
+        return GGML_TYPE_NAMES.get(self.ggml_type, f"type {self.ggml_type}")
+
+
+@dataclass
+class GGUFFile:
+    path: Path
+    version: int
+    file_size: int
+    alignment: int
+    data_offset: int
+    metadata: dict = field(default_factory=dict)
+    tensors: list = field(default_factory=list)
+
+
+def tensor_nbytes(ggml_type, ne, bk=None):
+    """
+    Data size of a tensor, scale included, or None when it cannot be known
+    (unknown type, or TL2 without the BK its kernel was generated with).
+    """
+    n = 1
+    for dim in ne:
+        n *= dim
+    if ggml_type == GGML_TYPE_F32:
+        return n * 4
+    if ggml_type == GGML_TYPE_F16:
+        return n * 2
+    if ggml_type == GGML_TYPE_I2_S:
+        return n // 4 + 32
+    if ggml_type == GGML_TYPE_TL1:
+        return n // 4 + 4
+    if ggml_type == GGML_TYPE_TL2 and bk and len(ne) == 2:
+        k, m = ne
+        three_k = k // bk * bk
+        size = m * three_k // 6 + m * three_k // 24 + m * (k - three_k) // 4
+        return size + -size % 32 + 4
+    return None
+
+
+class _Cursor:
+    def __init__(self, buffer):
+        self.buffer = buffer
+        self.pos = 0
+
+    def read(self, fmt):
+        value = struct.unpack_from("<" + fmt, self.buffer, self.pos)[0]
+        self.pos += struct.calcsize("<" + fmt)
+        return value
+
+    def read_string(self):
+        length = self.read("Q")
+        if self.pos + length > len(self.buffer):
+            raise struct.error("string runs past the end of the file")
+        value = self.buffer[self.pos:self.pos + length].decode("utf-8", errors="replace")
+        self.pos += length
+        return value
+
+    def skip_string(self):
+        length = self.read("Q")
+        self.pos += length
+
+    def read_value(self, value_type, load_arrays):
+        if value_type == GGUF_TYPE_STRING:
+            return self.read_string()
+        if value_type == GGUF_TYPE_ARRAY:
+            item_type, count = self.read("I"), self.read("Q")
+            if load_arrays or count <= 16:
+                return [self.read_value(item_type, load_arrays) for _ in range(count)]
+            if item_type in SCALAR_FORMATS:
+                self.pos += count * struct.calcsize("<" + SCALAR_FORMATS[item_type])
+            elif item_type == GGUF_TYPE_STRING:
+                for _ in range(count):
+                    self.skip_string()
+            else:
+                for _ in range(count):
+                    self.read_value(item_type, False)
+            return GGUFArray(item_type, count)
+        if value_type not in SCALAR_FORMATS:
+            raise ValueError(f"unknown metadata value type {value_type}")
+        return self.read(SCALAR_FORMATS[value_type])
+
+
+def read_gguf(path, load_arrays=False):
+    """
+    Header, metadata and tensor table of a GGUF file. Raises ValueError if the
+    file is not GGUF (including an un-pulled Git LFS pointer) or the header is
+    cut short.
+    """
+    path = Path(path)
+    file_size = path.stat().st_size
+    if file_size < 24:
+        with open(path, "rb") as f:
+            head = f.read()
+        if head.startswith(LFS_POINTER_PREFIX):
+            raise ValueError("Git LFS pointer, not the model (run git lfs pull)")
+        raise ValueError(f"file is only {file_size} bytes")
+
+    with open(path, "rb") as f, mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ) as mm:
+        if mm[:len(LFS_POINTER_PREFIX)] == LFS_POINTER_PREFIX:
+            raise ValueError("Git LFS pointer, not the model (run git lfs pull)")
+        if mm[:4] != GGUF_MAGIC:
+            raise ValueError(f"bad magic {bytes(mm[:4])!r}, not a GGUF file")
+        cursor = _Cursor(mm)
+        cursor.pos = 4
+        try:
+            version = cursor.read("I")
+            if version not in (2, 3):
+                raise ValueError(f"unsupported GGUF version {version}")
+            n_tensors, n_kv = cursor.read("Q"), cursor.read("Q")
+            metadata = {}
+            for _ in range(n_kv):
+                key = cursor.read_string()
+                metadata[key] = cursor.read_value(cursor.read("I"), load_arrays)
+            infos = []
+            for _ in range(n_tensors):
+                name = cursor.read_string()
+                ne = tuple(cursor.read("Q") for _ in range(cursor.read("I")))
+                infos.append((name, ne, cursor.read("I"), cursor.read("Q")))
+        except struct.error:
+            raise ValueError("header is truncated")
+
+    alignment = int(metadata.get("general.alignment", GGUF_DEFAULT_ALIGNMENT))
+    data_offset = cursor.pos + -cursor.pos % alignment
+    tensors = [GGUFTensorInfo(name, ne, ggml_type, data_offset + offset) for name, ne, ggml_type, offset in infos]
+    return GGUFFile(path, version, file_size, alignment, data_offset, metadata, tensors)
+
+
+def _pack_string(text):
+    data = text.encode("utf-8")
+    return struct.pack("<Q", len(data)) + data
+
+
+def _pack_value(value_type, value):
+    if value_type == GGUF_TYPE_STRING:
+        return _pack_string(value)
+    if value_type == GGUF_TYPE_ARRAY:
+        item_type, items = value
+        parts = [struct.pack("<IQ", item_type, len(items))]
+        if item_type in SCALAR_FORMATS:
+            parts.append(struct.pack(f"<{len(items)}{SCALAR_FORMATS[item_type]}", *items))
+        else:
+            parts.extend(_pack_value(item_type, item) for item in items)
+        return b"".join(parts)
+    return struct.pack("<" + SCALAR_FORMATS[value_type], value)
+
+
+class GGUFWriter:
+    """
+    Usage:
+        writer = GGUFWriter(path)
+        writer.add(key, GGUF_TYPE_UINT32, 24)                # metadata
+        writer.add_tensor_info(name, (k, m), ggml_type, nbytes)
+        writer.write_header()
+        writer.write_tensor_data(name, data)                 # in add_tensor_info order
+        writer.close()
+    """
+
+    def __init__(self, path, alignment=GGUF_DEFAULT_ALIGNMENT):
+        self.path = Path(path)
+        self.alignment = alignment
+        self._metadata = []
+        self._tensors = []
+        self._next = 0
+        self._file = None
+        self._tmp = self.path.with_name(self.path.name + ".tmp")
+        if alignment != GGUF_DEFAULT_ALIGNMENT:
+            self.add("general.alignment", GGUF_TYPE_UINT32, alignment)
+
+    def add(self, key, value_type, value):
+        """Metadata entry; arrays are given as (item type, items)."""
+        self._metadata.append((key, value_type, value))
+
+    def add_tensor_info(self, name, ne, ggml_type, nbytes):
+        """A tensor with dimensions in ggml order (row length first) and its data size in bytes."""
+        self._tensors.append((name, tuple(ne), ggml_type, nbytes))
+
+    def _pad(self, size):
+        return -size % self.alignment
+
+    def write_header(self):
+        header = [GGUF_MAGIC, struct.pack("<IQQ", GGUF_VERSION, len(self._tensors), len(self._metadata))]
+        for key, value_type, value in self._metadata:
+            header += [_pack_string(key), struct.pack("<I", value_type), _pack_value(value_type, value)]
+        offset = 0
+        for name, ne, ggml_type, nbytes in self._tensors:
+            header += [_pack_string(name), struct.pack(f"<I{len(ne)}QIQ", len(ne), *ne, ggml_type, offset)]
+            offset += nbytes + self._pad(nbytes)
+        data = b"".join(header)
+
+        self.path.parent.mkdir(parents=True, exist_ok=True)
+        self._file = open(self._tmp, "wb")
+        self._file.write(data + bytes(self._pad(len(data))))
+
+    def write_tensor_data(self, name, data):
+        """Data of the next tensor in the table; its size must match add_tensor_info."""
+        expected, _, _, nbytes = self._tensors[self._next]
+        if name != expected or len(data) != nbytes:
+            raise ValueError(f"Expected {expected} ({nbytes} bytes), got {name} ({len(data)} bytes)")
+        self._file.write(data)
+        self._file.write(bytes(self._pad(nbytes)))
+        self._next += 1
+
+    def close(self):
+        """Finish the file and move it into place; a partial file is removed instead."""
+        if self._file is None:
+            return
+        self._file.close()
+        self._file = None
+        if self._next != len(self._tensors):
+            os.remove(self._tmp)
+            raise ValueError(f"Only {self._next} of {len(self._tensors)} tensors were written")
+        os.replace(self._tmp, self.path)
+
+    def abort(self):
+        """Drop the partial output."""
+        if self._file is not None:
+            self._file.close()
+            self._file = None
+        if self._tmp.exists():
+            os.remove(self._tmp)
@@ -0,0 +1,292 @@
+#!/usr/bin/env python3
+"""
+Inspect and verify a GGUF model without loading it.
+
+Checks, from the header alone:
+- the file is GGUF (not an un-pulled Git LFS pointer) and no tensor runs
+  past the end of the file (truncated download or copy)
+- tensor names and shapes match the model's config.json
+- the ternary tensors' quant type can run on the LUT kernel the engine is
+  built with, and TL1/TL2 tensors match its kernel_config.ini tiling
+
+The content hash reads the file in parallel chunks and is cached in the
+model directory by (size, mtime), so repeated checks only parse the header.
+
+Usage:
+    python utils/gguf_inspect.py models/bitnet_b1_58-large/ggml-model-i2_s.gguf
+    python utils/gguf_inspect.py models/bitnet_b1_58-large/ggml-model-tl2.gguf --kernel tl2 --tensors
+"""
+
+import argparse
+import hashlib
+import json
+import os
+import sys
+import time
+from collections import Counter
+from concurrent.futures import ThreadPoolExecutor
+from dataclasses import dataclass, field
+from pathlib import Path
+
+from gguf_file import (
+    GGML_TYPE_TL1, GGML_TYPE_TL2, GGUFArray, read_gguf, tensor_nbytes,
+)
+from kernel_shapes import BACKEND_DIR, read_kernel_config
+
+HASH_CHUNK = 16 * 1024 * 1024
+HASH_SCHEME = "sha256-16m"       # sha256 over the sha256 of each 16 MiB chunk
+HASH_CACHE = ".gguf_hashes.json"
+
+TERNARY_TENSORS = ("attn_q", "attn_k", "attn_v", "attn_output", "ffn_gate", "ffn_up", "ffn_down")
+
+# Quant type -> LUT kernel the engine must be built with (i2_s runs on every build)
+REQUIRED_KERNEL = {"tl1": "tl1", "tl2": "tl2"}
+
+
+@dataclass
+class VerifyReport:
+    path: Path
+    quant_type: str = ""
+    n_tensors: int = 0
+    file_size: int = 0
+    digest: str = ""
+    hash_cached: bool = False
+    problems: list = field(default_factory=list)
+    notes: list = field(default_factory=list)
+    elapsed_ms: float = 0.0
+
+    @property
+    def ok(self):
+        return not self.problems
+
+    def summary(self):
+        parts = [self.quant_type or "unknown type", f"{self.n_tensors} tensors", f"{self.file_size / 2**20:.1f} MB"]
+        if self.digest:
+            parts.append(f"{self.digest[:16]}{' (cached)' if self.hash_cached else ''}")
+        return f"{self.path.name}: {', '.join(parts)} in {self.elapsed_ms:.0f} ms"
+
+
+# ---------------------------------------------------------------------------
+# Checks
+# ---------------------------------------------------------------------------
+
+def expected_shapes(config):
+    """GGUF tensor name -> ggml shape (row length first) for a BitNet config.json."""
+    hidden = config["hidden_size"]
+    intermediate = config["intermediate_size"]
+    heads = config["num_attention_heads"]
+    kv_dim = hidden // heads * (config.get("num_key_value_heads") or heads)
+    shapes = {"token_embd.weight": (hidden, config["vocab_size"]), "output_norm.weight": (hidden,)}
+    for i in range(config["num_hidden_layers"]):
+        shapes.update({
+            f"blk.{i}.attn_norm.weight": (hidden,),
+            f"blk.{i}.ffn_norm.weight": (hidden,),
+            f"blk.{i}.attn_sub_norm.weight": (hidden,),
+            f"blk.{i}.ffn_sub_norm.weight": (intermediate,),
+            f"blk.{i}.attn_q.weight": (hidden, hidden),
+            f"blk.{i}.attn_k.weight": (hidden, kv_dim),
+            f"blk.{i}.attn_v.weight": (hidden, kv_dim),
+            f"blk.{i}.attn_output.weight": (hidden, hidden),
+            f"blk.{i}.ffn_gate.weight": (hidden, intermediate),
+            f"blk.{i}.ffn_up.weight": (hidden, intermediate),
+            f"blk.{i}.ffn_down.weight": (intermediate, hidden),
+        })
+    return shapes
+
+
+def is_ternary(name):
+    return name.split(".")[-2] in TERNARY_TENSORS if name.startswith("blk.") else False
+
+
+def check_layout(gguf, tilings):
+    """Every tensor's data starts aligned, does not overlap the next one and ends inside the file."""
+    problems = []
+    ordered = sorted(gguf.tensors, key=lambda t: t.offset)
+    for i, tensor in enumerate(ordered):
+        if tensor.offset % gguf.alignment:
+            problems.append(f"{tensor.name}: data offset {tensor.offset} is not {gguf.alignment}-byte aligned")
+        tiling = tilings.get(tuple(reversed(tensor.ne)))
+        nbytes = tensor_nbytes(tensor.ggml_type, tensor.ne, tiling and tiling.BK)
+        if nbytes is None:
+            continue
+        end = ordered[i + 1].offset if i + 1 < len(ordered) else gguf.file_size
+        if tensor.offset + nbytes > end:
+            what = "the next tensor" if i + 1 < len(ordered) else "the end of the file"
+            problems.append(f"{tensor.name}: {nbytes} bytes of {tensor.type_name} data run past {what}")
+            if i + 1 == len(ordered):
+                problems.append(f"file is truncated ({gguf.file_size} bytes, needs {tensor.offset + nbytes})")
+    return problems
+
+
+def check_shapes(gguf, config):
+    """Tensor names and shapes against config.json; returns (problems, notes)."""
+    expected = expected_shapes(config)
+    found = {tensor.name: tensor.ne for tensor in gguf.tensors}
+    problems = [f"{name}: shape {list(found[name])}, config.json expects {list(shape)}"
+                for name, shape in expected.items() if name in found and tuple(found[name]) != shape]
+    missing = [name for name in expected if name not in found]
+    if missing:
+        problems.append(f"{len(missing)} tensors missing, e.g. {', '.join(missing[:3])}")
+    notes = []
+    extra = [name for name in found if name not in expected and name != "output.weight"]
+    if extra:
+        notes.append(f"{len(extra)} tensors not in config.json, e.g. {', '.join(extra[:3])}")
+    blocks = gguf.metadata.get(f"{gguf.metadata.get('general.architecture', '')}.block_count")
+    if isinstance(blocks, int) and blocks != config["num_hidden_layers"]:
+        problems.append(f"block_count {blocks}, config.json has {config['num_hidden_layers']} layers")
+    return problems, notes
+
+
+def model_quant_type(gguf):
+    """Quant type of the ternary projections ('' when there are none)."""
+    types = Counter(tensor.type_name for tensor in gguf.tensors if is_ternary(tensor.name))
+    return types.most_common(1)[0][0] if types else ""
+
+
+def check_quant(gguf, kernel, tilings):
+    """Ternary tensors are all one quant type, runnable on `kernel`, and (TL1/TL2) tiled by the kernel config."""
+    problems = []
+    ternary = [tensor for tensor in gguf.tensors if is_ternary(tensor.name)]
+    types = Counter(tensor.type_name for tensor in ternary)
+    if len(types) > 1:
+        problems.append(f"mixed ternary tensor types: {dict(types)}")
+    quant_type = model_quant_type(gguf)
+    required = REQUIRED_KERNEL.get(quant_type)
+    if required and kernel != required:
+        problems.append(f"{quant_type} model needs an engine built with {required} kernels (built: {kernel or 'none'})")
+    if quant_type in ("tl1", "tl2") and tilings is not None:
+        untiled = sorted({tuple(reversed(t.ne)) for t in ternary
+                          if t.ggml_type in (GGML_TYPE_TL1, GGML_TYPE_TL2) and tuple(reversed(t.ne)) not in tilings})
+        if untiled:
+            problems.append(f"no kernels for shapes {[list(shape) for shape in untiled]} in kernel_config.ini")
+    elif quant_type and quant_type not in ("i2_s", "tl1", "tl2"):
+        problems.append(f"ternary tensors are {quant_type}, expected i2_s, tl1 or tl2")
+    return problems
+
+
+# ---------------------------------------------------------------------------
+# Content hash
+# ---------------------------------------------------------------------------
+
+def _chunk_digest(path, start):
+    with open(path, "rb") as f:
+        f.seek(start)
+        return hashlib.sha256(f.read(HASH_CHUNK)).digest()
+
+
+def content_hash(path, workers=None):
+    """sha256 of the per-chunk sha256 digests; chunks are hashed in parallel (hashlib releases the GIL)."""
+    size = os.path.getsize(path)
+    workers = workers or min(8, os.cpu_count() or 1)
+    with ThreadPoolExecutor(max_workers=workers) as pool:
+        digests = pool.map(lambda start: _chunk_digest(path, start), range(0, size, HASH_CHUNK))
+        return hashlib.sha256(b"".join(digests)).hexdigest()
+
+
+def cached_hash(path, rehash=False):
+    """(digest, came from cache); the cache is keyed by file name, size and mtime."""
+    path = Path(path)
+    stat = path.stat()
+    cache_path = path.parent / HASH_CACHE
+    try:
+        with open(cache_path) as f:
+            cache = json.load(f)
+    except (OSError, ValueError):
+        cache = {}
+    entry = cache.get(path.name, {})
+    if (not rehash and entry.get("size") == stat.st_size and entry.get("mtime_ns") == stat.st_mtime_ns
+            and entry.get("scheme") == HASH_SCHEME):
+        return entry["digest"], True
+
+    digest = content_hash(path)
+    cache[path.name] = {"size": stat.st_size, "mtime_ns": stat.st_mtime_ns, "scheme": HASH_SCHEME, "digest": digest}
+    try:
+        with open(cache_path, "w") as f:
+            json.dump(cache, f, indent=2)
+    except OSError:
+        pass
+    return digest, False
+
+
+# ---------------------------------------------------------------------------
+# Entry points
+# ---------------------------------------------------------------------------
+
+def verify_model(path, config_path=None, kernel=None, kernel_config=None, hash_content=True, rehash=False):
+    """
+    Run every check on a GGUF file. `kernel` is the LUT kernel the engine is
+    built with ('tl1', 'tl2' or None); config.json and kernel_config.ini
+    default to the model directory's and include/'s.
+    """
+    start = time.perf_counter()
+    path = Path(path)
+    report = VerifyReport(path)
+    try:
+        gguf = read_gguf(path)
+    except (OSError, ValueError) as e:
+        report.problems.append(str(e))
+        report.elapsed_ms = (time.perf_counter() - start) * 1000
+        return report
+    report.n_tensors = len(gguf.tensors)
+    report.file_size = gguf.file_size
+    report.quant_type = model_quant_type(gguf)
+
+    kernel_config = Path(kernel_config or BACKEND_DIR / "include" / "kernel_config.ini")
+    tilings = None
+    if report.quant_type in ("tl1", "tl2"):
+        try:
+            tilings = {(shape.m, shape.k): shape for shape in read_kernel_config(kernel_config)}
+        except (OSError, ValueError) as e:
+            report.notes.append(f"cannot read {kernel_config}: {e}")
+    report.problems += check_layout(gguf, tilings or {})
+    report.problems += check_quant(gguf, kernel, tilings)
+
+    config_path = Path(config_path) if config_path else path.parent / "config.json"
+    if config_path.exists():
+        with open(config_path) as f:
+            problems, notes = check_shapes(gguf, json.load(f))
+        report.problems += problems
+        report.notes += notes
+    else:
+        report.notes.append("no config.json next to the model, shapes not checked")
+
+    if hash_content and report.ok:
+        report.digest, report.hash_cached = cached_hash(path, rehash)
+    report.elapsed_ms = (time.perf_counter() - start) * 1000
+    return report
+
+
+def print_tensors(path):
+    gguf = read_gguf(path)
+    for key, value in gguf.metadata.items():
+        if isinstance(value, GGUFArray):
+            value = f"[{value.count} items]"
+        print(f"  {key} = {value}")
+    for tensor in gguf.tensors:
+        print(f"  {tensor.name:32} {tensor.type_name:5} {list(tensor.ne)} @ {tensor.offset}")
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Inspect and verify a GGUF model without loading it")
+    parser.add_argument("gguf", help="GGUF model file")
+    parser.add_argument("--config", help="config.json to check shapes against (default: next to the model)")
+    parser.add_argument("--kernel", choices=["tl1", "tl2"], help="LUT kernel the engine is built with")
+    parser.add_argument("--kernel-config", help="kernel_config.ini of the build (default: include/kernel_config.ini)")
+    parser.add_argument("--tensors", action="store_true", help="Print metadata and the tensor table")
+    parser.add_argument("--no-hash", action="store_true", help="Skip the content hash")
+    parser.add_argument("--rehash", action="store_true", help="Hash the file even if the cached hash is current")
+    args = parser.parse_args()
+
+    report = verify_model(args.gguf, args.config, args.kernel, args.kernel_config, not args.no_hash, args.rehash)
+    if args.tensors and report.n_tensors:
+        print_tensors(args.gguf)
+    print(report.summary())
+    for note in report.notes:
+        print(f"  note: {note}")
+    for problem in report.problems:
+        print(f"  problem: {problem}")
+    sys.exit(0 if report.ok else 1)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,72 @@
+"""
+Matmul shapes and tiling arguments shared by the kernel codegen and autotuner.
+"""
+
+import configparser
+import json
+from dataclasses import dataclass
+from pathlib import Path
+
+BACKEND_DIR = Path(__file__).resolve().parent.parent
+MODELS_DIR = BACKEND_DIR / "models"
+
+
+@dataclass(frozen=True)
+class KernelShape:
+    """One [Kernels_i] section: an (m, k) weight and its BM x BK tiling in bm-row blocks."""
+    m: int
+    k: int
+    BM: int
+    BK: int
+    bm: int
+
+
+def model_shapes(model):
+    """
+    Ternary matmul shapes (M, K) of a model, in kernel_config.ini order:
+    attention/down input, square attention projections, gate/up projections,
+    plus the key/value projections when the model uses grouped-query attention.
+
+    `model` is a directory name under models/ or a path to a model directory.
+    """
+    model_dir = Path(model)
+    if not (model_dir / "config.json").exists():
+        model_dir = MODELS_DIR / model
+    with open(model_dir / "config.json") as f:
+        config = json.load(f)
+    hidden = config["hidden_size"]
+    intermediate = config["intermediate_size"]
+    heads = config.get("num_attention_heads")
+    kv_heads = config.get("num_key_value_heads") or heads
+
+    shapes = [(hidden, intermediate), (hidden, hidden), (intermediate, hidden)]
+    if heads and kv_heads != heads:
+        shapes.append((hidden // heads * kv_heads, hidden))
+    return shapes
+
+
+def parse_list(text):
+    """'256,128,256' -> [256, 128, 256]"""
+    return [int(value) for value in text.split(",") if value.strip()]
+
+
+def write_kernel_config(path, shapes, tiles):
+    """kernel_config.ini with one [Kernels_i] section per (M, K) and its (BM, BK, bm)."""
+    sections = []
+    for i, ((m, k), (BM, BK, bm)) in enumerate(zip(shapes, tiles)):
+        sections.append(f"[Kernels_{i}]\nm = {m}\nk = {k}\nbm = {BM}\nbk = {BK}\nbmm = {bm}\n\n")
+    Path(path).write_text("".join(sections))
+
+
+def read_kernel_config(path):
+    """[Kernels_i] sections of a kernel_config.ini, in order."""
+    parser = configparser.ConfigParser()
+    if not parser.read(path):
+        raise FileNotFoundError(path)
+    return [
+        KernelShape(
+            m=parser.getint(section, "m"), k=parser.getint(section, "k"),
+            BM=parser.getint(section, "bm"), BK=parser.getint(section, "bk"), bm=parser.getint(section, "bmm"),
+        )
+        for section in sorted(parser.sections(), key=lambda name: int(name.split("_")[-1]))
+    ]
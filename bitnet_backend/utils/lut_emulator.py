@@ -0,0 +1,514 @@
+#!/usr/bin/env python3
+"""
+NumPy reference emulator for the ternary matmul kernels.
+
+Emulates, with vectorized NumPy and the kernels' integer arithmetic:
+
+- i2_s:  quantize_i2_s packing (2-bit codes in QK_I2_S = 128 blocks) and the
+         AVX2 ggml_vec_dot_i2_i8_s accumulation (int16 lanes, widened every
+         32 blocks)
+- TL1:   ggml_preprocessor (per-tensor int8 activations, 9-entry pair LUTs)
+         and ggml_qgemm_lut over the BM / BK / bm tiling of the weight
+- TL2:   the three-weight LUT path (14 entries + sign) over K // BK * BK
+         columns and the two-weight path over the K % BK remainder
+
+Every path is checked against a NumPy port of BitLinear from
+models/*/utils_quant.py: the integer dot products must match exactly, and
+the dequantized outputs must match the fp reference to float32 rounding.
+LUT partial sums wrap at int16 inside one BK tile exactly as in the C code,
+so a tiling that can overflow shows up as a mismatch instead of passing.
+
+Packed layouts follow the addressing in the generated bitnet-lut-kernels.h:
+
+- TL1 tensor:  codes [M/BM][K/BK][BM/bm][BK/2 / (128/bm)][4][16] (two 4-bit
+               pair codes per byte), then the float32 scale at M*K/4
+- TL2 tensor:  three-weight codes [M/BM][three_k/BK][BM/32][BK/24][4][32],
+               their sign words [M/BM][three_k/BK][BM/32][BK/24][16] (uint16),
+               two-weight codes [M/BM][two_k/32][BM/32][2][4][32], then the
+               float32 scale, 32-byte aligned
+
+Usage:
+    python utils/lut_emulator.py --model bitnet_b1_58-large --kernel tl2
+    python utils/lut_emulator.py --model bitnet_b1_58-large --kernel tl1 --config preset_kernels/bitnet_b1_58-large/kernel_config_tl1.ini
+    python utils/lut_emulator.py --gguf models/bitnet_b1_58-large/ggml-model-i2_s.gguf --kernel tl2
+"""
+
+import argparse
+import configparser
+import sys
+import time
+
+import numpy as np
+
+from gguf_file import GGML_TYPE_I2_S, read_gguf
+from kernel_shapes import BACKEND_DIR, model_shapes, read_kernel_config
+
+QK_I2_S = 128
+I2_S_LANE_BLOCKS = 32          # blocks accumulated in int16 before widening
+INT16_MAX = 32767
+
+# TL2 stores 32 rows per register; unpacklo/unpackhi put byte b in this row
+TL2_ROW_OF_BYTE = np.concatenate([np.arange(0, 8), np.arange(16, 24), np.arange(8, 16), np.arange(24, 32)])
+TL2_BYTE_OF_ROW = np.argsort(TL2_ROW_OF_BYTE)
+
+
+# ---------------------------------------------------------------------------
+# fp reference (models/*/utils_quant.py)
+# ---------------------------------------------------------------------------
+
+def weight_quant(weight):
+    """Ternary weights and the float32 scale s of weight_quant (dequantized value = t / s)."""
+    weight = weight.astype(np.float32)
+    s = np.float32(1) / np.maximum(np.abs(weight).mean(dtype=np.float32), np.float32(1e-5))
+    ternary = np.clip(np.rint(weight * s), -1, 1).astype(np.int8)
+    return ternary, s
+
+
+def activation_quant(x):
+    """Per-row int8 activations and float32 scales of activation_quant (dequantized value = q / s)."""
+    x = x.astype(np.float32)
+    s = np.float32(127) / np.maximum(np.abs(x).max(axis=-1, keepdims=True), np.float32(1e-5))
+    q = np.clip(np.rint(x * s), -128, 127).astype(np.int8)
+    return q, s[..., 0]
+
+
+def bitlinear_reference(x, weight):
+    """
+    BitLinear forward split into its exact integer part and the fp result.
+    Returns (ternary, weight scale, int8 activations, integer dot products, fp64 output).
+    """
+    ternary, w_s = weight_quant(weight)
+    q, a_s = activation_quant(x)
+    acc = q.astype(np.int64) @ ternary.astype(np.int64).T
+    out = acc / a_s.astype(np.float64)[:, None] / np.float64(w_s)
+    return ternary, w_s, q, acc, out
+
+
+def wrap_int16(values):
+    """Two's-complement int16 wraparound of an integer array (what _mm256_add_epi16 / vaddq_s16 do)."""
+    return (values + 32768) % 65536 - 32768
+
+
+def dequantize(acc, act_scales, weight_scale):
+    """Kernel epilogue in float32: (float)acc / act_scale * weight_scale."""
+    return (acc.astype(np.float32) / act_scales.astype(np.float32)[:, None]) * np.float32(weight_scale)
+
+
+# ---------------------------------------------------------------------------
+# i2_s
+# ---------------------------------------------------------------------------
+
+def pack_i2_s(ternary, scale):
+    """quantize_i2_s: codes 0/1/2 for -1/0/+1, byte j of a block holds elements j, j+32, j+64, j+96."""
+    n = ternary.size
+    codes = (ternary.reshape(-1, 4, 32) + 1).astype(np.uint8)
+    packed = np.zeros(n // 4 + 32, dtype=np.uint8)
+    packed[:n // 4] = ((codes[:, 0] << 6) | (codes[:, 1] << 4) | (codes[:, 2] << 2) | codes[:, 3]).reshape(-1)
+    packed[n // 4:n // 4 + 4] = np.frombuffer(np.float32(scale).tobytes(), dtype=np.uint8)
+    return packed
+
+
+def unpack_i2_s(packed, m, k):
+    """Inverse of pack_i2_s: (2-bit codes as an (m, k) uint8 array, float32 scale)."""
+    n = m * k
+    data = np.asarray(packed[:n // 4], dtype=np.uint8).reshape(-1, 1, 32)
+    codes = (data >> np.array([6, 4, 2, 0], dtype=np.uint8)[None, :, None]) & 3
+    scale = np.frombuffer(np.asarray(packed[n // 4:n // 4 + 4], dtype=np.uint8).tobytes(), dtype=np.float32)[0]
+    return codes.reshape(m, k), scale
+
+
+def i2_s_matmul(codes, act_q):
+    """
+    ggml_vec_dot_i2_i8_s (AVX2) for every weight row and activation row.
+    maddubs pairs elements 2l, 2l+1 of each 32-element group into int16 lane l;
+    lanes accumulate 32 blocks before being widened to int32.
+    Returns sum(code * act) per (activation row, weight row).
+    """
+    m, k = codes.shape
+    nb = k // QK_I2_S
+    chunks = -(-nb // I2_S_LANE_BLOCKS)
+    pad = chunks * I2_S_LANE_BLOCKS - nb
+    codes = codes[:, :nb * QK_I2_S].astype(np.int16).reshape(m, nb, 4, 16, 2)
+    codes = np.pad(codes, ((0, 0), (0, pad), (0, 0), (0, 0), (0, 0)))
+    out = np.empty((act_q.shape[0], m), dtype=np.int64)
+    for row, act in enumerate(act_q):
+        y = act[:nb * QK_I2_S].astype(np.int16).reshape(nb, 4, 16, 2)
+        y = np.pad(y, ((0, pad), (0, 0), (0, 0), (0, 0)))
+        lanes = (codes * y).astype(np.int64).sum(axis=(2, 4))                 # (m, blocks, 16)
+        lanes = lanes.reshape(m, chunks, I2_S_LANE_BLOCKS, 16).sum(axis=2)
+        out[row] = wrap_int16(lanes).sum(axis=(1, 2))
+    return out
+
+
+def i2_s_forward(packed, m, k, x):
+    """i2_s matmul as the runtime does it: int8 activations, (sumi - sum(act)) / act_scale * scale."""
+    codes, scale = unpack_i2_s(packed, m, k)
+    act_q, act_s = activation_quant(x)
+    sumi = i2_s_matmul(codes, act_q)
+    acc = sumi - act_q.astype(np.int64).sum(axis=1, keepdims=True)
+    return acc, dequantize(acc, act_s, scale)
+
+
+# ---------------------------------------------------------------------------
+# LUT activations (ggml_preprocessor)
+# ---------------------------------------------------------------------------
+
+def lut_activations(x):
+    """per_tensor_quant: scale 127 / max|b| per activation row, round-to-nearest-even int values."""
+    x = x.astype(np.float32)
+    scales = np.float32(127) / np.abs(x).max(axis=1)
+    return np.rint(x * scales[:, None]).astype(np.int64), scales
+
+
+def pair_lut(b):
+    """lut_ctor / two_lut_ctor: entry 3*(w0+1) + (w1+1) = w0*b[2p] + w1*b[2p+1]; entries 9..15 unused."""
+    w0, w1 = np.divmod(np.arange(9), 3)
+    lut = np.zeros(b.shape[:-1] + (b.shape[-1] // 2, 16), dtype=np.int64)
+    lut[..., :9] = (w0 - 1) * b[..., 0::2, None] + (w1 - 1) * b[..., 1::2, None]
+    return lut
+
+
+def triple_lut(b):
+    """three_lut_ctor: entry e = w0*b[3t] + w1*b[3t+1] + w2*b[3t+2] for e = 9*w0 + 3*w1 + w2 >= 0."""
+    e = np.arange(14)
+    w2 = (e + 1) % 3 - 1
+    w1 = ((e - w2) // 3 + 1) % 3 - 1
+    w0 = (e - w2 - 3 * w1) // 9
+    lut = np.zeros(b.shape[:-1] + (b.shape[-1] // 3, 16), dtype=np.int64)
+    lut[..., :14] = w0 * b[..., 0::3, None] + w1 * b[..., 1::3, None] + w2 * b[..., 2::3, None]
+    return lut
+
+
+def pair_codes(ternary):
+    return (3 * (ternary[:, 0::2].astype(np.int16) + 1) + (ternary[:, 1::2] + 1)).astype(np.uint8)
+
+
+def triple_codes(ternary):
+    """|9*w0 + 3*w1 + w2| and its sign for each column triple."""
+    v = 9 * ternary[:, 0::3].astype(np.int16) + 3 * ternary[:, 1::3] + ternary[:, 2::3]
+    return np.abs(v).astype(np.uint8), v < 0
+
+
+def to_nibbles(codes):
+    """(..., 2) codes -> bytes with the first code in the high nibble."""
+    return ((codes[..., 0] << 4) | codes[..., 1]).astype(np.uint8)
+
+
+def from_nibbles(data):
+    return np.stack([data >> 4, data & 0x0f], axis=-1)
+
+
+def lut_accumulate(lut, codes, signs, groups_per_tile):
+    """
+    Sum of LUT entries picked by each row's codes, wrapped to int16 per
+    tile (one tbl_impl call) and widened to int32 across tiles.
+    """
+    m, groups = codes.shape
+    values = lut[np.arange(groups), codes]
+    if signs is not None:
+        values = np.where(signs, -values, values)
+    tiles = values.reshape(m, groups // groups_per_tile, groups_per_tile).sum(axis=2)
+    return wrap_int16(tiles).sum(axis=1)
+
+
+# ---------------------------------------------------------------------------
+# TL1
+# ---------------------------------------------------------------------------
+
+def tl1_dims(shape):
+    """Axis sizes of the TL1 layout: (tiles, k tiles, blocks, k steps, row groups, pairs per byte group)."""
+    steps_pairs = 128 // shape.bm
+    return (shape.m // shape.BM, shape.k // shape.BK, shape.BM // shape.bm,
+            shape.BK // 2 // steps_pairs, shape.bm // 16, steps_pairs // 2)
+
+
+def tl1_pack(ternary, scale, shape):
+    """TL1 weight tensor: pair codes in tbl_impl order, then the float32 scale."""
+    T, KT, NB, S, RG, PB = tl1_dims(shape)
+    codes = pair_codes(ternary).reshape(T, NB, RG, 16, KT, S, PB, 2)
+    codes = codes.transpose(0, 4, 1, 5, 2, 6, 3, 7)
+    return np.concatenate([to_nibbles(codes).reshape(-1), np.frombuffer(np.float32(scale).tobytes(), np.uint8)])
+
+
+def tl1_unpack(packed, shape):
+    """Pair codes (m, k/2) and scale, reading bytes the way tbl_impl_{m}_{k} does."""
+    T, KT, NB, S, RG, PB = tl1_dims(shape)
+    size = shape.m * shape.k // 4
+    codes = from_nibbles(np.asarray(packed[:size]).reshape(T, KT, NB, S, RG, PB, 16))
+    codes = codes.transpose(0, 2, 4, 6, 1, 3, 5, 7).reshape(shape.m, shape.k // 2)
+    scale = np.frombuffer(np.asarray(packed[size:size + 4]).tobytes(), dtype=np.float32)[0]
+    return codes, scale
+
+
+def tl1_forward(packed, shape, x):
+    """ggml_preprocessor + ggml_qgemm_lut for each activation row."""
+    codes, scale = tl1_unpack(packed, shape)
+    b, lut_scales = lut_activations(x)
+    acc = np.stack([lut_accumulate(pair_lut(row), codes, None, shape.BK // 2) for row in b])
+    return acc, dequantize(acc, lut_scales, scale)
+
+
+# ---------------------------------------------------------------------------
+# TL2
+# ---------------------------------------------------------------------------
+
+def tl2_split(shape):
+    three_k = shape.k // shape.BK * shape.BK
+    return three_k, shape.k - three_k
+
+
+def tl2_sizes(shape):
+    """Byte sizes of (three-weight codes, sign words, two-weight codes)."""
+    three_k, two_k = tl2_split(shape)
+    return shape.m * three_k // 6, shape.m * three_k // 24, shape.m * two_k // 4
+
+
+def tl2_pack(ternary, scale, shape):
+    """TL2 weight tensor: three-weight codes, their sign words, two-weight codes, float32 scale."""
+    three_k, two_k = tl2_split(shape)
+    T, NB = shape.m // shape.BM, shape.BM // 32
+    KT, S = three_k // shape.BK, shape.BK // 24
+
+    codes, signs = triple_codes(ternary[:, :three_k])
+    codes = codes.reshape(T, NB, 32, KT, S, 4, 2).transpose(0, 3, 1, 4, 5, 2, 6)
+    three = to_nibbles(codes[..., TL2_ROW_OF_BYTE, :]).reshape(-1)
+
+    # uint16 lane L, bit 15 - (4*j + 2*bottom + upper_half): sign of row L (+16) for triple 2j (+1)
+    bits = signs.reshape(T, NB, 2, 16, KT, S, 4, 2).transpose(0, 4, 1, 5, 3, 6, 7, 2)
+    bits = bits.reshape(T, KT, NB, S, 16, 16).astype(np.uint16)
+    words = (bits << np.arange(15, -1, -1, dtype=np.uint16)).sum(axis=-1, dtype=np.uint16)
+    sign = words.astype("<u2").view(np.uint8).reshape(-1)
+
+    pairs = pair_codes(ternary[:, three_k:]).reshape(T, NB, 32, two_k // 32, 2, 4, 2).transpose(0, 3, 1, 4, 5, 2, 6)
+    two = to_nibbles(pairs[..., TL2_ROW_OF_BYTE, :]).reshape(-1)
+
+    data = np.concatenate([three, sign, two])
+    data = np.concatenate([data, np.zeros(-len(data) % 32, dtype=np.uint8)])
+    return np.concatenate([data, np.frombuffer(np.float32(scale).tobytes(), np.uint8)])
+
+
+def tl2_unpack(packed, shape):
+    """(three-weight codes, signs, two-weight codes, scale), reading bytes the way the TL2 kernels do."""
+    three_k, two_k = tl2_split(shape)
+    T, NB = shape.m // shape.BM, shape.BM // 32
+    KT, S = three_k // shape.BK, shape.BK // 24
+    n_three, n_sign, n_two = tl2_sizes(shape)
+    packed = np.asarray(packed)
+
+    three = from_nibbles(packed[:n_three].reshape(T, KT, NB, S, 4, 32))[..., TL2_BYTE_OF_ROW, :]
+    codes = three.transpose(0, 2, 5, 1, 3, 4, 6).reshape(shape.m, three_k // 3)
+
+    words = packed[n_three:n_three + n_sign].view("<u2").reshape(T, KT, NB, S, 16)
+    bits = (words[..., None] >> np.arange(15, -1, -1, dtype=np.uint16)) & 1
+    bits = bits.reshape(T, KT, NB, S, 16, 4, 2, 2).transpose(0, 2, 7, 4, 1, 3, 5, 6)
+    signs = bits.reshape(shape.m, three_k // 3).astype(bool)
+
+    start = n_three + n_sign
+    two = from_nibbles(packed[start:start + n_two].reshape(T, two_k // 32, NB, 2, 4, 32))[..., TL2_BYTE_OF_ROW, :]
+    pairs = two.transpose(0, 2, 5, 1, 3, 4, 6).reshape(shape.m, two_k // 2)
+
+    offset = n_three + n_sign + n_two
+    offset += -offset % 32
+    scale = np.frombuffer(packed[offset:offset + 4].tobytes(), dtype=np.float32)[0]
+    return codes, signs, pairs, scale
+
+
+def tl2_forward(packed, shape, x):
+    """ggml_preprocessor + three_qgemm_lut + two_qgemm_lut for each activation row."""
+    three_k, two_k = tl2_split(shape)
+    codes, signs, pairs, scale = tl2_unpack(packed, shape)
+    b, lut_scales = lut_activations(x)
+    acc = np.zeros((len(b), shape.m), dtype=np.int64)
+    for i, row in enumerate(b):
+        acc[i] = lut_accumulate(triple_lut(row[:three_k]), codes, signs, shape.BK // 3)
+        if two_k:
+            acc[i] += lut_accumulate(pair_lut(row[three_k:]), pairs, None, 16)
+    return acc, dequantize(acc, lut_scales, scale)
+
+
+KERNELS = {
+    "tl1": (tl1_pack, tl1_forward),
+    "tl2": (tl2_pack, tl2_forward),
+}
+
+
+# ---------------------------------------------------------------------------
+# Configs
+# ---------------------------------------------------------------------------
+
+def config_problems(kernel, shape):
+    """
+    Tilings the generated C code would silently mis-handle: the codegen
+    constraints plus the loop trip counts of tbl_impl / lut_ctor.
+    """
+    m, k, BM, BK, bm = shape.m, shape.k, shape.BM, shape.BK, shape.bm
+    problems = []
+    if m % BM:
+        problems.append("M % BM != 0")
+    if BM % bm:
+        problems.append("BM % bm != 0")
+    if kernel == "tl1":
+        if k % BK:
+            problems.append("K % BK != 0")
+        if bm not in (32, 64):
+            problems.append("bm not in [32, 64]")
+        elif (BK // 2) % (128 // bm):
+            problems.append(f"BK / 2 not a multiple of {128 // bm} (tbl_impl k loop)")
+        if k % 16:
+            problems.append("K % 16 != 0 (lut_ctor)")
+    else:
+        if k % BK % 32:
+            problems.append("K % BK % 32 != 0")
+        if bm != 32:
+            problems.append("bm != 32")
+        if BK % 24:
+            problems.append("BK % 24 != 0 (8 triples per three_tbl_impl step)")
+    return problems
+
+
+def int16_headroom(kernel, shape):
+    """Worst-case |LUT partial sum| inside one tile; above INT16_MAX the kernel can wrap."""
+    if kernel == "tl1":
+        return shape.BK // 2 * 2 * 127
+    return max(shape.BK // 3 * 3 * 127, 16 * 2 * 127)
+
+
+# ---------------------------------------------------------------------------
+# Verification
+# ---------------------------------------------------------------------------
+
+def compare(name, acc, out, ref_acc, ref_out):
+    """Exact integer match and float32-level agreement; returns (ok, message)."""
+    mismatched = int(np.count_nonzero(acc != ref_acc))
+    err = float(np.max(np.abs(out.astype(np.float64) - ref_out)) / max(float(np.max(np.abs(ref_out))), 1e-30))
+    ok = mismatched == 0 and err < 1e-5
+    detail = "exact" if mismatched == 0 else f"{mismatched} of {acc.size} dot products differ"
+    return ok, f"{name}: {detail}, max rel err {err:.1e}"
+
+
+def random_inputs(rng, m, k, batch):
+    """Trained-like weights and activations with a few large outliers."""
+    weight = rng.normal(0, 0.02, size=(m, k)).astype(np.float32)
+    x = rng.normal(0, 1, size=(batch, k)).astype(np.float32)
+    x[:, rng.choice(k, size=max(1, k // 512), replace=False)] *= 20
+    return weight, x
+
+
+def verify_config(kernel, shapes, batch, rng):
+    """Pack random weights for every configured shape and check the emulated kernels against BitLinear."""
+    pack, forward = KERNELS[kernel]
+    all_ok = True
+    for shape in shapes:
+        label = f"[{shape.m}, {shape.k}] BM={shape.BM} BK={shape.BK} bm={shape.bm}"
+        problems = config_problems(kernel, shape)
+        if problems:
+            print(f"  {label}: FAIL {'; '.join(problems)}")
+            all_ok = False
+            continue
+
+        start = time.perf_counter()
+        weight, x = random_inputs(rng, shape.m, shape.k, batch)
+        ternary, w_s, _, ref_acc, ref_out = bitlinear_reference(x, weight)
+        scale = np.float32(1) / w_s
+
+        acc, out = forward(pack(ternary, scale, shape), shape, x)
+        ok, lut_msg = compare(kernel, acc, out, ref_acc, ref_out)
+        i2_ok, i2_msg = True, "i2_s: skipped, K % 128 != 0"
+        if shape.k % QK_I2_S == 0:
+            i2_acc, i2_out = i2_s_forward(pack_i2_s(ternary, scale), shape.m, shape.k, x)
+            i2_ok, i2_msg = compare("i2_s", i2_acc, i2_out, ref_acc, ref_out)
+        all_ok &= ok and i2_ok
+
+        headroom = int16_headroom(kernel, shape)
+        note = f", worst-case tile sum {headroom} > {INT16_MAX}" if headroom > INT16_MAX else ""
+        print(f"  {label}: {'ok' if ok and i2_ok else 'FAIL'} ({lut_msg}; {i2_msg}{note}) "
+              f"{(time.perf_counter() - start) * 1000:.0f} ms")
+    return all_ok
+
+
+def verify_gguf(path, kernel, shapes, batch, max_tensors, rng):
+    """
+    For i2_s tensors: codes must be 0..2 and repack to identical bytes; the
+    i2_s (and, for configured shapes, TL1/TL2) emulation must match the
+    integer reference on random activations.
+    """
+    tilings = {(s.m, s.k): s for s in shapes}
+    tensors = [t for t in read_gguf(path).tensors if t.ggml_type == GGML_TYPE_I2_S and len(t.ne) == 2]
+    if not tensors:
+        print("  no i2_s tensors found")
+        return False
+    all_ok = True
+    for tensor in tensors[:max_tensors]:
+        start = time.perf_counter()
+        name, (k, m) = tensor.name, tensor.ne
+        packed = np.array(np.memmap(path, dtype=np.uint8, mode="r", offset=tensor.offset, shape=(m * k // 4 + 4,)))
+        codes, scale = unpack_i2_s(packed, m, k)
+        invalid = int(np.count_nonzero(codes == 3))
+        ternary = codes.astype(np.int8) - 1
+        repacked = pack_i2_s(np.where(codes == 3, 0, ternary), scale)[:m * k // 4]
+        ok = invalid == 0 and np.isfinite(scale) and scale > 0 and np.array_equal(repacked, packed[:m * k // 4])
+        messages = [f"scale {scale:.4g}", f"{invalid} invalid codes" if invalid else "codes ok"]
+
+        x = rng.normal(0, 1, size=(batch, k)).astype(np.float32)
+        q, a_s = activation_quant(x)
+        ref_acc = q.astype(np.int64) @ ternary.astype(np.int64).T
+        ref_out = ref_acc / a_s.astype(np.float64)[:, None] * np.float64(scale)
+        i2_ok, msg = compare("i2_s", *i2_s_forward(packed, m, k, x), ref_acc, ref_out)
+        ok &= i2_ok
+        messages.append(msg)
+
+        shape = tilings.get((m, k))
+        if kernel and shape and not config_problems(kernel, shape):
+            pack, forward = KERNELS[kernel]
+            lut_ok, msg = compare(kernel, *forward(pack(ternary, scale, shape), shape, x), ref_acc, ref_out)
+            ok &= lut_ok
+            messages.append(msg)
+
+        all_ok &= ok
+        print(f"  {name} [{m}, {k}]: {'ok' if ok else 'FAIL'} ({'; '.join(messages)}) "
+              f"{(time.perf_counter() - start) * 1000:.0f} ms")
+    return all_ok
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Emulate the i2_s / TL1 / TL2 kernels in NumPy and check them against BitLinear")
+    parser.add_argument("--model", help="Model directory name under models/ (or a path); checks the config covers its shapes")
+    parser.add_argument("--kernel", choices=sorted(KERNELS), help="LUT kernel to emulate")
+    parser.add_argument("--config", default=str(BACKEND_DIR / "include" / "kernel_config.ini"),
+                        help="kernel_config.ini with the tiling to verify")
+    parser.add_argument("--gguf", help="Verify the packed i2_s tensors of this GGUF model")
+    parser.add_argument("--max-tensors", type=int, default=1 << 30, help="Stop after this many GGUF tensors")
+    parser.add_argument("--batch", type=int, default=2, help="Activation rows per check")
+    parser.add_argument("--seed", type=int, default=0)
+    args = parser.parse_args()
+    if not args.gguf and not args.kernel:
+        parser.error("pass --kernel to verify a kernel config, --gguf to verify a model, or both")
+
+    rng = np.random.default_rng(args.seed)
+    shapes = []
+    if args.kernel:
+        try:
+            shapes = read_kernel_config(args.config)
+        except (FileNotFoundError, configparser.Error, ValueError) as e:
+            print(f"Cannot read kernel config {args.config}: {e}")
+            sys.exit(1)
+
+    ok = True
+    if args.model and shapes:
+        missing = [shape for shape in model_shapes(args.model) if shape not in {(s.m, s.k) for s in shapes}]
+        if missing:
+            print(f"{args.config} has no kernels for {args.model} shapes {missing}")
+            ok = False
+    if args.kernel:
+        print(f"{args.kernel.upper()} kernels from {args.config}:")
+        ok &= verify_config(args.kernel, shapes, args.batch, rng)
+    if args.gguf:
+        print(f"i2_s tensors in {args.gguf}:")
+        ok &= verify_gguf(args.gguf, args.kernel, shapes, args.batch, args.max_tensors, rng)
+
+    print("All checks passed" if ok else "Verification FAILED")
+    sys.exit(0 if ok else 1)
+
+
+if __name__ == "__main__":
+    main()
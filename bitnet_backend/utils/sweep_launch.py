@@ -0,0 +1,256 @@
+#!/usr/bin/env python3
+"""
+Launch-parameter sweep for llama-server.
+
+Runs llama-bench over thread counts, batch / ubatch sizes and prompt lengths,
+then picks settings separately for prompt processing (pp) and generation (tg):
+
+- tg threads:    fewest threads within --tolerance of the best decode speed
+                 (decode is memory bound; extra threads mostly steal CPU from
+                 speech recognition and the UI)
+- pp threads, batch, ubatch: same rule on prompt throughput, averaged over
+                 every swept prompt length
+- context size:  largest swept length whose full prefill still finishes within
+                 --max-prefill-seconds with the chosen pp settings
+
+The result is written as KEY=VALUE lines for .env (BITNET_THREADS,
+BITNET_THREADS_BATCH, BITNET_BATCH_SIZE, BITNET_UBATCH_SIZE, BITNET_CTX_SIZE)
+and optionally merged into an existing .env with --update-env.
+
+Usage:
+    python utils/sweep_launch.py
+    python utils/sweep_launch.py --threads 2,4,6,8 --ctx 1024,2048,4096 --update-env ../.env
+"""
+
+import argparse
+import json
+import math
+import os
+import platform
+import subprocess
+import sys
+import time
+from pathlib import Path
+
+BACKEND_DIR = Path(__file__).resolve().parent.parent
+DEFAULT_MODEL = BACKEND_DIR / "models" / "bitnet_b1_58-large" / "ggml-model-i2_s.gguf"
+CPU_PROFILE = BACKEND_DIR / "cpu_profile.env"
+BENCH_DIRS = ("build_mingw/bin", "build/bin", "build/bin/Release")
+
+DEFAULT_BATCH = (256, 512, 1024)
+DEFAULT_UBATCH = (128, 256, 512)
+DEFAULT_CTX = (512, 1024, 2048, 4096)
+DEFAULT_GEN_TOKENS = 64
+
+
+def parse_list(text):
+    return sorted({int(value) for value in text.split(",") if value.strip()})
+
+
+def find_bench():
+    name = "llama-bench.exe" if platform.system() == "Windows" else "llama-bench"
+    for directory in BENCH_DIRS:
+        path = BACKEND_DIR / directory / name
+        if path.exists():
+            return path
+    return None
+
+
+def read_profile(path=CPU_PROFILE):
+    """KEY=VALUE pairs of the setup_env.py CPU profile (empty if not profiled)."""
+    values = {}
+    try:
+        with open(path) as f:
+            for line in f:
+                key, sep, value = line.partition("=")
+                if sep and not key.startswith("#"):
+                    values[key.strip()] = value.strip()
+    except OSError:
+        pass
+    return values
+
+
+def default_threads(profile):
+    """Powers of two up to the logical CPUs, plus the P-core, core and logical counts."""
+    value = profile.get("BITNET_PROFILE_LOGICAL_CPUS", "")
+    logical = int(value) if value.isdigit() and int(value) > 0 else os.cpu_count() or 4
+    counts = {logical}
+    n = 1
+    while n < logical:
+        counts.add(n)
+        n *= 2
+    for key in ("BITNET_PROFILE_PERFORMANCE_CORES", "BITNET_PROFILE_PHYSICAL_CORES"):
+        value = profile.get(key, "")
+        if value.isdigit() and int(value) > 0:
+            counts.add(int(value))
+    return sorted(counts)
+
+
+def run_bench(bench, model, threads, args):
+    """One llama-bench run for a thread count. Returns its JSON records."""
+    cmd = [
+        str(bench), "-m", str(model),
+        "-t", str(threads),
+        "-b", ",".join(map(str, args.batch)),
+        "-ub", ",".join(map(str, args.ubatch)),
+        "-p", ",".join(map(str, args.ctx)),
+        "-n", str(args.gen_tokens),
+        "-r", str(args.repetitions),
+        "-o", "json",
+    ]
+    result = subprocess.run(cmd, capture_output=True, text=True)
+    if result.returncode != 0:
+        print(f"  llama-bench failed with {threads} threads: {result.stderr.strip().splitlines()[-1:]}")
+        return []
+    return json.loads(result.stdout)
+
+
+def best_within(scores, tolerance):
+    """
+    Among {key: tokens/s}, the smallest key whose speed is within `tolerance` of
+    the best. Keys are thread counts or (threads, batch, ubatch) tuples, so near
+    ties go to fewer threads, then smaller batches.
+    """
+    best = max(scores.values())
+    return min(key for key, score in scores.items() if score >= best * (1 - tolerance))
+
+
+def fit(records, args):
+    """Pick generation and prompt-processing settings from llama-bench records."""
+    # generation: n_gen > 0, only threads matter (batch/ubatch don't affect single-token decode)
+    tg = {}
+    for r in records:
+        if r["n_gen"] > 0 and r["n_prompt"] == 0:
+            tg.setdefault(r["n_threads"], []).append(r["avg_ts"])
+    tg_scores = {t: max(values) for t, values in tg.items()}
+
+    # prompt processing: geometric mean over prompt lengths per (threads, batch, ubatch)
+    pp = {}
+    for r in records:
+        if r["n_prompt"] > 0 and r["n_gen"] == 0 and r["n_ubatch"] <= r["n_batch"]:
+            key = (r["n_threads"], r["n_batch"], r["n_ubatch"])
+            pp.setdefault(key, {})[r["n_prompt"]] = r["avg_ts"]
+    lengths = set(args.ctx)
+    pp_scores = {
+        key: math.exp(sum(math.log(ts) for ts in by_len.values()) / len(by_len))
+        for key, by_len in pp.items() if set(by_len) == lengths
+    }
+    if not tg_scores or not pp_scores:
+        raise RuntimeError("llama-bench produced no usable results")
+
+    tg_threads = best_within(tg_scores, args.tolerance)
+    pp_key = best_within(pp_scores, args.tolerance)
+    pp_threads, batch, ubatch = pp_key
+
+    # longest context whose full prefill fits the latency budget
+    ctx = min(args.ctx)
+    for length, ts in sorted(pp[pp_key].items()):
+        if length / ts <= args.max_prefill_seconds:
+            ctx = max(ctx, length)
+
+    return {
+        "BITNET_THREADS": tg_threads,
+        "BITNET_THREADS_BATCH": pp_threads,
+        "BITNET_BATCH_SIZE": batch,
+        "BITNET_UBATCH_SIZE": ubatch,
+        "BITNET_CTX_SIZE": ctx,
+    }, {
+        "tg_tokens_per_second": {str(t): round(ts, 2) for t, ts in sorted(tg_scores.items())},
+        "pp_tokens_per_second": {
+            f"t{t}/b{b}/ub{ub}": round(ts, 2) for (t, b, ub), ts in sorted(pp_scores.items())
+        },
+        "prefill_seconds": {str(n): round(n / ts, 2) for n, ts in sorted(pp[pp_key].items())},
+    }
+
+
+def update_env(path, settings):
+    """Replace (or append) the swept keys in an existing .env, keeping everything else."""
+    lines = Path(path).read_text().splitlines() if Path(path).exists() else []
+    remaining = dict(settings)
+    for i, line in enumerate(lines):
+        key = line.split("=", 1)[0].strip()
+        if key in remaining and not line.lstrip().startswith("#"):
+            lines[i] = f"{key}={remaining.pop(key)}"
+    if remaining:
+        lines.append("")
+        lines.append("# Launch parameters from bitnet_backend/utils/sweep_launch.py")
+        lines.extend(f"{key}={value}" for key, value in remaining.items())
+    Path(path).write_text("\n".join(lines) + "\n")
+
+
+def build_parser(profile):
+    parser = argparse.ArgumentParser(description="Sweep llama-server launch parameters on this machine")
+    parser.add_argument("-m", "--model", default=str(DEFAULT_MODEL), help="GGUF model to benchmark")
+    parser.add_argument("--bench", default=None, help="llama-bench executable (default: search build dirs)")
+    parser.add_argument("--threads", type=parse_list, default=default_threads(profile),
+                        help="Comma-separated thread counts")
+    parser.add_argument("--batch", type=parse_list, default=list(DEFAULT_BATCH),
+                        help="Comma-separated logical batch sizes (-b)")
+    parser.add_argument("--ubatch", type=parse_list, default=list(DEFAULT_UBATCH),
+                        help="Comma-separated physical batch sizes (-ub)")
+    parser.add_argument("--ctx", type=parse_list, default=list(DEFAULT_CTX),
+                        help="Comma-separated prompt lengths / context sizes")
+    parser.add_argument("--gen-tokens", type=int, default=DEFAULT_GEN_TOKENS,
+                        help="Tokens generated per decode measurement")
+    parser.add_argument("-r", "--repetitions", type=int, default=3, help="Runs per configuration")
+    parser.add_argument("--tolerance", type=float, default=0.03,
+                        help="Prefer fewer threads / smaller batches within this fraction of the best")
+    parser.add_argument("--max-prefill-seconds", type=float, default=10.0,
+                        help="Latency budget for prefilling a full context")
+    parser.add_argument("-o", "--output", default=str(BACKEND_DIR / "logs" / "sweep_launch.json"),
+                        help="Where to store the raw results")
+    parser.add_argument("--update-env", default=None, metavar="PATH",
+                        help="Write the recommended values into this .env file")
+    return parser
+
+
+def main():
+    profile = read_profile()
+    args = build_parser(profile).parse_args()
+
+    bench = Path(args.bench) if args.bench else find_bench()
+    if bench is None or not bench.exists():
+        print("llama-bench not found; build the backend with setup_env.py or pass --bench")
+        sys.exit(1)
+    if not Path(args.model).exists():
+        print(f"Model not found: {args.model}")
+        sys.exit(1)
+
+    print(f"Sweeping threads {args.threads}, batch {args.batch}, ubatch {args.ubatch}, ctx {args.ctx}")
+    records = []
+    start = time.time()
+    for threads in args.threads:
+        print(f"  {threads} threads...")
+        records.extend(run_bench(bench, args.model, threads, args))
+    settings, summary = fit(records, args)
+
+    print(f"\nSweep finished in {time.time() - start:.0f}s")
+    print("Generation tokens/s by threads: " + ", ".join(
+        f"{t}: {ts}" for t, ts in summary["tg_tokens_per_second"].items()
+    ))
+    print("Prefill seconds by context: " + ", ".join(
+        f"{n}: {s}s" for n, s in summary["prefill_seconds"].items()
+    ))
+    print("\nRecommended .env settings:")
+    for key, value in settings.items():
+        print(f"{key}={value}")
+
+    output = Path(args.output)
+    output.parent.mkdir(parents=True, exist_ok=True)
+    output.write_text(json.dumps({
+        "model": str(args.model),
+        "swept_at": time.strftime("%Y-%m-%d %H:%M:%S"),
+        "cpu": profile.get("BITNET_PROFILE_CPU", platform.processor()),
+        "recommended": settings,
+        "summary": summary,
+        "records": records,
+    }, indent=2))
+    print(f"\nRaw results: {output}")
+
+    if args.update_env:
+        update_env(args.update_env, settings)
+        print(f"Updated {args.update_env}")
+
+
+if __name__ == "__main__":
+    main()
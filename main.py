@@ -3,24 +3,23 @@ Application entry point.
 Lean orchestration - configuration and initialization only.
 """
 
+from src.core.startup import startup  # first: starts the startup clock
+
+import logging
 import sys
 from pathlib import Path
 
 from PyQt6.QtWidgets import QApplication, QMessageBox
 
-from src.core.config import Config
-from src.ui import MainWindow
-from src.core.download_vosk import download_file, extract_zip, VOSK_MODEL_URL, VOSK_MODEL_NAME
+from src.core.config import Config, LOG_LEVELS
 
 
-def ensure_vosk_model() -> bool:
+def ensure_vosk_model(model_path: Path, offline: bool = False) -> bool:
     """
     Check if VOSK model exists, download if missing.
     Returns True if model is ready, False on failure.
     """
-    root_dir = Path(__file__).parent
-    models_dir = root_dir / "models"
-    model_path = models_dir / VOSK_MODEL_NAME
+    models_dir = model_path.parent
     
     # Check if model already exists
     if model_path.exists() and model_path.is_dir():
@@ -28,6 +27,15 @@ def ensure_vosk_model() -> bool:
         if all((model_path / f).exists() for f in required_files):
             return True
     
+    from src.core.download_vosk import download_file, extract_zip, VOSK_MODEL_URL, VOSK_MODEL_NAME
+    
+    # Only the default model can be downloaded, and never in offline mode
+    if offline or model_path.name != VOSK_MODEL_NAME:
+        print(f"\n✗ VOSK model not found at {model_path}")
+        if offline:
+            print("OFFLINE_MODE is set - copy the model there manually.")
+        return False
+    
     # Model missing or incomplete - download it
     print(f"\n{'='*50}")
     print("VOSK model not found - downloading...")
@@ -66,19 +74,26 @@ def main() -> int:
     Application entry point.
     Returns exit code.
     """
+    # Load configuration (.env next to this file, environment variables override)
+    root_dir = Path(__file__).parent
+    config = Config.from_environment(env_file=root_dir / ".env")
+    logging.basicConfig(
+        level=config.log_level if config.log_level in LOG_LEVELS else "INFO",
+        format="%(asctime)s %(levelname)s %(name)s: %(message)s"
+    )
+    startup.mark("config")
+    
     # Check/download VOSK model before starting GUI
-    if not ensure_vosk_model():
-        print("\n✗ Failed to download VOSK model")
-        print("Please check your internet connection and try again.")
+    if not ensure_vosk_model(config.vosk.model_path, config.offline_mode):
+        print("\n✗ VOSK model is not available")
+        print("Please check your internet connection or VOSK_MODEL_PATH and try again.")
         return 1
     
     # Create Qt application
     app = QApplication(sys.argv)
     app.setApplicationName("VOSK BitNet Scribe")
     app.setOrganizationName("VoskBitnetScribe")
-    
-    # Load configuration
-    config = Config.from_environment()
+    startup.mark("qt")
     
     # Validate configuration
     is_valid, errors = config.validate()
@@ -87,9 +102,12 @@ def main() -> int:
         QMessageBox.critical(None, "Configuration Error", error_msg)
         return 1
     
-    # Create and show main window
+    # Create and show main window (services load once it has painted)
+    from src.ui import MainWindow
+    
     window = MainWindow(config)
     window.show()
+    startup.mark("window")
     
     # Run application event loop
     return app.exec()
@@ -8,6 +8,7 @@ from .models import (
     TranscriptionResult,
     ProcessingRequest,
     ProcessingResult,
+    GenerationMetrics,
 )
 
 __all__ = [
@@ -16,4 +17,5 @@ __all__ = [
     "TranscriptionResult",
     "ProcessingRequest",
     "ProcessingResult",
+    "GenerationMetrics",
 ]
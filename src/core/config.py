@@ -17,6 +17,107 @@ DEFAULT_SYSTEM_PROMPT = (
     "the final output is brief, factual, and scannable."
 )
 
+# Inference backends: llama-server over HTTP, or an in-process worker
+BACKEND_HTTP = "http"
+BACKEND_LLAMA_CPP = "llama_cpp"
+BACKEND_REFERENCE = "reference"
+BITNET_BACKENDS = (BACKEND_HTTP, BACKEND_LLAMA_CPP, BACKEND_REFERENCE)
+DEFAULT_REFERENCE_MODEL_DIR = Path("bitnet_backend") / "models" / "bitnet_b1_58-large"
+# GGUF that START.bat serves when BITNET_MODEL_PATH is not set
+DEFAULT_MODEL_PATH = DEFAULT_REFERENCE_MODEL_DIR / "ggml-model-i2_s.gguf"
+
+# Speculative decoding drafters: prompt lookup, truncated-layer self-drafting
+# (reference backend), or a separate GGUF draft model (llama-server -md)
+DRAFT_NONE = "none"
+DRAFT_NGRAM = "ngram"
+DRAFT_LAYERS = "layers"
+DRAFT_MODEL = "model"
+DRAFT_MODES = (DRAFT_NONE, DRAFT_NGRAM, DRAFT_LAYERS, DRAFT_MODEL)
+
+# Host CPU profile written by bitnet_backend/setup_env.py
+HARDWARE_PROFILE_PATH = Path("bitnet_backend") / "cpu_profile.env"
+
+# KEY=VALUE settings file read at startup; process environment variables win
+DEFAULT_ENV_FILE = Path(".env")
+LOG_LEVELS = ("DEBUG", "INFO", "WARNING", "ERROR")
+TRUE_VALUES = ("1", "true", "yes", "on")
+FALSE_VALUES = ("0", "false", "no", "off")
+
+
+def read_env_file(path: Path) -> dict[str, str]:
+    """
+    Parse a .env file: KEY=VALUE per line, # comments, optional quotes.
+    Missing file yields an empty dict.
+    """
+    values = {}
+    try:
+        lines = path.read_text(encoding="utf-8").splitlines()
+    except OSError:
+        return values
+    
+    for line in lines:
+        line = line.strip()
+        if not line or line.startswith("#") or "=" not in line:
+            continue
+        key, value = line.split("=", 1)
+        value = value.strip()
+        if len(value) >= 2 and value[0] == value[-1] and value[0] in "\"'":
+            value = value[1:-1]
+        values[key.strip()] = value
+    return values
+
+
+class EnvReader:
+    """
+    Typed lookups over .env values overlaid with the process environment.
+    Unparseable values fall back to the default and are recorded in errors.
+    """
+    
+    def __init__(self, values: dict[str, str]):
+        self._values = values
+        self.errors: list[str] = []
+    
+    def text(self, key: str, default: Optional[str] = None) -> Optional[str]:
+        """Raw value; empty counts as unset."""
+        value = self._values.get(key, "").strip()
+        return value or default
+    
+    def integer(self, key: str, default: int) -> int:
+        value = self.text(key)
+        if value is None:
+            return default
+        try:
+            return int(value)
+        except ValueError:
+            self.errors.append(f"{key} must be an integer (got: {value})")
+            return default
+    
+    def number(self, key: str, default: float) -> float:
+        value = self.text(key)
+        if value is None:
+            return default
+        try:
+            return float(value)
+        except ValueError:
+            self.errors.append(f"{key} must be a number (got: {value})")
+            return default
+    
+    def flag(self, key: str, default: bool) -> bool:
+        value = self.text(key)
+        if value is None:
+            return default
+        if value.lower() in TRUE_VALUES:
+            return True
+        if value.lower() in FALSE_VALUES:
+            return False
+        self.errors.append(f"{key} must be true or false (got: {value})")
+        return default
+    
+    def path(self, key: str) -> Optional[Path]:
+        """Path with either separator style (.env is shared with START.bat)."""
+        value = self.text(key)
+        return Path(value.replace("\\", "/")) if value else None
+
 
 @dataclass(frozen=True)
 class AudioConfig:
@@ -52,6 +153,59 @@ class VoskConfig:
         return all((path / component).exists() for component in required)
 
 
+@dataclass(frozen=True)
+class HardwareProfile:
+    """Host CPU as detected by setup_env.py."""
+
+    cpu: str = ""
+    features: tuple[str, ...] = ()
+    physical_cores: int = 0
+    logical_cpus: int = 0
+    performance_cores: int = 0
+    efficiency_cores: int = 0
+    kernel: str = "none"
+    threads: int = 0
+
+    @classmethod
+    def load(cls, path: Path = HARDWARE_PROFILE_PATH) -> Optional["HardwareProfile"]:
+        """Parse the KEY=VALUE profile file; None if missing or unreadable."""
+        try:
+            lines = path.read_text(encoding="utf-8").splitlines()
+        except OSError:
+            return None
+
+        values = {}
+        for line in lines:
+            key, sep, value = line.partition("=")
+            if sep and not key.startswith("#"):
+                values[key.strip().removeprefix("BITNET_PROFILE_").lower()] = value.strip()
+
+        def number(key: str) -> int:
+            try:
+                return int(values.get(key, "0"))
+            except ValueError:
+                return 0
+
+        return cls(
+            cpu=values.get("cpu", ""),
+            features=tuple(f for f in values.get("features", "").split(",") if f),
+            physical_cores=number("physical_cores"),
+            logical_cpus=number("logical_cpus"),
+            performance_cores=number("performance_cores"),
+            efficiency_cores=number("efficiency_cores"),
+            kernel=values.get("kernel", "none"),
+            threads=number("threads"),
+        )
+
+    def summary(self) -> str:
+        """One-line description for the UI."""
+        cores = f"{self.physical_cores} cores"
+        if self.efficiency_cores:
+            cores = f"{self.performance_cores}P + {self.efficiency_cores}E cores"
+        isa = ", ".join(f.upper().replace("_", "-") for f in self.features) or "no SIMD"
+        return f"{self.cpu} · {cores} · {isa}"
+
+
 @dataclass(frozen=True)
 class BitNetConfig:
     """BitNet inference configuration."""
@@ -70,6 +224,58 @@ class BitNetConfig:
     # System prompt for note generation
     system_prompt: str = DEFAULT_SYSTEM_PROMPT
 
+    # Backend selection (see BITNET_BACKENDS)
+    backend: str = BACKEND_HTTP
+    model_path: Optional[Path] = None           # GGUF file for llama_cpp
+    reference_model_dir: Optional[Path] = None  # HF checkpoint + modeling_bitnet.py for reference
+
+    # Speculative decoding (see DRAFT_MODES)
+    draft_mode: str = DRAFT_NONE
+    draft_tokens: int = 4                       # tokens proposed per verification step
+    draft_layers: int = 4                       # decoder layers kept by the "layers" drafter
+    draft_model_path: Optional[Path] = None     # GGUF draft model for "model"
+
+    # Requests decoded together (llama-server -np slots / reference continuous batching)
+    parallel_requests: int = 1
+    # Notes are generated this many tokens at a time so chat can take the slot in between (0 = off)
+    preempt_chunk_tokens: int = 256
+
+    # CPU threads for local backends (0 = all logical CPUs) and their context window
+    threads: int = 0
+    context_size: int = 2048
+
+    # Connection handling for llama-server
+    health_timeout_seconds: float = 5.0
+    health_interval_seconds: float = 10.0       # background probe period while the server is up
+    retry_attempts: int = 3                     # resends of a request the server never handled
+    http_pool_size: int = 4                     # pooled keep-alive connections
+
+    # Page cache: read the GGUF at startup, optionally keep it locked in RAM
+    prewarm_model: bool = True
+    lock_model: bool = False
+
+    @property
+    def is_local(self) -> bool:
+        """Whether inference runs in-process instead of against llama-server."""
+        return self.backend != BACKEND_HTTP
+
+    @property
+    def resolved_reference_model_dir(self) -> Path:
+        """Resolve reference checkpoint directory."""
+        return self.reference_model_dir or (Path.cwd() / DEFAULT_REFERENCE_MODEL_DIR)
+
+    @property
+    def resolved_model_path(self) -> Optional[Path]:
+        """GGUF the backend maps (None for the reference backend, which loads a checkpoint)."""
+        if self.backend == BACKEND_REFERENCE:
+            return None
+        return self.model_path or (Path.cwd() / DEFAULT_MODEL_PATH)
+
+    @property
+    def is_speculative(self) -> bool:
+        """Whether generation uses a drafter."""
+        return self.draft_mode != DRAFT_NONE
+
 
 @dataclass
 class UIConfig:
@@ -100,26 +306,97 @@ class Config:
     vosk: VoskConfig = field(default_factory=VoskConfig)
     bitnet: Optional[BitNetConfig] = None
     ui: UIConfig = field(default_factory=UIConfig)
+    hardware: Optional[HardwareProfile] = None
+    log_level: str = "INFO"
+    offline_mode: bool = False                  # never download models
+    load_errors: list[str] = field(default_factory=list)
     
     @classmethod
-    def from_environment(cls) -> "Config":
+    def from_environment(cls, env_file: Optional[Path] = DEFAULT_ENV_FILE) -> "Config":
         """
-        Build configuration from environment variables.
+        Build configuration from the .env file and environment variables.
         Enables external configuration without code changes.
         """
-        vosk_model_path = os.getenv("VOSK_MODEL_PATH")
-        bitnet_endpoint = os.getenv("BITNET_ENDPOINT", "http://localhost:8081/completion")
+        values = read_env_file(env_file) if env_file else {}
+        values.update(os.environ)
+        env = EnvReader(values)
+        
+        audio_config = AudioConfig(
+            sample_rate=env.integer("AUDIO_SAMPLE_RATE", AudioConfig.sample_rate),
+            block_size=env.integer("AUDIO_BLOCK_SIZE", AudioConfig.block_size),
+            channels=env.integer("AUDIO_CHANNELS", AudioConfig.channels)
+        )
+        
+        # VOSK_MODEL_PATH may name the model directory itself or its parent
+        vosk_model_path = env.path("VOSK_MODEL_PATH")
+        if vosk_model_path is not None and vosk_model_path.name.startswith("vosk-model"):
+            vosk_config = VoskConfig(model_name=vosk_model_path.name, model_base_path=vosk_model_path.parent)
+        else:
+            vosk_config = VoskConfig(model_base_path=vosk_model_path)
         
-        vosk_config = VoskConfig(
-            model_base_path=Path(vosk_model_path) if vosk_model_path else None
+        hardware = HardwareProfile.load()
+        
+        # BITNET_THREADS=0 means auto: the profile's performance cores, like START.bat
+        threads = env.integer("BITNET_THREADS", 0)
+        if threads == 0 and hardware is not None:
+            threads = hardware.threads
+        
+        # BITNET_SERVER_PORT fills in the default endpoint when no URL is given
+        port = env.text("BITNET_SERVER_PORT")
+        default_endpoint = BitNetConfig.endpoint_url
+        if port:
+            default_endpoint = f"http://localhost:{port}/completion"
+        
+        # HTTP endpoint by default; BITNET_BACKEND selects an in-process worker
+        bitnet_config = BitNetConfig(
+            endpoint_url=env.text("BITNET_ENDPOINT", default_endpoint),
+            max_tokens=env.integer("BITNET_MAX_TOKENS", BitNetConfig.max_tokens),
+            temperature=env.number("BITNET_TEMPERATURE", BitNetConfig.temperature),
+            timeout_seconds=env.number("BITNET_TIMEOUT", BitNetConfig.timeout_seconds),
+            repeat_penalty=env.number("BITNET_REPEAT_PENALTY", BitNetConfig.repeat_penalty),
+            repeat_last_n=env.integer("BITNET_REPEAT_LAST_N", BitNetConfig.repeat_last_n),
+            top_p=env.number("BITNET_TOP_P", BitNetConfig.top_p),
+            top_k=env.integer("BITNET_TOP_K", BitNetConfig.top_k),
+            backend=env.text("BITNET_BACKEND", BACKEND_HTTP).lower(),
+            model_path=env.path("BITNET_MODEL_PATH"),
+            reference_model_dir=env.path("BITNET_REFERENCE_MODEL_DIR"),
+            draft_mode=env.text("BITNET_DRAFT", DRAFT_NONE).lower(),
+            draft_tokens=env.integer("BITNET_DRAFT_TOKENS", BitNetConfig.draft_tokens),
+            draft_layers=env.integer("BITNET_DRAFT_LAYERS", BitNetConfig.draft_layers),
+            draft_model_path=env.path("BITNET_DRAFT_MODEL_PATH"),
+            parallel_requests=env.integer("BITNET_PARALLEL", BitNetConfig.parallel_requests),
+            preempt_chunk_tokens=env.integer("BITNET_PREEMPT_CHUNK", BitNetConfig.preempt_chunk_tokens),
+            threads=threads,
+            context_size=env.integer("BITNET_CTX_SIZE", BitNetConfig.context_size),
+            health_timeout_seconds=env.number("BITNET_HEALTH_TIMEOUT", BitNetConfig.health_timeout_seconds),
+            health_interval_seconds=env.number("BITNET_HEALTH_INTERVAL", BitNetConfig.health_interval_seconds),
+            retry_attempts=env.integer("BITNET_RETRIES", BitNetConfig.retry_attempts),
+            http_pool_size=env.integer("BITNET_HTTP_POOL_SIZE", BitNetConfig.http_pool_size),
+            prewarm_model=env.flag("BITNET_PREWARM", BitNetConfig.prewarm_model),
+            lock_model=env.flag("BITNET_MLOCK", BitNetConfig.lock_model)
+        )
+        
+        ui_config = UIConfig(
+            window_width=env.integer("UI_WINDOW_WIDTH", UIConfig.window_width),
+            window_height=env.integer("UI_WINDOW_HEIGHT", UIConfig.window_height),
+            font_size=env.integer("UI_FONT_SIZE", UIConfig.font_size),
+            goat_sound_enabled=env.flag("GOAT_SOUND_ENABLED", UIConfig.goat_sound_enabled)
         )
         
-        # BitNet is always available via HTTP endpoint
-        bitnet_config = BitNetConfig(endpoint_url=bitnet_endpoint)
+        # VERBOSE=true is shorthand for LOG_LEVEL=DEBUG
+        log_level = env.text("LOG_LEVEL", "INFO").upper()
+        if env.flag("VERBOSE", False):
+            log_level = "DEBUG"
         
         return cls(
+            audio=audio_config,
             vosk=vosk_config,
-            bitnet=bitnet_config
+            bitnet=bitnet_config,
+            ui=ui_config,
+            hardware=hardware,
+            log_level=log_level,
+            offline_mode=env.flag("OFFLINE_MODE", False),
+            load_errors=env.errors
         )
     
     def validate(self) -> tuple[bool, list[str]]:
@@ -127,7 +404,7 @@ class Config:
         Validate configuration completeness.
         Returns (is_valid, error_messages).
         """
-        errors = []
+        errors = list(self.load_errors)
         
         if not self.vosk.validate():
             errors.append(
@@ -139,5 +416,101 @@ class Config:
             errors.append(
                 "BitNet configuration missing. This should not happen."
             )
+        elif self.bitnet.backend not in BITNET_BACKENDS:
+            errors.append(
+                f"Unknown BITNET_BACKEND '{self.bitnet.backend}' "
+                f"(expected one of: {', '.join(BITNET_BACKENDS)})"
+            )
+        elif self.bitnet.backend == BACKEND_LLAMA_CPP:
+            if self.bitnet.model_path is None or not self.bitnet.model_path.is_file():
+                errors.append(
+                    f"BITNET_MODEL_PATH must point to a GGUF file for the llama_cpp backend "
+                    f"(got: {self.bitnet.model_path})"
+                )
+        elif self.bitnet.backend == BACKEND_REFERENCE:
+            model_dir = self.bitnet.resolved_reference_model_dir
+            if not (model_dir / "modeling_bitnet.py").exists():
+                errors.append(
+                    f"Reference model directory missing modeling_bitnet.py: {model_dir}"
+                )
+        
+        if self.bitnet is not None:
+            errors.extend(self._validate_draft(self.bitnet))
+            if self.bitnet.parallel_requests < 1:
+                errors.append(
+                    f"BITNET_PARALLEL must be at least 1 (got: {self.bitnet.parallel_requests})"
+                )
+            elif (self.bitnet.parallel_requests > 1 and self.bitnet.is_speculative
+                    and self.bitnet.backend == BACKEND_REFERENCE):
+                errors.append(
+                    "The reference backend runs speculative decoding one request at a time; "
+                    "set BITNET_PARALLEL=1 or BITNET_DRAFT=none"
+                )
+            errors.extend(self._validate_limits(self.bitnet))
+        
+        errors.extend(self._validate_audio(self.audio))
+        if self.log_level not in LOG_LEVELS:
+            errors.append(f"LOG_LEVEL must be one of {', '.join(LOG_LEVELS)} (got: {self.log_level})")
         
         return len(errors) == 0, errors
+    
+    @staticmethod
+    def _validate_limits(bitnet: BitNetConfig) -> list[str]:
+        """Range checks for the numeric BitNet settings."""
+        checks = [
+            (bitnet.threads >= 0, f"BITNET_THREADS must be 0 (auto) or more (got: {bitnet.threads})"),
+            (bitnet.context_size >= 128, f"BITNET_CTX_SIZE must be at least 128 (got: {bitnet.context_size})"),
+            (bitnet.max_tokens >= 1, f"BITNET_MAX_TOKENS must be at least 1 (got: {bitnet.max_tokens})"),
+            (0.0 <= bitnet.temperature <= 2.0,
+             f"BITNET_TEMPERATURE must be between 0 and 2 (got: {bitnet.temperature})"),
+            (0.0 < bitnet.top_p <= 1.0, f"BITNET_TOP_P must be in (0, 1] (got: {bitnet.top_p})"),
+            (bitnet.top_k >= 0, f"BITNET_TOP_K must be 0 or more (got: {bitnet.top_k})"),
+            (bitnet.timeout_seconds > 0, f"BITNET_TIMEOUT must be positive (got: {bitnet.timeout_seconds})"),
+            (bitnet.health_timeout_seconds > 0,
+             f"BITNET_HEALTH_TIMEOUT must be positive (got: {bitnet.health_timeout_seconds})"),
+            (bitnet.http_pool_size >= 1, f"BITNET_HTTP_POOL_SIZE must be at least 1 (got: {bitnet.http_pool_size})"),
+        ]
+        return [message for ok, message in checks if not ok]
+    
+    @staticmethod
+    def _validate_audio(audio: AudioConfig) -> list[str]:
+        """Capture settings VOSK and sounddevice can work with."""
+        errors = []
+        if audio.sample_rate not in (8000, 16000, 22050, 32000, 44100, 48000):
+            errors.append(f"AUDIO_SAMPLE_RATE is not a supported rate (got: {audio.sample_rate})")
+        if audio.channels not in (1, 2):
+            errors.append(f"AUDIO_CHANNELS must be 1 or 2 (got: {audio.channels})")
+        if audio.block_size < 1:
+            errors.append(f"AUDIO_BLOCK_SIZE must be at least 1 (got: {audio.block_size})")
+        return errors
+    
+    @staticmethod
+    def _validate_draft(bitnet: BitNetConfig) -> list[str]:
+        """Check the speculative decoding settings against the backend."""
+        if bitnet.draft_mode not in DRAFT_MODES:
+            return [
+                f"Unknown BITNET_DRAFT '{bitnet.draft_mode}' "
+                f"(expected one of: {', '.join(DRAFT_MODES)})"
+            ]
+        if not bitnet.is_speculative:
+            return []
+        
+        errors = []
+        if bitnet.draft_tokens < 1:
+            errors.append(f"BITNET_DRAFT_TOKENS must be at least 1 (got: {bitnet.draft_tokens})")
+        if bitnet.draft_mode == DRAFT_LAYERS and bitnet.backend != BACKEND_REFERENCE:
+            errors.append("BITNET_DRAFT=layers requires BITNET_BACKEND=reference")
+        if bitnet.draft_mode == DRAFT_LAYERS and bitnet.draft_layers < 1:
+            errors.append(f"BITNET_DRAFT_LAYERS must be at least 1 (got: {bitnet.draft_layers})")
+        if bitnet.draft_mode == DRAFT_MODEL:
+            if bitnet.backend != BACKEND_HTTP:
+                errors.append(
+                    "BITNET_DRAFT=model applies to llama-server only (START.bat passes -md); "
+                    "use ngram or layers with a local backend"
+                )
+            elif bitnet.draft_model_path is None or not bitnet.draft_model_path.is_file():
+                errors.append(
+                    f"BITNET_DRAFT_MODEL_PATH must point to a GGUF file for BITNET_DRAFT=model "
+                    f"(got: {bitnet.draft_model_path})"
+                )
+        return errors
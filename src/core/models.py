@@ -69,6 +69,97 @@ class ProcessingRequest:
         return True, None
 
 
+@dataclass(frozen=True)
+class Degeneration:
+    """
+    A generation the client stopped early.
+    keep: length of the text worth keeping (everything after it is the loop, stop string, ...).
+    """
+    
+    reason: str
+    keep: int
+
+
+@dataclass(frozen=True)
+class ProcessingEstimate:
+    """Expected cost of a ProcessingRequest, shown before it is sent."""
+    
+    n_predict: int
+    wait_seconds: float
+    generation_seconds: float
+    
+    @property
+    def total_seconds(self) -> float:
+        return self.wait_seconds + self.generation_seconds
+    
+    def summary(self) -> str:
+        """Short form for buttons, e.g. '~45 s' or '~3 min'."""
+        seconds = self.total_seconds
+        if seconds >= 90:
+            return f"~{seconds / 60:.0f} min"
+        return f"~{max(seconds, 1):.0f} s"
+
+
+@dataclass(frozen=True)
+class GenerationMetrics:
+    """
+    Per-request generation counters reported by the backend.
+    Parsed from llama-server's `timings` object (local workers use the same keys).
+    """
+    
+    prompt_tokens: int = 0
+    prompt_ms: float = 0.0
+    predicted_tokens: int = 0
+    predicted_ms: float = 0.0
+    draft_tokens: int = 0
+    accepted_tokens: int = 0
+    
+    @property
+    def tokens_per_second(self) -> float:
+        """Effective generation speed, speculative verification included."""
+        if self.predicted_ms <= 0:
+            return 0.0
+        return self.predicted_tokens / (self.predicted_ms / 1000)
+    
+    @property
+    def first_token_ms(self) -> Optional[float]:
+        """Prompt evaluation plus one decode step (None if prompt time was not reported)."""
+        if self.prompt_ms <= 0 or not self.predicted_tokens:
+            return None
+        return self.prompt_ms + self.predicted_ms / self.predicted_tokens
+    
+    @property
+    def is_speculative(self) -> bool:
+        """Whether any tokens were drafted for this request."""
+        return self.draft_tokens > 0
+    
+    @property
+    def acceptance_rate(self) -> Optional[float]:
+        """Fraction of drafted tokens accepted (None without speculation)."""
+        if not self.is_speculative:
+            return None
+        return self.accepted_tokens / self.draft_tokens
+    
+    @classmethod
+    def from_timings(cls, timings: dict) -> "GenerationMetrics":
+        """Build from a `timings` dict; missing keys count as zero."""
+        return cls(
+            prompt_tokens=int(timings.get("prompt_n", 0)),
+            prompt_ms=float(timings.get("prompt_ms", 0.0)),
+            predicted_tokens=int(timings.get("predicted_n", 0)),
+            predicted_ms=float(timings.get("predicted_ms", 0.0)),
+            draft_tokens=int(timings.get("draft_n", 0)),
+            accepted_tokens=int(timings.get("draft_n_accepted", 0))
+        )
+    
+    def summary(self) -> str:
+        """Short human-readable form for status lines."""
+        text = f"{self.tokens_per_second:.1f} tok/s"
+        if self.is_speculative:
+            text += f", {self.acceptance_rate:.0%} drafts accepted"
+        return text
+
+
 @dataclass(frozen=True)
 class ProcessingResult:
     """
@@ -80,6 +171,7 @@ class ProcessingResult:
     processed_text: Optional[str] = None
     error: Optional[APIError] = None
     processing_time_ms: Optional[float] = None
+    metrics: Optional[GenerationMetrics] = None
     
     @property
     def is_success(self) -> bool:
@@ -112,13 +204,15 @@ class ProcessingResult:
     def success(
         cls,
         processed_text: str,
-        processing_time_ms: Optional[float] = None
+        processing_time_ms: Optional[float] = None,
+        metrics: Optional[GenerationMetrics] = None
     ) -> "ProcessingResult":
         """Factory method for successful result."""
         return cls(
             status=ProcessingStatus.COMPLETED,
             processed_text=processed_text,
-            processing_time_ms=processing_time_ms
+            processing_time_ms=processing_time_ms,
+            metrics=metrics
         )
     
     @classmethod
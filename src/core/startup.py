@@ -0,0 +1,50 @@
+"""
+Startup phase timing.
+Marks are measured from the import of this module, which main.py does first,
+so they include interpreter-side import cost.
+"""
+
+import logging
+import time
+
+
+logger = logging.getLogger(__name__)
+
+# Cold-start budget from launch to the first painted window
+FIRST_PAINT_TARGET_MS = 500.0
+
+
+class StartupTimeline:
+    """Ordered (phase, milliseconds since start) marks."""
+
+    def __init__(self):
+        self._start = time.perf_counter()
+        self._marks: list[tuple[str, float]] = []
+
+    @property
+    def marks(self) -> list[tuple[str, float]]:
+        return list(self._marks)
+
+    def elapsed_ms(self) -> float:
+        return (time.perf_counter() - self._start) * 1000
+
+    def mark(self, phase: str) -> float:
+        """
+        Record that a phase finished; returns its time since start.
+        Phases happen once: repeating one (e.g. a later manual health check) keeps the first time.
+        """
+        for name, elapsed in self._marks:
+            if name == phase:
+                return elapsed
+        elapsed = self.elapsed_ms()
+        self._marks.append((phase, elapsed))
+        logger.debug("startup: %s at %.0f ms", phase, elapsed)
+        return elapsed
+
+    def summary(self) -> str:
+        """One line for the log, e.g. 'config 14 ms · window 190 ms · first paint 240 ms'."""
+        return " · ".join(f"{phase} {elapsed:.0f} ms" for phase, elapsed in self._marks)
+
+
+# Process-wide timeline
+startup = StartupTimeline()
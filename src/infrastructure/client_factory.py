@@ -0,0 +1,23 @@
+"""
+Completion client selection.
+Services ask for a client here instead of constructing one directly.
+"""
+
+from typing import Union
+
+from ..core.config import BitNetConfig
+from .http_client import BitNetHTTPClient
+from .local_backend import LocalBitNetBackend
+
+
+CompletionClient = Union[BitNetHTTPClient, LocalBitNetBackend]
+
+
+def create_client(config: BitNetConfig) -> CompletionClient:
+    """
+    Build the client for the configured backend.
+    Both expose post_completion / check_health / close.
+    """
+    if config.is_local:
+        return LocalBitNetBackend(config)
+    return BitNetHTTPClient(config)
@@ -0,0 +1,141 @@
+"""
+Single-flight completion requests.
+Identical payloads sent to the same backend while one is already in flight
+(a double-clicked Process, a re-sent chat prompt) wait for that request's
+response instead of queueing a second full inference behind it.
+"""
+
+import hashlib
+import json
+import logging
+import threading
+from typing import Callable, Optional
+
+from ..core.config import BitNetConfig
+from ..core.errors import APIError, ErrorCode
+from .http_client import APIResponse
+
+
+logger = logging.getLogger(__name__)
+
+
+def backend_id(config: BitNetConfig) -> str:
+    """What identical requests must share to be answered by one inference."""
+    if config.is_local:
+        return f"{config.backend}:{config.model_path or config.reference_model_dir}"
+    return config.endpoint_url
+
+
+def payload_key(backend: str, payload: dict) -> str:
+    """Canonical hash of a request: key order and whitespace do not matter."""
+    canonical = json.dumps(payload, sort_keys=True, separators=(",", ":"), ensure_ascii=False)
+    return hashlib.sha256(f"{backend}\n{canonical}".encode("utf-8")).hexdigest()
+
+
+# How often a waiting follower checks its own cancel flag (seconds)
+FOLLOWER_POLL_SECONDS = 0.1
+
+
+def cancelled_response() -> APIResponse:
+    """Response for a caller that cancelled before its request finished."""
+    return APIResponse(
+        success=False,
+        error=APIError(code=ErrorCode.CANCELLED, message="Cancelled by user")
+    )
+
+
+def _is_cancelled(response: APIResponse) -> bool:
+    return response.error is not None and response.error.code == ErrorCode.CANCELLED
+
+
+class _Flight:
+    """One request in flight and the callers attached to it."""
+
+    def __init__(self):
+        self.done = threading.Event()
+        self.response: Optional[APIResponse] = None
+        self.followers = 0
+
+
+class SingleFlight:
+    """
+    run(key, call, cancelled): the first caller for a key executes call,
+    callers that arrive while it runs get its response. Everything the leader
+    does for the request (queueing for a slot included) is shared.
+    Each caller keeps its own cancel flag: a follower that cancels stops
+    waiting on its own, and when the leader's call is cancelled the flight
+    ends without an answer and a waiting follower runs its own call instead.
+    """
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._flights: dict[str, _Flight] = {}
+        self.inferences = 0      # calls actually executed
+        self.saved = 0           # callers served by another caller's call
+
+    def run(
+        self,
+        key: str,
+        call: Callable[[], APIResponse],
+        cancelled: Optional[Callable[[], bool]] = None
+    ) -> APIResponse:
+        while True:
+            with self._lock:
+                flight = self._flights.get(key)
+                leader = flight is None
+                if leader:
+                    flight = _Flight()
+                    self._flights[key] = flight
+                else:
+                    flight.followers += 1
+
+            if leader:
+                return self._lead(key, flight, call)
+
+            while not flight.done.wait(FOLLOWER_POLL_SECONDS):
+                if cancelled is not None and cancelled():
+                    with self._lock:
+                        flight.followers -= 1
+                    return cancelled_response()
+            if flight.response is not None:
+                return flight.response
+            # The leader was cancelled: the first follower back becomes the new leader
+
+    def _lead(self, key: str, flight: _Flight, call: Callable[[], APIResponse]) -> APIResponse:
+        try:
+            response = call()
+        except Exception as e:
+            # Clients report failures as responses; followers must never wait forever
+            response = APIResponse(
+                success=False,
+                error=APIError(
+                    code=ErrorCode.UNKNOWN,
+                    message=f"Unexpected error: {str(e)}",
+                    details={"exception_type": type(e).__name__}
+                )
+            )
+        shared = not _is_cancelled(response)
+        with self._lock:
+            del self._flights[key]
+            self.inferences += 1
+            if shared:
+                self.saved += flight.followers
+        # Followers of a cancelled leader see response None and retry with their own call
+        flight.response = response if shared else None
+        flight.done.set()
+        if shared and flight.followers:
+            logger.info("Coalesced %d identical request(s) into one inference", flight.followers)
+        return response
+
+    def stats(self) -> tuple[int, int]:
+        with self._lock:
+            return self.inferences, self.saved
+
+
+# Process-wide, so chat and note services of one backend share flights
+single_flight = SingleFlight()
+
+
+def coalescing_stats() -> tuple[int, int]:
+    """(inferences sent, inferences saved by coalescing) since startup."""
+    return single_flight.stats()
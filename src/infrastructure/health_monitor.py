@@ -0,0 +1,237 @@
+"""
+llama-server health monitoring.
+A background thread per endpoint keeps the server state (up / loading / down)
+current, so callers read it without network I/O, and drives the circuit
+breaker that lets completion requests fail fast while the server is away.
+"""
+
+import logging
+import threading
+import time
+from dataclasses import dataclass
+from typing import Optional
+
+from ..core.config import BitNetConfig
+
+
+logger = logging.getLogger(__name__)
+
+# Server states
+SERVER_UNKNOWN = "unknown"     # no probe has finished yet
+SERVER_UP = "up"
+SERVER_LOADING = "loading"     # llama-server answers 503 until the model is loaded
+SERVER_DOWN = "down"
+
+# Probe interval while the server is not up (the configured interval applies once it is)
+RECOVERY_INTERVAL_SECONDS = 2.0
+
+# Consecutive request failures that open the circuit, and how long it stays open
+# before a single trial request is let through
+BREAKER_FAILURE_THRESHOLD = 3
+BREAKER_RESET_SECONDS = 30.0
+
+# Circuit breaker states
+BREAKER_CLOSED = "closed"
+BREAKER_OPEN = "open"
+BREAKER_HALF_OPEN = "half-open"
+
+
+@dataclass(frozen=True)
+class ServerHealth:
+    """Last known state of a llama-server endpoint."""
+
+    state: str = SERVER_UNKNOWN
+    endpoint: str = ""
+    error: Optional[str] = None
+    checked_at: Optional[float] = None   # time.monotonic() of the probe
+
+    @property
+    def is_up(self) -> bool:
+        return self.state == SERVER_UP
+
+    def as_availability(self) -> tuple[bool, Optional[str]]:
+        """(is_available, error_message) as returned by check_health."""
+        if self.state == SERVER_UP:
+            return True, None
+        if self.state == SERVER_LOADING:
+            return False, "Loading model on the server..."
+        if self.state == SERVER_UNKNOWN:
+            return False, f"Checking {self.endpoint}..."
+        return False, self.error or f"Cannot connect to {self.endpoint}"
+
+
+def probe_server(endpoint_url: str, timeout: float) -> tuple[str, Optional[str]]:
+    """
+    One health probe: (state, error).
+    Servers without /health count as up when their root answers.
+    """
+    import requests
+
+    health_url = endpoint_url.replace("/completion", "/health")
+    root_url = endpoint_url.split("/completion")[0]
+    try:
+        response = requests.get(health_url, timeout=timeout)
+        if response.status_code == 200:
+            return SERVER_UP, None
+        if response.status_code == 503:
+            return SERVER_LOADING, None
+        if response.status_code == 404:
+            response = requests.get(root_url, timeout=timeout)
+            if response.status_code in (200, 404):  # 404 means server responding
+                return SERVER_UP, None
+        return SERVER_DOWN, f"Server unhealthy (status {response.status_code})"
+    except requests.exceptions.ConnectionError:
+        return SERVER_DOWN, f"Cannot connect to {endpoint_url}"
+    except requests.exceptions.Timeout:
+        return SERVER_DOWN, "Connection timeout"
+    except Exception as e:
+        return SERVER_DOWN, f"Health check error: {e}"
+
+
+class CircuitBreaker:
+    """
+    Closed: requests pass. Open: requests fail immediately. After the reset
+    period one trial request is let through (half-open); its outcome closes
+    or re-opens the circuit. The health monitor closes it as soon as the
+    server is seen up again.
+    """
+
+    def __init__(
+        self,
+        failure_threshold: int = BREAKER_FAILURE_THRESHOLD,
+        reset_seconds: float = BREAKER_RESET_SECONDS
+    ):
+        self._failure_threshold = failure_threshold
+        self._reset_seconds = reset_seconds
+        self._lock = threading.Lock()
+        self._state = BREAKER_CLOSED
+        self._failures = 0
+        self._opened_at = 0.0
+
+    @property
+    def state(self) -> str:
+        with self._lock:
+            return self._state
+
+    def allow(self) -> bool:
+        """Whether a request may be sent now."""
+        with self._lock:
+            if self._state == BREAKER_CLOSED:
+                return True
+            if self._state == BREAKER_OPEN and time.monotonic() - self._opened_at >= self._reset_seconds:
+                self._state = BREAKER_HALF_OPEN
+                return True
+            return False
+
+    def record_success(self) -> None:
+        with self._lock:
+            self._state = BREAKER_CLOSED
+            self._failures = 0
+
+    def record_failure(self) -> None:
+        with self._lock:
+            self._failures += 1
+            if self._state == BREAKER_HALF_OPEN or self._failures >= self._failure_threshold:
+                self._open()
+
+    def trip(self) -> None:
+        """Open immediately (the monitor saw the server go down)."""
+        with self._lock:
+            if self._state != BREAKER_OPEN:
+                self._open()
+
+    def _open(self) -> None:
+        if self._state != BREAKER_OPEN:
+            logger.info("Circuit opened after %d failures", self._failures)
+        self._state = BREAKER_OPEN
+        self._opened_at = time.monotonic()
+
+
+class ServerMonitor:
+    """
+    Probes one endpoint on a schedule: every health interval while the server
+    is up, every few seconds while it is loading or down.
+    """
+
+    def __init__(self, config: BitNetConfig):
+        self.endpoint = config.endpoint_url
+        self.breaker = CircuitBreaker()
+        self.refs = 0
+        self._interval = config.health_interval_seconds
+        self._timeout = config.health_timeout_seconds
+        self._health = ServerHealth(endpoint=self.endpoint)
+        self._changed = threading.Condition()
+        self._wake = threading.Event()
+        self._stopped = threading.Event()
+        self._thread = threading.Thread(target=self._run, name="bitnet-health", daemon=True)
+        self._thread.start()
+
+    def health(self) -> ServerHealth:
+        """Cached state; never blocks on the network."""
+        with self._changed:
+            return self._health
+
+    def refresh(self) -> None:
+        """Probe now instead of at the next scheduled time."""
+        self._wake.set()
+
+    def wait_until_up(self, timeout: float) -> bool:
+        """Block until a probe sees the server up, for at most timeout seconds."""
+        deadline = time.monotonic() + timeout
+        with self._changed:
+            while not self._health.is_up and not self._stopped.is_set():
+                remaining = deadline - time.monotonic()
+                if remaining <= 0:
+                    return False
+                self._changed.wait(remaining)
+            return self._health.is_up
+
+    def _run(self) -> None:
+        while not self._stopped.is_set():
+            state, error = probe_server(self.endpoint, self._timeout)
+            self._set(state, error)
+            interval = self._interval if state == SERVER_UP else RECOVERY_INTERVAL_SECONDS
+            self._wake.wait(interval)
+            self._wake.clear()
+
+    def _set(self, state: str, error: Optional[str]) -> None:
+        if state == SERVER_UP:
+            self.breaker.record_success()
+        else:
+            self.breaker.trip()
+        with self._changed:
+            if state != self._health.state:
+                logger.info("BitNet server at %s is %s%s", self.endpoint, state, f" ({error})" if error else "")
+            self._health = ServerHealth(state, self.endpoint, error, time.monotonic())
+            self._changed.notify_all()
+
+    def stop(self) -> None:
+        self._stopped.set()
+        self._wake.set()
+        with self._changed:
+            self._changed.notify_all()
+
+
+# One monitor per endpoint, shared by every client of it
+_monitors: dict[str, ServerMonitor] = {}
+_monitors_lock = threading.Lock()
+
+
+def acquire_monitor(config: BitNetConfig) -> ServerMonitor:
+    with _monitors_lock:
+        monitor = _monitors.get(config.endpoint_url)
+        if monitor is None:
+            monitor = ServerMonitor(config)
+            _monitors[config.endpoint_url] = monitor
+        monitor.refs += 1
+        return monitor
+
+
+def release_monitor(monitor: ServerMonitor) -> None:
+    with _monitors_lock:
+        monitor.refs -= 1
+        if monitor.refs > 0:
+            return
+        if _monitors.get(monitor.endpoint) is monitor:
+            del _monitors[monitor.endpoint]
+    monitor.stop()
@@ -3,19 +3,34 @@ Centralized HTTP client for BitNet API communication.
 Eliminates duplicate HTTP logic across services.
 """
 
+import json
+import random
 import time
 from dataclasses import dataclass
-from typing import Optional
-
-import requests
+from typing import Callable, Optional
 
 from ..core.config import BitNetConfig
 from ..core.errors import APIError, ErrorCode
+from ..core.models import Degeneration, GenerationMetrics
+from .health_monitor import acquire_monitor, release_monitor
+from .model_prewarm import model_cache
 
 
 # API response field priority for parsing
 RESPONSE_FIELD_PRIORITY = ("content", "text", "completion", "generated_text")
 
+# Called with the text so far while a completion streams in; a Degeneration stops it
+Watch = Callable[[str], Optional[Degeneration]]
+
+# Retry backoff: full jitter over base * 2^attempt, capped (seconds)
+RETRY_BASE_DELAY = 0.25
+RETRY_MAX_DELAY = 4.0
+
+
+def backoff_delay(attempt: int) -> float:
+    """Jittered exponential delay before retry number attempt (0-based)."""
+    return random.uniform(0, min(RETRY_MAX_DELAY, RETRY_BASE_DELAY * 2 ** attempt))
+
 
 @dataclass(frozen=True)
 class APIResponse:
@@ -62,42 +77,129 @@ class APIResponse:
             f"API response missing expected fields: {RESPONSE_FIELD_PRIORITY}. "
             f"Received keys: {list(self.data.keys())}"
         )
+    
+    def get_metrics(self) -> Optional[GenerationMetrics]:
+        """Generation counters from the `timings` object, if the backend sent one."""
+        if not self.success or not self.data:
+            return None
+        timings = self.data.get("timings")
+        if not isinstance(timings, dict):
+            return None
+        return GenerationMetrics.from_timings(timings)
 
 
 class BitNetHTTPClient:
     """
     Unified HTTP client for all BitNet API communication.
     Single source of truth for request/response handling.
+    Server state comes from a shared background monitor, so health checks
+    never block and requests fail fast while the server is down.
     """
     
     def __init__(self, config: BitNetConfig):
+        # requests is imported on first client creation, not at application import
+        import requests
+        from requests.adapters import HTTPAdapter
+        
         self._config = config
         self._session = requests.Session()
         self._session.headers.update({"Content-Type": "application/json"})
+        # keep-alive connections reused across requests (chat and notes may overlap)
+        adapter = HTTPAdapter(pool_connections=1, pool_maxsize=config.http_pool_size)
+        self._session.mount("http://", adapter)
+        self._session.mount("https://", adapter)
+        self._monitor = acquire_monitor(config)
+        self._closed = False
     
-    def post_completion(self, payload: dict) -> APIResponse:
+    def post_completion(
+        self,
+        payload: dict,
+        timeout: Optional[float] = None,
+        watch: Optional[Watch] = None
+    ) -> APIResponse:
         """
         Execute completion request with unified error handling.
         
+        A request the server never handled (connection refused, 503 while the
+        model loads) is retried once the monitor sees the server up again,
+        with jittered exponential backoff, within the request timeout.
+        Completions are stateless on the server, so resending is safe; read
+        timeouts and errors after the response headers arrived are not retried
+        since the server may still be generating.
+        
         Args:
             payload: Request payload matching BitNet API schema
+            timeout: Seconds for this request, retries included (default: configured timeout)
+            watch: Streams the completion and calls watch(text) after every piece; when it
+                returns a Degeneration the connection is dropped, which stops llama-server
+                generating, and the text is cut at Degeneration.keep (data["stopped_client"])
             
         Returns:
             APIResponse with success status and data/error
         """
         start = time.time()
+        deadline = start + (timeout or self._config.timeout_seconds)
+        breaker = self._monitor.breaker
+        attempt = 0
+        
+        while True:
+            if not breaker.allow():
+                return self._server_unavailable(start)
+            
+            response, retryable = self._send(payload, deadline, start, watch)
+            if response.success:
+                breaker.record_success()
+                model_cache.record_first_token(response.latency_ms, response.get_metrics())
+                return response
+            if not retryable:
+                return response
+            
+            breaker.record_failure()
+            self._monitor.refresh()
+            if attempt >= self._config.retry_attempts:
+                return response
+            if not self._monitor.wait_until_up(deadline - time.time()):
+                return response
+            time.sleep(min(backoff_delay(attempt), max(0.0, deadline - time.time())))
+            attempt += 1
+    
+    def _server_unavailable(self, start: float) -> APIResponse:
+        """Fail-fast response while the circuit is open."""
+        health = self._monitor.health()
+        _, error = health.as_availability()
+        return APIResponse(
+            success=False,
+            error=APIError(
+                code=ErrorCode.NETWORK_ERROR,
+                message=f"BitNet server unavailable: {error}",
+                details={"endpoint": self._config.endpoint_url, "state": health.state}
+            ),
+            latency_ms=(time.time() - start) * 1000
+        )
+    
+    def _send(
+        self,
+        payload: dict,
+        deadline: float,
+        start: float,
+        watch: Optional[Watch] = None
+    ) -> tuple[APIResponse, bool]:
+        """One POST; returns the response and whether it may be retried."""
+        import requests
         
         try:
             response = self._session.post(
                 self._config.endpoint_url,
-                json=payload,
-                timeout=self._config.timeout_seconds
+                json=dict(payload, stream=True) if watch else payload,
+                timeout=max(deadline - time.time(), 1.0),
+                stream=watch is not None
             )
             
             latency = (time.time() - start) * 1000
             
             # Check HTTP status
             if response.status_code != 200:
+                # 503: llama-server is still loading the model
                 return APIResponse(
                     success=False,
                     error=APIError(
@@ -106,7 +208,10 @@ class BitNetHTTPClient:
                         details={"response_text": response.text[:200]}
                     ),
                     latency_ms=latency
-                )
+                ), response.status_code == 503
+            
+            if watch:
+                return self._read_stream(response, watch, deadline, start), False
             
             # Parse JSON
             try:
@@ -120,24 +225,24 @@ class BitNetHTTPClient:
                         details={"parse_error": str(e)}
                     ),
                     latency_ms=latency
-                )
+                ), False
             
             return APIResponse(
                 success=True,
                 data=data,
                 latency_ms=latency
-            )
+            ), False
             
         except requests.exceptions.Timeout:
             return APIResponse(
                 success=False,
                 error=APIError(
                     code=ErrorCode.TIMEOUT,
-                    message=f"Request exceeded {self._config.timeout_seconds}s timeout",
+                    message=f"Request exceeded {deadline - start:.0f}s timeout",
                     details={"endpoint": self._config.endpoint_url}
                 ),
                 latency_ms=(time.time() - start) * 1000
-            )
+            ), False
             
         except requests.exceptions.ConnectionError as e:
             return APIResponse(
@@ -150,7 +255,7 @@ class BitNetHTTPClient:
                         "error": str(e)
                     }
                 )
-            )
+            ), True
             
         except Exception as e:
             return APIResponse(
@@ -160,37 +265,115 @@ class BitNetHTTPClient:
                     message=f"Unexpected error: {str(e)}",
                     details={"exception_type": type(e).__name__}
                 )
-            )
+            ), False
     
-    def check_health(self) -> tuple[bool, Optional[str]]:
+    def _read_stream(self, response, watch: Watch, deadline: float, start: float) -> APIResponse:
         """
-        Check if BitNet API is available.
-        Returns (is_available, error_message).
+        Collect llama-server's server-sent events, stopping early if watch says so.
+        Transport errors here are never retryable: the headers arrived, so the
+        server has already started generating this completion.
         """
+        import requests
+        
+        sent = time.time()
+        first_piece_at: Optional[float] = None
+        text = ""
+        pieces = 0
+        final: dict = {}
+        detection: Optional[Degeneration] = None
         try:
-            # Try health endpoint first
-            health_url = self._config.endpoint_url.replace("/completion", "/health")
-            
-            try:
-                response = requests.get(health_url, timeout=5)
-                if response.status_code == 200:
-                    return True, None
-            except:
-                # Health endpoint might not exist, try root
-                root_url = self._config.endpoint_url.split("/completion")[0]
-                response = requests.get(root_url, timeout=5)
-                if response.status_code in (200, 404):  # 404 means server responding
-                    return True, None
-            
-            return False, f"Server unhealthy (status {response.status_code})"
-            
-        except requests.exceptions.ConnectionError:
-            return False, f"Cannot connect to {self._config.endpoint_url}"
+            for line in response.iter_lines():
+                if not line.startswith(b"data: "):
+                    continue
+                event = json.loads(line[len(b"data: "):])
+                piece = event.get("content", "")
+                if piece:
+                    first_piece_at = first_piece_at or time.time()
+                    pieces += 1
+                    text += piece
+                if event.get("stop"):
+                    final = event
+                    break
+                detection = watch(text)
+                if detection is not None:
+                    break
+                if time.time() > deadline:
+                    return APIResponse(
+                        success=False,
+                        error=APIError(
+                            code=ErrorCode.TIMEOUT,
+                            message=f"Request exceeded {deadline - start:.0f}s timeout",
+                            details={"endpoint": self._config.endpoint_url}
+                        ),
+                        latency_ms=(time.time() - start) * 1000
+                    )
+        except ValueError as e:
+            return APIResponse(
+                success=False,
+                error=APIError(
+                    code=ErrorCode.INVALID_RESPONSE,
+                    message="Invalid JSON in response stream",
+                    details={"parse_error": str(e)}
+                ),
+                latency_ms=(time.time() - start) * 1000
+            )
         except requests.exceptions.Timeout:
-            return False, "Connection timeout"
-        except Exception as e:
-            return False, f"Health check error: {e}"
+            return APIResponse(
+                success=False,
+                error=APIError(
+                    code=ErrorCode.TIMEOUT,
+                    message=f"Request exceeded {deadline - start:.0f}s timeout",
+                    details={"endpoint": self._config.endpoint_url, "partial_text": text[:200]}
+                ),
+                latency_ms=(time.time() - start) * 1000
+            )
+        except requests.exceptions.RequestException as e:
+            return APIResponse(
+                success=False,
+                error=APIError(
+                    code=ErrorCode.NETWORK_ERROR,
+                    message="Connection to BitNet server lost mid-response",
+                    details={
+                        "endpoint": self._config.endpoint_url,
+                        "error": str(e),
+                        "partial_text": text[:200]
+                    }
+                ),
+                latency_ms=(time.time() - start) * 1000
+            )
+        finally:
+            # Closing an unfinished stream drops the connection, which cancels the generation
+            response.close()
+        
+        data = dict(final, content=text)
+        if detection is not None:
+            now = time.time()
+            first = first_piece_at or now
+            data.update(
+                content=text[:detection.keep],
+                stop=True,
+                stopped_client=detection.reason,
+                tokens_predicted=pieces,
+                timings={
+                    "prompt_ms": (first - sent) * 1000,
+                    "predicted_n": pieces,
+                    "predicted_ms": (now - first) * 1000,
+                },
+            )
+        return APIResponse(success=True, data=data, latency_ms=(time.time() - start) * 1000)
+    
+    def check_health(self, refresh: bool = False) -> tuple[bool, Optional[str]]:
+        """
+        Last known server state as (is_available, error_message).
+        Never blocks; refresh=True asks the monitor to probe again now.
+        """
+        if refresh:
+            self._monitor.refresh()
+        return self._monitor.health().as_availability()
     
     def close(self) -> None:
         """Close HTTP session and release resources."""
-        self._session.close()
+        if not self._closed:
+            self._closed = True
+            self._session.close()
+            release_monitor(self._monitor)
@@ -0,0 +1,845 @@
+"""
+In-process BitNet inference backend.
+Same contract as BitNetHTTPClient, with generation in a dedicated worker process.
+"""
+
+import atexit
+import importlib
+import importlib.machinery
+import importlib.util
+import itertools
+import logging
+import multiprocessing
+import os
+import sys
+import threading
+import time
+from collections import deque
+from pathlib import Path
+from typing import Callable, Optional
+
+from ..core.config import (
+    BitNetConfig, BACKEND_LLAMA_CPP, BACKEND_REFERENCE, DRAFT_LAYERS, DRAFT_NGRAM
+)
+from ..core.errors import APIError, ErrorCode
+from ..core.models import Degeneration
+from .http_client import APIResponse, Watch
+from .model_prewarm import model_cache
+
+
+logger = logging.getLogger(__name__)
+
+# Seconds to wait for the worker to exit on close
+WORKER_SHUTDOWN_TIMEOUT = 5.0
+
+
+class LocalBitNetBackend:
+    """
+    Drop-in replacement for BitNetHTTPClient when llama-server is not running.
+    The model lives in a separate process so generation never holds the GIL
+    the Qt event loop needs. Clients with the same model share one worker.
+    """
+
+    def __init__(self, config: BitNetConfig):
+        self._config = config
+        self._worker = _acquire_worker(config)
+        self._closed = False
+
+    def post_completion(
+        self,
+        payload: dict,
+        timeout: Optional[float] = None,
+        watch: Optional[Watch] = None
+    ) -> APIResponse:
+        """
+        Execute completion request in the worker process.
+
+        Args:
+            payload: Request payload matching BitNet API schema
+            timeout: Seconds for this request (default: configured timeout)
+            watch: Streams the completion and calls watch(text) after every piece; when it
+                returns a Degeneration the worker is told to stop generating and the
+                text is cut at Degeneration.keep (data["stopped_client"])
+
+        Returns:
+            APIResponse with success status and data/error
+        """
+        start = time.time()
+        timeout = timeout or self._config.timeout_seconds
+
+        is_ready, error = self._worker.wait_ready(timeout)
+        if not is_ready:
+            return APIResponse(
+                success=False,
+                error=APIError(
+                    code=ErrorCode.NETWORK_ERROR,
+                    message=error or "Local BitNet backend not ready",
+                    details={"backend": self._config.backend}
+                ),
+                latency_ms=(time.time() - start) * 1000
+            )
+
+        try:
+            reply = self._worker.request(payload, deadline=start + timeout, watch=watch)
+        except (EOFError, OSError) as e:
+            return APIResponse(
+                success=False,
+                error=APIError(
+                    code=ErrorCode.NETWORK_ERROR,
+                    message="Local BitNet worker exited",
+                    details={"backend": self._config.backend, "error": str(e)}
+                ),
+                latency_ms=(time.time() - start) * 1000
+            )
+
+        latency = (time.time() - start) * 1000
+
+        if reply is None:
+            return APIResponse(
+                success=False,
+                error=APIError(
+                    code=ErrorCode.TIMEOUT,
+                    message=f"Request exceeded {timeout:.0f}s timeout",
+                    details={"backend": self._config.backend}
+                ),
+                latency_ms=latency
+            )
+
+        ok, data = reply
+        if not ok:
+            return APIResponse(
+                success=False,
+                error=APIError(
+                    code=ErrorCode.SERVER_ERROR,
+                    message=f"Local generation failed: {data.get('message')}",
+                    details=data
+                ),
+                latency_ms=latency
+            )
+
+        result = APIResponse(success=True, data=data, latency_ms=latency)
+        model_cache.record_first_token(latency, result.get_metrics())
+        return result
+
+    def check_health(self, refresh: bool = False) -> tuple[bool, Optional[str]]:
+        """
+        Check if the worker has loaded the model.
+        Never blocks - returns the current state (always current, so refresh is unused).
+        """
+        return self._worker.wait_ready(0)
+
+    def close(self) -> None:
+        """Release this client; the worker stops when its last client closes."""
+        if not self._closed:
+            self._closed = True
+            _release_worker(self._worker)
+
+
+class _PendingReply:
+    """
+    A request waiting for the worker's reply.
+    With a watch, the worker streams text pieces while it generates; once
+    the watch reports a Degeneration the reply is built from the text so far.
+    """
+
+    def __init__(self, watch: Optional[Watch] = None):
+        self.event = threading.Event()
+        self.reply: Optional[tuple[bool, dict]] = None
+        self.watch = watch
+        self._sent = time.time()
+        self._first_piece_at: Optional[float] = None
+        self._text = ""
+
+    def progress(self, data: dict) -> bool:
+        """Add a streamed piece; True when the watch says to stop generating."""
+        if self.watch is None or self.event.is_set():
+            return False
+        self._first_piece_at = self._first_piece_at or time.time()
+        self._text += data["content"]
+        detection = self.watch(self._text)
+        if detection is None:
+            return False
+        self.reply = (True, self._stopped_data(detection, int(data["tokens_predicted"])))
+        self.event.set()
+        return True
+
+    def _stopped_data(self, detection: Degeneration, tokens: int) -> dict:
+        now = time.time()
+        first = self._first_piece_at or now
+        return {
+            "content": self._text[:detection.keep],
+            "stop": True,
+            "stopped_client": detection.reason,
+            "tokens_predicted": tokens,
+            "timings": {
+                "prompt_ms": (first - self._sent) * 1000,
+                "predicted_n": tokens,
+                "predicted_ms": (now - first) * 1000,
+            },
+        }
+
+
+class _WorkerProcess:
+    """
+    Spawned worker plus the pipes used to talk to it.
+    Several requests may be in flight; a reader thread routes replies by request id.
+    """
+
+    def __init__(self, settings: dict):
+        self.key = _worker_key(settings)
+        self.refs = 0
+        self._settings = settings
+        self._send_lock = threading.Lock()
+        self._status_lock = threading.Lock()
+        self._pending: dict[int, _PendingReply] = {}
+        self._pending_lock = threading.Lock()
+        self._request_ids = itertools.count(1)
+        self._ready = False
+        self._load_error: Optional[str] = None
+
+        ctx = multiprocessing.get_context("spawn")
+        self._conn, worker_conn = ctx.Pipe()
+        self._status_conn, worker_status_conn = ctx.Pipe(duplex=False)
+        self._process = ctx.Process(
+            target=_worker_main,
+            args=(settings, worker_conn, worker_status_conn),
+            name=f"bitnet-{settings['backend']}",
+            daemon=True
+        )
+        self._process.start()
+
+        self._reader = threading.Thread(
+            target=self._read_replies, name=f"bitnet-{settings['backend']}-replies", daemon=True
+        )
+        self._reader.start()
+
+    @property
+    def is_alive(self) -> bool:
+        return self._process.is_alive()
+
+    def request(
+        self,
+        payload: dict,
+        deadline: float,
+        watch: Optional[Watch] = None
+    ) -> Optional[tuple[bool, dict]]:
+        """
+        Send one completion and wait for its reply. None on timeout.
+        Raises EOFError if the worker is gone.
+        """
+        if not self._reader.is_alive():
+            raise EOFError("worker pipe closed")
+
+        request_id = next(self._request_ids)
+        pending = _PendingReply(watch)
+        with self._pending_lock:
+            self._pending[request_id] = pending
+        try:
+            with self._send_lock:
+                self._conn.send((request_id, dict(payload, stream=True) if watch else payload))
+            if not pending.event.wait(max(0.0, deadline - time.time())):
+                # stop the generation between tokens; a late reply is dropped
+                self._send_cancel(request_id)
+                return None
+            if pending.reply is None:
+                raise EOFError("worker pipe closed")
+            return pending.reply
+        finally:
+            with self._pending_lock:
+                self._pending.pop(request_id, None)
+
+    def _send_cancel(self, request_id: int) -> None:
+        try:
+            with self._send_lock:
+                self._conn.send((request_id, None))
+        except OSError:
+            pass
+
+    def _read_replies(self) -> None:
+        """Reader thread: hand each reply (or streamed piece, ok=None) to its waiting request."""
+        while True:
+            try:
+                reply_id, ok, data = self._conn.recv()
+            except (EOFError, OSError):
+                break
+            with self._pending_lock:
+                pending = self._pending.get(reply_id)
+            if pending is None:
+                continue
+            if ok is None:
+                if pending.progress(data):
+                    self._send_cancel(reply_id)
+                continue
+            if not pending.event.is_set():
+                pending.reply = (ok, data)
+                pending.event.set()
+
+        # worker gone: wake every waiter (reply stays None)
+        with self._pending_lock:
+            for pending in self._pending.values():
+                pending.event.set()
+
+    def wait_ready(self, timeout: float) -> tuple[bool, Optional[str]]:
+        """Consume the worker's load status, waiting up to timeout seconds."""
+        if self._ready:
+            return True, None
+
+        # timeout=0 (health checks from the GUI thread) must never block behind a waiting request
+        if timeout > 0:
+            acquired = self._status_lock.acquire(timeout=timeout)
+        else:
+            acquired = self._status_lock.acquire(blocking=False)
+        if not acquired:
+            return False, self._loading_message()
+
+        try:
+            return self._poll_status(timeout)
+        finally:
+            self._status_lock.release()
+
+    def _poll_status(self, timeout: float) -> tuple[bool, Optional[str]]:
+        if self._ready:
+            return True, None
+        if self._load_error:
+            return False, self._load_error
+
+        try:
+            if self._status_conn.poll(timeout):
+                status, info = self._status_conn.recv()
+                if status == "ready":
+                    logger.info("Local model ready: %s", info)
+                    self._ready = True
+                    return True, None
+                self._load_error = f"Local model failed to load: {info}"
+                return False, self._load_error
+        except (EOFError, OSError):
+            pass
+
+        if not self._process.is_alive():
+            self._load_error = (
+                f"Local BitNet worker exited (code {self._process.exitcode})"
+            )
+            return False, self._load_error
+
+        return False, self._loading_message()
+
+    def _loading_message(self) -> str:
+        return f"Loading local model ({self._settings['backend']})..."
+
+    def stop(self) -> None:
+        """Ask the worker to exit, terminating it if it does not."""
+        if self._process.is_alive():
+            try:
+                with self._send_lock:
+                    self._conn.send(None)
+            except OSError:
+                pass
+            self._process.join(WORKER_SHUTDOWN_TIMEOUT)
+            if self._process.is_alive():
+                self._process.terminate()
+        self._conn.close()
+        self._status_conn.close()
+
+
+# Shared workers, keyed by model settings
+_workers: dict[tuple, _WorkerProcess] = {}
+_workers_lock = threading.Lock()
+
+
+def _worker_key(settings: dict) -> tuple:
+    return tuple(sorted(settings.items()))
+
+
+def _acquire_worker(config: BitNetConfig) -> _WorkerProcess:
+    settings = _worker_settings(config)
+    key = _worker_key(settings)
+    with _workers_lock:
+        worker = _workers.get(key)
+        if worker is None or not worker.is_alive:
+            worker = _WorkerProcess(settings)
+            _workers[key] = worker
+        worker.refs += 1
+        return worker
+
+
+def _release_worker(worker: _WorkerProcess) -> None:
+    with _workers_lock:
+        worker.refs -= 1
+        if worker.refs > 0:
+            return
+        if _workers.get(worker.key) is worker:
+            del _workers[worker.key]
+    worker.stop()
+
+
+def shutdown_local_backends() -> None:
+    """Stop every worker regardless of open clients (application exit)."""
+    with _workers_lock:
+        workers = list(_workers.values())
+        _workers.clear()
+    for worker in workers:
+        worker.stop()
+
+
+# Runs before multiprocessing's own exit handler, so workers get to exit cleanly
+atexit.register(shutdown_local_backends)
+
+
+def _worker_settings(config: BitNetConfig) -> dict:
+    """Plain-data settings sent to the spawned worker."""
+    return {
+        "backend": config.backend,
+        "model_path": str(config.model_path) if config.model_path else None,
+        "reference_model_dir": str(config.resolved_reference_model_dir),
+        "threads": config.threads or os.cpu_count() or 4,
+        "context_size": config.context_size,
+        "draft_mode": config.draft_mode,
+        "draft_tokens": config.draft_tokens,
+        "draft_layers": config.draft_layers,
+        "parallel": config.parallel_requests,
+    }
+
+
+# Worker process
+
+def _worker_main(settings: dict, conn, status_conn) -> None:
+    """Worker entry point: load the engine, then serve requests until told to stop."""
+    try:
+        if settings["backend"] == BACKEND_LLAMA_CPP:
+            engine = _LlamaCppEngine(settings)
+        elif settings["backend"] == BACKEND_REFERENCE:
+            engine = _ReferenceEngine(settings)
+        else:
+            raise ValueError(f"Not a local backend: {settings['backend']}")
+    except Exception as e:
+        status_conn.send(("error", f"{type(e).__name__}: {e}"))
+        return
+
+    status_conn.send(("ready", engine.info()))
+
+    if engine.batched:
+        _serve_batched(engine, conn)
+    else:
+        _serve_serial(engine, conn)
+
+
+def _error_data(e: Exception) -> dict:
+    return {"message": str(e), "exception_type": type(e).__name__}
+
+
+class _Inbox:
+    """
+    Worker end of the request pipe for the serial engine.
+    Messages are read between tokens while a request generates: a cancel for
+    it stops the generation, a cancel for a queued request drops that request,
+    and new requests wait their turn.
+    """
+
+    def __init__(self, conn):
+        self._conn = conn
+        self._queued: deque = deque()
+        self._closing = False
+        self._stopped_id: Optional[int] = None
+
+    def next(self) -> Optional[tuple[int, dict]]:
+        """Next request to run, blocking while idle. None when the worker should exit."""
+        while True:
+            if self._closing:
+                return None
+            if self._queued:
+                return self._queued.popleft()
+            self._receive()
+
+    def stop_requested(self, request_id: int) -> bool:
+        """Drain what arrived since the last token; True once request_id has to stop."""
+        while not self._closing and self._conn.poll(0):
+            self._receive()
+        return self._closing or self._stopped_id == request_id
+
+    def _receive(self) -> None:
+        try:
+            message = self._conn.recv()
+        except EOFError:
+            message = None
+        if message is None:
+            self._closing = True
+            return
+        request_id, payload = message
+        if payload is not None:
+            self._queued.append(message)
+            return
+        queued = [m for m in self._queued if m[0] != request_id]
+        if len(queued) == len(self._queued):
+            self._stopped_id = request_id  # the running request (or one already finished)
+        self._queued = deque(queued)
+
+
+def _serve_serial(engine, conn) -> None:
+    """One request at a time, in arrival order; cancels stop the running one between tokens."""
+    inbox = _Inbox(conn)
+    while True:
+        message = inbox.next()
+        if message is None:
+            return
+
+        request_id, payload = message
+        try:
+            conn.send((request_id, True, engine.complete(
+                payload,
+                emit=_emitter(conn, request_id) if payload.get("stream") else None,
+                cancelled=lambda: inbox.stop_requested(request_id)
+            )))
+        except Exception as e:
+            conn.send((request_id, False, _error_data(e)))
+
+
+def _serve_batched(engine, conn) -> None:
+    """
+    Requests join the running batch as they arrive: new messages are drained
+    between decode steps, and the worker only blocks on the pipe when idle.
+    """
+    while True:
+        while not engine.has_work or conn.poll(0):
+            try:
+                message = conn.recv()
+            except EOFError:
+                return
+            if message is None:
+                return
+
+            request_id, payload = message
+            if payload is None:
+                engine.cancel(request_id)
+                continue
+            try:
+                engine.submit(
+                    request_id, payload,
+                    emit=_emitter(conn, request_id) if payload.get("stream") else None
+                )
+            except Exception as e:
+                conn.send((request_id, False, _error_data(e)))
+
+        for reply in engine.step():
+            conn.send(reply)
+
+
+def _emitter(conn, request_id: int) -> Callable[[str, int], None]:
+    """Sends a streamed piece and the token count so far to the client (ok=None marks a piece)."""
+    def emit(piece: str, tokens: int) -> None:
+        conn.send((request_id, None, {"content": piece, "tokens_predicted": tokens}))
+    return emit
+
+
+def _trim_at_stop(text: str, stop: list[str]) -> tuple[str, Optional[str]]:
+    """Cut text at the earliest stop string. Returns (text, matched_stop)."""
+    cut, matched = len(text), None
+    for word in stop:
+        index = text.find(word)
+        if index != -1 and index < cut:
+            cut, matched = index, word
+    return text[:cut], matched
+
+
+class _LlamaCppEngine:
+    """
+    llama-cpp-python binding over the GGUF model.
+    Requires a build that includes the BitNet i2_s kernels.
+    """
+
+    batched = False
+
+    def __init__(self, settings: dict):
+        from llama_cpp import Llama
+
+        draft_model = None
+        if settings["draft_mode"] == DRAFT_NGRAM:
+            from llama_cpp.llama_speculative import LlamaPromptLookupDecoding
+            draft_model = LlamaPromptLookupDecoding(num_pred_tokens=settings["draft_tokens"])
+
+        self._settings = settings
+        self._llm = Llama(
+            model_path=settings["model_path"],
+            n_ctx=settings["context_size"],
+            n_threads=settings["threads"],
+            draft_model=draft_model,
+            verbose=False
+        )
+
+    def info(self) -> dict:
+        return {
+            "engine": BACKEND_LLAMA_CPP,
+            "model": self._settings["model_path"],
+            "threads": self._settings["threads"],
+            "context_size": self._settings["context_size"],
+            "draft": self._settings["draft_mode"],
+        }
+
+    def complete(
+        self,
+        payload: dict,
+        emit: Optional[Callable[[str, int], None]] = None,
+        cancelled: Optional[Callable[[], bool]] = None
+    ) -> dict:
+        start = time.time()
+        prompt = payload["prompt"]
+        # Streamed one token per chunk, so a cancel takes effect between tokens
+        chunks = self._llm.create_completion(
+            prompt,
+            max_tokens=payload.get("n_predict", 128),
+            temperature=payload.get("temperature", 0.7),
+            top_p=payload.get("top_p", 0.9),
+            top_k=payload.get("top_k", 40),
+            repeat_penalty=payload.get("repeat_penalty", 1.1),
+            stop=payload.get("stop") or None,
+            stream=True
+        )
+        text = ""
+        predicted = 0
+        finish_reason = None
+        try:
+            for chunk in chunks:
+                choice = chunk["choices"][0]
+                finish_reason = choice.get("finish_reason") or finish_reason
+                if choice["text"]:
+                    predicted += 1
+                    text += choice["text"]
+                    if emit is not None:
+                        emit(choice["text"], predicted)
+                if cancelled is not None and cancelled():
+                    break
+        finally:
+            chunks.close()
+        elapsed_ms = (time.time() - start) * 1000
+        return {
+            "content": text,
+            "stop": True,
+            "stopped_limit": finish_reason == "length",
+            "tokens_evaluated": len(self._llm.tokenize(prompt.encode("utf-8"))),
+            "tokens_predicted": predicted,
+            "timings": {
+                "predicted_n": predicted,
+                "predicted_ms": elapsed_ms,
+                "predicted_per_second": predicted / (elapsed_ms / 1000) if elapsed_ms else 0.0,
+            },
+        }
+
+
+class _ReferenceEngine:
+    """
+    PyTorch reference BitnetForCausalLM.
+    One request at a time on the static-cache CPU generator, or several
+    sharing each decode step through the continuous batching scheduler
+    when more than one parallel request is configured.
+    """
+
+    PACKAGE_NAME = "bitnet_reference"
+
+    def __init__(self, settings: dict):
+        import torch
+
+        self._settings = settings
+        torch.set_num_threads(settings["threads"])
+        torch.set_grad_enabled(False)
+
+        model_dir = Path(settings["reference_model_dir"])
+        package = _import_model_package(self.PACKAGE_NAME, model_dir)
+        modeling = importlib.import_module(f"{package}.modeling_bitnet")
+        tokenization = importlib.import_module(f"{package}.tokenization_bitnet")
+
+        self._tokenizer = tokenization.BitnetTokenizer.from_pretrained(str(model_dir), use_fast=False)
+        model = modeling.BitnetForCausalLM.from_pretrained(
+            str(model_dir),
+            attn_implementation="sdpa",
+            torch_dtype=torch.float32,
+            low_cpu_mem_usage=True
+        )
+        self._max_cache_len = min(settings["context_size"], model.config.max_position_embeddings)
+        self._eos_token_id = self._tokenizer.eos_token_id
+
+        self._generator = None
+        self._drafter = None
+        self._scheduler = None
+        self._requests: dict[int, tuple[list[str], list[int]]] = {}
+
+        if settings["parallel"] > 1:
+            batching = importlib.import_module(f"{package}.batching_bitnet")
+            self._scheduler = batching.ContinuousBatchingScheduler(
+                model, max_batch_size=settings["parallel"], max_cache_len=self._max_cache_len
+            )
+            return
+
+        generation = importlib.import_module(f"{package}.generation_bitnet")
+        speculative = importlib.import_module(f"{package}.speculative_bitnet")
+        self._generator = generation.BitnetCPUGenerator(model, max_cache_len=self._max_cache_len)
+        if settings["draft_mode"] == DRAFT_NGRAM:
+            self._drafter = speculative.PromptLookupDrafter()
+        elif settings["draft_mode"] == DRAFT_LAYERS:
+            self._drafter = speculative.LayerSkipDrafter(
+                model, settings["draft_layers"], max_cache_len=self._max_cache_len
+            )
+
+    @property
+    def batched(self) -> bool:
+        return self._scheduler is not None
+
+    @property
+    def has_work(self) -> bool:
+        return self._scheduler is not None and self._scheduler.has_work
+
+    def info(self) -> dict:
+        return {
+            "engine": BACKEND_REFERENCE,
+            "model": self._settings["reference_model_dir"],
+            "threads": self._settings["threads"],
+            "context_size": self._max_cache_len,
+            "compiled": self._generator is not None and self._generator.is_compiled,
+            "draft": self._settings["draft_mode"],
+            "parallel": self._settings["parallel"],
+        }
+
+    def _prompt_ids(self, payload: dict) -> list[int]:
+        ids = self._tokenizer(payload["prompt"]).input_ids
+        # keep the most recent context if the prompt overflows the cache
+        return ids[-(self._max_cache_len - 1):]
+
+    def _sampling(self, payload: dict) -> dict:
+        return {
+            "max_new_tokens": payload.get("n_predict", 128),
+            "temperature": payload.get("temperature", 0.7),
+            "top_k": payload.get("top_k", 40),
+            "top_p": payload.get("top_p", 0.9),
+            "eos_token_id": self._eos_token_id,
+        }
+
+    def _result(self, generated: list[int], stop: list[str], stats) -> dict:
+        text = self._tokenizer.decode(generated, skip_special_tokens=True)
+        text, stopping_word = _trim_at_stop(text, stop)
+        return {
+            "content": text,
+            "stop": True,
+            "stopped_eos": bool(generated) and generated[-1] == self._eos_token_id,
+            "stopped_word": stopping_word is not None,
+            "stopping_word": stopping_word or "",
+            "tokens_evaluated": stats.prompt_tokens,
+            "tokens_predicted": stats.generated_tokens,
+            "timings": stats.to_timings(),
+        }
+
+    def complete(
+        self,
+        payload: dict,
+        emit: Optional[Callable[[str, int], None]] = None,
+        cancelled: Optional[Callable[[], bool]] = None
+    ) -> dict:
+        import torch
+
+        stop = payload.get("stop") or []
+        tokens = _TokenStream(self._tokenizer, stop, emit, cancelled)
+        _, stats = self._generator.generate(
+            torch.tensor([self._prompt_ids(payload)]),
+            on_token=tokens,
+            drafter=self._drafter,
+            num_draft_tokens=self._settings["draft_tokens"],
+            **self._sampling(payload)
+        )
+        return self._result(tokens.generated, stop, stats)
+
+    def submit(
+        self,
+        request_id: int,
+        payload: dict,
+        emit: Optional[Callable[[str, int], None]] = None
+    ) -> None:
+        """Queue a request on the batching scheduler (cancels are applied by the scheduler between steps)."""
+        stop = payload.get("stop") or []
+        tokens = _TokenStream(self._tokenizer, stop, emit)
+        self._scheduler.add_request(
+            request_id, self._prompt_ids(payload), on_token=tokens, **self._sampling(payload)
+        )
+        self._requests[request_id] = (stop, tokens.generated)
+
+    def cancel(self, request_id: int) -> None:
+        self._scheduler.cancel(request_id)
+
+    def step(self) -> list[tuple[int, bool, dict]]:
+        """Run one scheduler step. Returns replies for the requests that finished."""
+        try:
+            finished = self._scheduler.step()
+        except Exception as e:
+            # a failed forward leaves the batch in an unknown state: fail everything in it
+            replies = [(request_id, False, _error_data(e)) for request_id in self._requests]
+            for request_id in self._requests:
+                self._scheduler.cancel(request_id)
+            self._scheduler.step()
+            self._requests.clear()
+            return replies
+
+        replies = []
+        for sequence in finished:
+            stop, generated = self._requests.pop(sequence.request_id)
+            if not sequence.cancelled:  # the client already gave up on cancelled ones
+                replies.append((sequence.request_id, True, self._result(generated, stop, sequence.stats)))
+        return replies
+
+
+class _TokenStream:
+    """
+    on_token callback for one reference-engine request.
+    Tokens are detokenized incrementally (each piece is the decode of the
+    tokens since the previous piece, minus the decode of that previous
+    piece), so the per-token cost stays constant however long the note gets.
+    Stops at a stop string or once cancelled() says the client gave up, and
+    hands every new piece to emit.
+    """
+
+    def __init__(
+        self,
+        tokenizer,
+        stop: list[str],
+        emit: Optional[Callable[[str, int], None]] = None,
+        cancelled: Optional[Callable[[], bool]] = None
+    ):
+        self.generated: list[int] = []
+        self._tokenizer = tokenizer
+        self._stop = [s for s in stop if s]
+        self._longest_stop = max((len(s) for s in self._stop), default=0)
+        self._emit = emit
+        self._cancelled = cancelled
+        self._text = ""
+        self._prefix_offset = 0
+        self._read_offset = 0
+
+    def __call__(self, token_id: int) -> bool:
+        self.generated.append(token_id)
+        piece = self._next_piece()
+        if piece:
+            if self._emit is not None:
+                self._emit(piece, len(self.generated))
+            if self._stop:
+                # Only the new piece plus enough before it for a stop string that straddles
+                self._text = (self._text + piece)[-(len(piece) + self._longest_stop - 1):]
+                if any(s in self._text for s in self._stop):
+                    return True
+        return self._cancelled is not None and self._cancelled()
+
+    def _next_piece(self) -> str:
+        decode = self._tokenizer.decode
+        prefix = decode(self.generated[self._prefix_offset:self._read_offset], skip_special_tokens=True)
+        text = decode(self.generated[self._prefix_offset:], skip_special_tokens=True)
+        # an unfinished multi-byte character decodes to U+FFFD: wait for its next token
+        if len(text) <= len(prefix) or text.endswith("\ufffd"):
+            return ""
+        self._prefix_offset, self._read_offset = self._read_offset, len(self.generated)
+        return text[len(prefix):]
+
+
+def _import_model_package(name: str, model_dir: Path) -> str:
+    """
+    Import a HF checkpoint directory (relative imports, no __init__.py,
+    hyphenated name) as a package so its modules can be loaded.
+    """
+    if name not in sys.modules:
+        spec = importlib.machinery.ModuleSpec(name, None, is_package=True)
+        spec.submodule_search_locations = [str(model_dir)]
+        sys.modules[name] = importlib.util.module_from_spec(spec)
+    return name
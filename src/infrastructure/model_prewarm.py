@@ -0,0 +1,291 @@
+"""
+Model page-cache prewarming.
+Reads the GGUF file once in a background thread so the first request does not
+fault the weights in from disk, and optionally pins them in RAM with mlock.
+"""
+
+import ctypes
+import ctypes.util
+import logging
+import mmap
+import os
+import sys
+import threading
+import time
+from dataclasses import dataclass, replace
+from pathlib import Path
+from typing import Callable, Optional
+
+from ..core.models import GenerationMetrics
+
+
+logger = logging.getLogger(__name__)
+
+# Sequential read size: large enough for readahead to stay ahead of us
+PREWARM_CHUNK_BYTES = 16 * 1024 * 1024
+
+# Prewarm states
+PREWARM_IDLE = "idle"          # not started (disabled, or no GGUF backend)
+PREWARM_WARMING = "warming"
+PREWARM_WARM = "warm"
+PREWARM_FAILED = "failed"
+
+
+@dataclass(frozen=True)
+class FirstTokenLatency:
+    """Latency to the first generated token of the session's first request."""
+
+    milliseconds: float
+    warm: bool                  # the prewarm had finished before the request started
+
+    def summary(self) -> str:
+        cache = "warm" if self.warm else "cold"
+        return f"first token {self.milliseconds:.0f} ms ({cache} cache)"
+
+
+@dataclass(frozen=True)
+class PrewarmStatus:
+    """Snapshot of the prewarm for the UI."""
+
+    state: str = PREWARM_IDLE
+    path: Optional[Path] = None
+    total_bytes: int = 0
+    done_bytes: int = 0
+    elapsed_s: float = 0.0
+    locked: bool = False
+    lock_error: Optional[str] = None
+    error: Optional[str] = None
+    first_token: Optional[FirstTokenLatency] = None
+
+    @property
+    def is_running(self) -> bool:
+        return self.state == PREWARM_WARMING
+
+    @property
+    def is_warm(self) -> bool:
+        return self.state == PREWARM_WARM
+
+    @property
+    def progress(self) -> float:
+        return self.done_bytes / self.total_bytes if self.total_bytes else 0.0
+
+    def summary(self) -> str:
+        """One line for the Settings tab, e.g. '✅ Model cached (1.1 GB in 2.4 s), locked'."""
+        size = f"{self.total_bytes / 1e9:.1f} GB"
+        if self.state == PREWARM_WARMING:
+            text = f"⏳ Caching model... {self.progress:.0%} of {size}"
+        elif self.state == PREWARM_WARM:
+            text = f"✅ Model cached ({size} in {self.elapsed_s:.1f} s)"
+            if self.locked:
+                text += ", locked in RAM"
+            elif self.lock_error:
+                text += f", not locked: {self.lock_error}"
+        elif self.state == PREWARM_FAILED:
+            text = f"❌ Model not cached: {self.error}"
+        else:
+            text = "Model cache: not prewarmed"
+        if self.first_token is not None:
+            text += f" · {self.first_token.summary()}"
+        return text
+
+
+class ModelPrewarmer:
+    """
+    Background sequential read of the model file.
+    Backends map the GGUF, so the pages read here are the ones they fault on;
+    with locking on, a read-only mapping of the file stays mlocked until close().
+    """
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._status = PrewarmStatus()
+        self._thread: Optional[threading.Thread] = None
+        self._stop = threading.Event()
+        self._finished_at: Optional[float] = None
+        self._release: Optional[Callable[[], None]] = None
+
+    def status(self) -> PrewarmStatus:
+        with self._lock:
+            return self._status
+
+    def _update(self, **changes) -> None:
+        with self._lock:
+            self._status = replace(self._status, **changes)
+
+    def start(self, path: Path, lock: bool = False) -> None:
+        """Start prewarming path in the background; a second call is ignored."""
+        if self._thread is not None:
+            return
+        try:
+            total = path.stat().st_size
+        except OSError as e:
+            self._update(state=PREWARM_FAILED, path=path, error=e.strerror or str(e))
+            return
+        self._update(state=PREWARM_WARMING, path=path, total_bytes=total)
+        self._thread = threading.Thread(
+            target=self._run, args=(path, total, lock), name="model-prewarm", daemon=True
+        )
+        self._thread.start()
+
+    def _run(self, path: Path, total: int, lock: bool) -> None:
+        start = time.perf_counter()
+        try:
+            with open(path, "rb", buffering=0) as f:
+                _advise_sequential(f.fileno(), total)
+                buffer = memoryview(bytearray(PREWARM_CHUNK_BYTES))
+                done = 0
+                while not self._stop.is_set():
+                    n = f.readinto(buffer)
+                    if not n:
+                        break
+                    done += n
+                    self._update(done_bytes=done, elapsed_s=time.perf_counter() - start)
+                if self._stop.is_set():
+                    return
+                lock_error = None
+                if lock:
+                    try:
+                        self._release = _lock_file(f.fileno(), total)
+                    except OSError as e:
+                        lock_error = e.strerror or str(e)
+                        logger.warning("Could not lock %s in RAM: %s", path, lock_error)
+        except OSError as e:
+            self._update(state=PREWARM_FAILED, error=e.strerror or str(e))
+            logger.warning("Model prewarm of %s failed: %s", path, e)
+            return
+
+        self._finished_at = time.perf_counter()
+        self._update(
+            state=PREWARM_WARM,
+            elapsed_s=self._finished_at - start,
+            locked=self._release is not None,
+            lock_error=lock_error
+        )
+        logger.info("Model prewarm: %s", self.status().summary())
+
+    def record_first_token(self, latency_ms: float, metrics: Optional[GenerationMetrics]) -> None:
+        """
+        Note the first successful completion of the session.
+        Prompt evaluation plus one decode step when the backend reports timings,
+        otherwise the whole request; warm if the prewarm finished before it began.
+        """
+        if self.status().first_token is not None:
+            return
+        first_token_ms = metrics.first_token_ms if metrics else None
+        if first_token_ms is None:
+            first_token_ms = latency_ms
+        started = time.perf_counter() - latency_ms / 1000
+        warm = self._finished_at is not None and self._finished_at <= started
+        with self._lock:
+            if self._status.first_token is not None:
+                return
+            self._status = replace(self._status, first_token=FirstTokenLatency(first_token_ms, warm))
+        logger.info("Model %s", self.status().first_token.summary())
+
+    def close(self) -> None:
+        """Stop a running prewarm and unlock the model."""
+        self._stop.set()
+        if self._thread is not None:
+            self._thread.join(timeout=1.0)
+        if self._release is not None:
+            self._release()
+            self._release = None
+
+
+def _advise_sequential(fd: int, size: int) -> None:
+    """Ask the kernel for aggressive readahead over the whole file."""
+    if hasattr(os, "posix_fadvise"):
+        os.posix_fadvise(fd, 0, 0, os.POSIX_FADV_SEQUENTIAL)
+        os.posix_fadvise(fd, 0, 0, os.POSIX_FADV_WILLNEED)
+    elif hasattr(mmap.mmap, "madvise") and size:
+        # macOS: no fadvise, but madvise on a mapping starts the same readahead
+        with mmap.mmap(fd, size, access=mmap.ACCESS_READ) as mm:
+            mm.madvise(mmap.MADV_SEQUENTIAL)
+            mm.madvise(mmap.MADV_WILLNEED)
+
+
+def _lock_file(fd: int, size: int) -> Callable[[], None]:
+    """Map the file read-only and lock the mapping; returns the function that undoes both."""
+    if sys.platform == "win32":
+        return _lock_file_windows(fd, size)
+    return _lock_file_posix(fd, size)
+
+
+def _lock_file_posix(fd: int, size: int) -> Callable[[], None]:
+    # Python's mmap object does not expose its address, so map through libc
+    libc = ctypes.CDLL(ctypes.util.find_library("c"), use_errno=True)
+    libc.mmap.restype = ctypes.c_void_p
+    libc.mmap.argtypes = [ctypes.c_void_p, ctypes.c_size_t, ctypes.c_int, ctypes.c_int, ctypes.c_int, ctypes.c_long]
+    libc.munmap.argtypes = [ctypes.c_void_p, ctypes.c_size_t]
+    libc.mlock.argtypes = [ctypes.c_void_p, ctypes.c_size_t]
+    libc.munlock.argtypes = [ctypes.c_void_p, ctypes.c_size_t]
+
+    address = libc.mmap(None, size, mmap.PROT_READ, mmap.MAP_SHARED, fd, 0)
+    if address in (None, ctypes.c_void_p(-1).value):
+        errno = ctypes.get_errno()
+        raise OSError(errno, os.strerror(errno))
+    if libc.mlock(address, size) != 0:
+        errno = ctypes.get_errno()
+        libc.munmap(address, size)
+        raise OSError(errno, f"mlock: {os.strerror(errno)} (raise the memlock limit, ulimit -l)")
+
+    def release() -> None:
+        libc.munlock(address, size)
+        libc.munmap(address, size)
+    return release
+
+
+def _lock_file_windows(fd: int, size: int) -> Callable[[], None]:
+    import msvcrt
+    from ctypes import wintypes
+
+    kernel32 = ctypes.WinDLL("kernel32", use_last_error=True)
+    kernel32.CreateFileMappingW.restype = wintypes.HANDLE
+    kernel32.CreateFileMappingW.argtypes = [
+        wintypes.HANDLE, ctypes.c_void_p, wintypes.DWORD, wintypes.DWORD, wintypes.DWORD, wintypes.LPCWSTR
+    ]
+    kernel32.MapViewOfFile.restype = ctypes.c_void_p
+    kernel32.MapViewOfFile.argtypes = [wintypes.HANDLE, wintypes.DWORD, wintypes.DWORD, wintypes.DWORD, ctypes.c_size_t]
+    kernel32.UnmapViewOfFile.argtypes = [ctypes.c_void_p]
+    kernel32.VirtualLock.argtypes = [ctypes.c_void_p, ctypes.c_size_t]
+    kernel32.VirtualUnlock.argtypes = [ctypes.c_void_p, ctypes.c_size_t]
+    kernel32.CloseHandle.argtypes = [wintypes.HANDLE]
+    kernel32.GetCurrentProcess.restype = wintypes.HANDLE
+    kernel32.GetProcessWorkingSetSize.argtypes = [
+        wintypes.HANDLE, ctypes.POINTER(ctypes.c_size_t), ctypes.POINTER(ctypes.c_size_t)
+    ]
+    kernel32.SetProcessWorkingSetSize.argtypes = [wintypes.HANDLE, ctypes.c_size_t, ctypes.c_size_t]
+
+    def error(call: str) -> OSError:
+        code = ctypes.get_last_error()
+        return OSError(code, f"{call}: {ctypes.FormatError(code)}")
+
+    PAGE_READONLY, FILE_MAP_READ = 0x02, 0x0004
+    mapping = kernel32.CreateFileMappingW(msvcrt.get_osfhandle(fd), None, PAGE_READONLY, 0, 0, None)
+    if not mapping:
+        raise error("CreateFileMapping")
+    address = kernel32.MapViewOfFile(mapping, FILE_MAP_READ, 0, 0, 0)
+    if not address:
+        kernel32.CloseHandle(mapping)
+        raise error("MapViewOfFile")
+
+    # VirtualLock is capped by the minimum working set, so grow it by the model size
+    process = kernel32.GetCurrentProcess()
+    minimum, maximum = ctypes.c_size_t(), ctypes.c_size_t()
+    kernel32.GetProcessWorkingSetSize(process, ctypes.byref(minimum), ctypes.byref(maximum))
+    kernel32.SetProcessWorkingSetSize(process, minimum.value + size, maximum.value + size)
+    if not kernel32.VirtualLock(address, size):
+        exc = error("VirtualLock")
+        kernel32.UnmapViewOfFile(address)
+        kernel32.CloseHandle(mapping)
+        raise exc
+
+    def release() -> None:
+        kernel32.VirtualUnlock(address, size)
+        kernel32.UnmapViewOfFile(address)
+        kernel32.CloseHandle(mapping)
+    return release
+
+
+# Process-wide prewarmer (started by the main window, fed by the completion clients)
+model_cache = ModelPrewarmer()
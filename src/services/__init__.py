@@ -1,15 +1,23 @@
 """
 Services layer - business logic and external integrations.
+
+The services are imported on first use, so the Qt-free modules here
+(degeneration, request_scheduler) can be imported without PyQt6.
 """
 
-from .audio_service import AudioService
-from .inference_service import InferenceService
-from .clipboard_service import ClipboardService
-from .chat_service import ChatService
-
-__all__ = [
-    "AudioService",
-    "InferenceService",
-    "ClipboardService",
-    "ChatService",
-]
+import importlib
+
+_SERVICES = {
+    "AudioService": ".audio_service",
+    "InferenceService": ".inference_service",
+    "ClipboardService": ".clipboard_service",
+    "ChatService": ".chat_service",
+}
+
+__all__ = list(_SERVICES)
+
+
+def __getattr__(name):
+    if name in _SERVICES:
+        return getattr(importlib.import_module(_SERVICES[name], __name__), name)
+    raise AttributeError(f"module {__name__!r} has no attribute {name!r}")
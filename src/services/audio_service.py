@@ -6,16 +6,19 @@ Abstracts VOSK implementation details from UI layer.
 from datetime import datetime
 from pathlib import Path
 from queue import Queue, Empty
-from typing import Callable, Optional
+from typing import TYPE_CHECKING, Callable, Optional
 import json
 import threading
 
-import sounddevice as sd
-import vosk
-
 from ..core.config import AudioConfig, VoskConfig
 from ..core.models import TranscriptionResult
 
+# vosk and sounddevice load native libraries; imported on first use so the
+# window can appear before they are needed
+if TYPE_CHECKING:
+    import sounddevice as sd
+    import vosk
+
 
 class AudioService:
     """
@@ -32,9 +35,9 @@ class AudioService:
         self._audio_config = audio_config or AudioConfig()
         
         # State
-        self._model: Optional[vosk.Model] = None
-        self._recognizer: Optional[vosk.KaldiRecognizer] = None
-        self._stream: Optional[sd.RawInputStream] = None
+        self._model: Optional["vosk.Model"] = None
+        self._recognizer: Optional["vosk.KaldiRecognizer"] = None
+        self._stream: Optional["sd.RawInputStream"] = None
         self._audio_queue: Queue = Queue()
         self._processing_thread: Optional[threading.Thread] = None
         self._running = False
@@ -51,6 +54,8 @@ class AudioService:
         Returns (success, error_message).
         """
         try:
+            import vosk
+            
             model_path = str(self._vosk_config.model_path)
             self._model = vosk.Model(model_path)
             self._recognizer = vosk.KaldiRecognizer(
@@ -86,6 +91,8 @@ class AudioService:
                 return False, "Service not initialized"
             
             try:
+                import sounddevice as sd
+                
                 # Start audio stream
                 self._stream = sd.RawInputStream(
                     samplerate=self._audio_config.sample_rate,
@@ -7,7 +7,8 @@ from dataclasses import dataclass
 
 from ..core.config import BitNetConfig
 from ..core.errors import APIError, ErrorCode
-from ..infrastructure.http_client import BitNetHTTPClient
+from ..infrastructure.client_factory import create_client
+from .request_scheduler import PRIORITY_INTERACTIVE, scheduler_for
 
 
 @dataclass
@@ -33,7 +34,8 @@ class ChatService:
 
     def __init__(self, config: BitNetConfig):
         self._config = config
-        self._http_client = BitNetHTTPClient(config)
+        self._http_client = create_client(config)
+        self._scheduler = scheduler_for(config)
         self._history: list[ChatMessage] = []
         self._is_cancelled = False
 
@@ -69,7 +71,7 @@ class ChatService:
             if callback_status:
                 callback_status("Sending message...")
 
-            api_response = self._call_api(message)
+            api_response = self._call_api(message, callback_status)
             
             if self._is_cancelled:
                 self._is_cancelled = False
@@ -101,7 +103,11 @@ class ChatService:
                 )
             )
     
-    def _call_api(self, message: str) -> ChatResponse:
+    def _call_api(
+        self,
+        message: str,
+        callback_status: Optional[Callable[[str], None]] = None
+    ) -> ChatResponse:
         """Call BitNet API with chat message via centralized HTTP client."""
         # Build context from conversation history
         context = self._build_context()
@@ -111,7 +117,7 @@ class ChatService:
         
         payload = {
             "prompt": prompt,
-            "n_predict": 100,  # Fast chat responses (8-10 seconds)
+            "n_predict": self._scheduler.throughput.chat_tokens(),  # sized to the measured decode rate
             "temperature": self._config.temperature,
             "repeat_penalty": self._config.repeat_penalty,
             "repeat_last_n": self._config.repeat_last_n,
@@ -121,8 +127,15 @@ class ChatService:
             "stream": False
         }
         
-        # Execute via centralized HTTP client
-        response = self._http_client.post_completion(payload)
+        # Ahead of queued notes, then via centralized HTTP client
+        response = self._scheduler.complete(
+            self._config,
+            self._http_client,
+            payload,
+            PRIORITY_INTERACTIVE,
+            cancelled=lambda: self._is_cancelled,
+            on_wait=callback_status
+        )
         
         if not response.success:
             return ChatResponse(
@@ -173,3 +186,7 @@ class ChatService:
     def cancel(self) -> None:
         """Cancel ongoing request."""
         self._is_cancelled = True
+    
+    def close(self) -> None:
+        """Release the backend client."""
+        self._http_client.close()
@@ -0,0 +1,131 @@
+"""
+Degenerate generation detection.
+Watches a completion as it streams in and reports where to cut it when the
+model starts looping, runs past a stop string the server could not see (one
+split across two note chunks), or emits nothing but whitespace.
+"""
+
+import threading
+from typing import Optional, Sequence
+
+from ..core.models import Degeneration
+
+
+# Reasons
+REASON_STOP = "stop sequence"
+REASON_LOOP = "repetition loop"
+REASON_LINE = "repeated line"
+REASON_WHITESPACE = "whitespace run"
+
+# A loop is a unit of up to MAX_PERIOD characters repeated back to back at
+# least MIN_REPEATS times and MIN_LOOP_CHARS characters in total (well past
+# a markdown rule or a run of short list items)
+MAX_PERIOD = 200
+MIN_REPEATS = 4
+MIN_LOOP_CHARS = 256
+# A line of at least MIN_LINE_CHARS repeated this many times in a row (blank
+# lines between copies allowed); the same line in different sections is normal
+# in notes ("- Not discussed."), so only consecutive copies count
+REPEATED_LINE_LIMIT = 4
+MIN_LINE_CHARS = 12
+MAX_WHITESPACE_RUN = 128
+
+
+class DegenerationDetector:
+    """
+    check(text) is called with the whole text so far after every streamed
+    piece; it returns None while the output looks healthy.
+    One detector per request: it remembers what it has already scanned.
+    """
+
+    def __init__(self, stop: Sequence[str] = ()):
+        self._stop = tuple(s for s in stop if s)
+        self._longest_stop = max((len(s) for s in self._stop), default=0)
+        self._scanned = 0
+        self._line_start = 0
+        self._last_line = ""
+        self._run = 0
+        self._run_cut = 0
+
+    def check(self, text: str) -> Optional[Degeneration]:
+        return (
+            self._stop_sequence(text)
+            or self._whitespace(text)
+            or self._loop(text)
+            or self._repeated_line(text)
+        )
+
+    def _stop_sequence(self, text: str) -> Optional[Degeneration]:
+        # Only the new text, plus enough before it for a stop string that straddles
+        start = max(min(self._scanned, len(text)) - self._longest_stop + 1, 0)
+        self._scanned = len(text)
+        found = [i for i in (text.find(s, start) for s in self._stop) if i >= 0]
+        return Degeneration(REASON_STOP, min(found)) if found else None
+
+    def _loop(self, text: str) -> Optional[Degeneration]:
+        n = len(text)
+        for period in range(1, min(MAX_PERIOD, n // MIN_REPEATS) + 1):
+            unit = text[n - period:]
+            if text[n - 2 * period:n - period] != unit:
+                continue
+            repeats = 2
+            while (repeats + 1) * period <= n and text[n - (repeats + 1) * period:n - repeats * period] == unit:
+                repeats += 1
+            if repeats >= MIN_REPEATS and repeats * period >= MIN_LOOP_CHARS:
+                # Keep the first copy
+                return Degeneration(REASON_LOOP, n - (repeats - 1) * period)
+        return None
+
+    def _repeated_line(self, text: str) -> Optional[Degeneration]:
+        self._line_start = min(self._line_start, len(text))
+        while True:
+            end = text.find("\n", self._line_start)
+            if end < 0:
+                return None
+            start, self._line_start = self._line_start, end + 1
+            line = text[start:end].strip()
+            if not line:
+                continue
+            if line != self._last_line:
+                self._last_line, self._run = line, 1
+                continue
+            self._run += 1
+            if self._run == 2:
+                # Keep the first copy
+                self._run_cut = start
+            if len(line) >= MIN_LINE_CHARS and self._run >= REPEATED_LINE_LIMIT:
+                return Degeneration(REASON_LINE, self._run_cut)
+
+    def _whitespace(self, text: str) -> Optional[Degeneration]:
+        run = len(text) - len(text.rstrip())
+        if run > MAX_WHITESPACE_RUN:
+            return Degeneration(REASON_WHITESPACE, len(text) - run)
+        return None
+
+
+class DegenerationStats:
+    """Process-wide counters of generations stopped early."""
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self.stopped = 0
+        self.tokens_saved = 0
+        self.seconds_saved = 0.0
+
+    def record(self, tokens_saved: int, seconds_saved: float) -> None:
+        with self._lock:
+            self.stopped += 1
+            self.tokens_saved += tokens_saved
+            self.seconds_saved += seconds_saved
+
+    def summary(self) -> str:
+        with self._lock:
+            if not self.stopped:
+                return "no runaway generations"
+            return (
+                f"{self.stopped} runaway generation(s) stopped, "
+                f"~{self.tokens_saved} tokens / {self.seconds_saved:.0f} s of decoding saved"
+            )
+
+
+degeneration_stats = DegenerationStats()
@@ -8,9 +8,14 @@ from typing import Optional
 import threading
 
 from ..core.config import BitNetConfig
-from ..core.models import ProcessingRequest, ProcessingResult, ProcessingStatus
+from ..core.models import ProcessingEstimate, ProcessingRequest, ProcessingResult, ProcessingStatus
 from ..core.errors import APIError, ErrorCode
-from ..infrastructure.http_client import BitNetHTTPClient
+from ..infrastructure.client_factory import create_client
+from ..infrastructure.coalescing import coalescing_stats
+from .degeneration import degeneration_stats
+from .request_scheduler import PRIORITY_BULK, QueueStatus, scheduler_for
+from ..infrastructure.health_monitor import SERVER_LOADING, SERVER_UP, probe_server
+from ..infrastructure.model_prewarm import PrewarmStatus, model_cache
 
 
 class InferenceService:
@@ -21,7 +26,8 @@ class InferenceService:
 
     def __init__(self, config: BitNetConfig):
         self._config = config
-        self._http_client = BitNetHTTPClient(config)
+        self._http_client = create_client(config)
+        self._scheduler = scheduler_for(config)
         self._lock = threading.Lock()
         self._cancelled = False
 
@@ -49,27 +55,11 @@ class InferenceService:
                 processing_time_ms=0
             )
         
-        # Build prompt
-        system_prompt = self._config.system_prompt
-        user_prompt = request.custom_prompt or "Convert this transcript into clear notes:"
-        full_prompt = f"{system_prompt}\n\n{user_prompt}\n\nTranscript:\n{request.transcript}"
-        
         try:
             if callback_status:
                 callback_status("Initializing BitNet inference...")
             
-            # Build payload
-            payload = {
-                "prompt": full_prompt,
-                "n_predict": request.max_tokens or self._config.max_tokens,
-                "temperature": request.temperature or self._config.temperature,
-                "repeat_penalty": self._config.repeat_penalty,
-                "repeat_last_n": self._config.repeat_last_n,
-                "top_p": self._config.top_p,
-                "top_k": self._config.top_k,
-                "stop": ["\n\nYou:", "\nUser:", "\nQuestion:"],
-                "stream": False
-            }
+            payload = self._build_payload(request)
             
             # Check if cancelled
             with self._lock:
@@ -80,8 +70,15 @@ class InferenceService:
             if callback_status:
                 callback_status("Sending request to BitNet...")
             
-            # Execute via centralized HTTP client
-            response = self._http_client.post_completion(payload)
+            # Queue behind chat replies, then execute via centralized HTTP client
+            response = self._scheduler.complete(
+                self._config,
+                self._http_client,
+                payload,
+                PRIORITY_BULK,
+                cancelled=self._is_cancelled,
+                on_wait=callback_status
+            )
             
             # Check if cancelled during request
             with self._lock:
@@ -116,7 +113,8 @@ class InferenceService:
             
             return ProcessingResult.success(
                 processed_text=result_text,
-                processing_time_ms=processing_time
+                processing_time_ms=processing_time,
+                metrics=response.get_metrics()
             )
             
         except Exception as e:
@@ -130,23 +128,99 @@ class InferenceService:
                 processing_time_ms=processing_time
             )
     
+    def _build_payload(self, request: ProcessingRequest) -> dict:
+        """Prompt and sampling parameters; n_predict scales with the transcript unless set."""
+        system_prompt = self._config.system_prompt
+        user_prompt = request.custom_prompt or "Convert this transcript into clear notes:"
+        full_prompt = f"{system_prompt}\n\n{user_prompt}\n\nTranscript:\n{request.transcript}"
+        n_predict = request.max_tokens or self._scheduler.throughput.note_tokens(
+            request.transcript, self._config.max_tokens
+        )
+        return {
+            "prompt": full_prompt,
+            "n_predict": n_predict,
+            "temperature": request.temperature or self._config.temperature,
+            "repeat_penalty": self._config.repeat_penalty,
+            "repeat_last_n": self._config.repeat_last_n,
+            "top_p": self._config.top_p,
+            "top_k": self._config.top_k,
+            "stop": ["\n\nYou:", "\nUser:", "\nQuestion:"],
+            "stream": False
+        }
+    
+    def estimate(self, request: ProcessingRequest) -> ProcessingEstimate:
+        """Expected token budget, queue wait and generation time, before processing."""
+        payload = self._build_payload(request)
+        throughput = self._scheduler.throughput
+        return ProcessingEstimate(
+            n_predict=payload["n_predict"],
+            wait_seconds=self._scheduler.wait_s(),
+            generation_seconds=throughput.expected_seconds(payload["prompt"], payload["n_predict"])
+        )
+    
+    def throughput_summary(self) -> str:
+        """Learned prompt and decode rates of this backend."""
+        return self._scheduler.throughput.summary()
+    
+    def _is_cancelled(self) -> bool:
+        with self._lock:
+            return self._cancelled
+    
     def cancel(self) -> None:
         """Cancel current inference operation."""
         with self._lock:
             self._cancelled = True
     
+    def check_health(self, refresh: bool = False) -> tuple[bool, Optional[str]]:
+        """
+        Check this service's backend (HTTP server or local worker).
+        Returns (is_available, error_message) from cached state without blocking;
+        refresh=True asks for a new probe, whose result a later call sees.
+        """
+        return self._http_client.check_health(refresh)
+    
+    def queue_status(self) -> QueueStatus:
+        """Requests running and queued on this backend, and the expected wait for a note."""
+        return self._scheduler.status()
+    
+    def close(self) -> None:
+        """Release the backend client."""
+        self._http_client.close()
+    
     @staticmethod
     def check_availability(endpoint_url: str = "http://localhost:8081") -> tuple[bool, Optional[str]]:
         """
-        Check if BitNet HTTP API is available.
+        Probe a BitNet HTTP API once, blocking for up to two health timeouts.
         Returns (is_available, error_message).
         """
-        # Create temporary client for health check
-        from ..core.config import BitNetConfig
-        temp_config = BitNetConfig(endpoint_url=endpoint_url)
-        temp_client = BitNetHTTPClient(temp_config)
-        
-        is_available, error = temp_client.check_health()
-        temp_client.close()
-        
-        return is_available, error
+        state, error = probe_server(endpoint_url, BitNetConfig.health_timeout_seconds)
+        if state == SERVER_LOADING:
+            return False, "Loading model on the server..."
+        return state == SERVER_UP, error
+    
+    @staticmethod
+    def prewarm_model(config: BitNetConfig) -> None:
+        """Start reading the backend's GGUF into the page cache (no-op if disabled or not on this machine)."""
+        path = config.resolved_model_path
+        if config.prewarm_model and path is not None and path.is_file():
+            model_cache.start(path, lock=config.lock_model)
+    
+    @staticmethod
+    def model_cache_status() -> PrewarmStatus:
+        """Prewarm progress and the session's first-token latency."""
+        return model_cache.status()
+    
+    @staticmethod
+    def release_model_cache() -> None:
+        """Stop prewarming and unlock the model."""
+        model_cache.close()
+    
+    @staticmethod
+    def request_stats() -> tuple[int, int]:
+        """(inferences sent, duplicate inferences saved by coalescing) since startup."""
+        return coalescing_stats()
+    
+    @staticmethod
+    def degeneration_summary() -> str:
+        """Runaway generations stopped early and the decoding that saved."""
+        return degeneration_stats.summary()
@@ -0,0 +1,308 @@
+"""
+Request scheduling across chat and note generation.
+One queue per backend admits at most as many requests as the server has
+slots, interactive chat ahead of bulk notes. Long notes are generated in
+chunks so a waiting chat reply can take the slot between two chunks.
+"""
+
+import heapq
+import itertools
+import logging
+import threading
+import time
+from dataclasses import dataclass
+from typing import Callable, Optional
+
+from ..core.config import BitNetConfig
+from ..core.models import Degeneration
+from ..infrastructure.coalescing import backend_id, cancelled_response, payload_key, single_flight
+from ..infrastructure.http_client import APIResponse
+from .degeneration import DegenerationDetector, degeneration_stats
+from .throughput import ThroughputModel
+
+
+logger = logging.getLogger(__name__)
+
+# Priorities (lower runs first)
+PRIORITY_INTERACTIVE = 0       # chat replies
+PRIORITY_BULK = 1              # note generation
+
+# Interval at which queued callers re-check cancellation and report their wait
+QUEUE_POLL_SECONDS = 0.5
+
+
+@dataclass(frozen=True)
+class QueueStatus:
+    """Queue snapshot for the UI."""
+
+    slots: int
+    running: int
+    queued: int
+    expected_wait_s: float     # before a new note request would start
+
+    def summary(self) -> str:
+        text = f"{self.running}/{self.slots} running, {self.queued} queued"
+        if self.expected_wait_s >= 1:
+            text += f", next note waits ~{self.expected_wait_s:.0f} s"
+        return text
+
+
+class _Ticket:
+    """A request waiting for or holding a slot."""
+
+    def __init__(self, priority: int, seq: int, estimate_s: float):
+        self.priority = priority
+        self.seq = seq
+        self.estimate_s = estimate_s
+        self.started_at: Optional[float] = None
+
+    def __lt__(self, other: "_Ticket") -> bool:
+        return (self.priority, self.seq) < (other.priority, other.seq)
+
+    def remaining_s(self, now: float) -> float:
+        if self.started_at is None:
+            return self.estimate_s
+        return max(self.estimate_s - (now - self.started_at), 0.0)
+
+
+class RequestScheduler:
+    """
+    Admission control for one backend.
+    With several slots one is kept free of bulk work, so a chat reply never
+    waits for a note; with a single slot, bulk requests yield it at chunk
+    boundaries whenever a higher-priority request is waiting.
+    """
+
+    def __init__(self, slots: int, chunk_tokens: int):
+        self.slots = max(slots, 1)
+        self.chunk_tokens = chunk_tokens
+        self._cond = threading.Condition()
+        self._waiting: list[_Ticket] = []
+        self._running: list[_Ticket] = []
+        self._seq = itertools.count()
+        self.throughput = ThroughputModel()
+
+    # Queue
+
+    def _bulk_limit(self) -> int:
+        return self.slots - 1 if self.slots > 1 else 1
+
+    def _can_start(self, ticket: _Ticket) -> bool:
+        if self._waiting[0] is not ticket or len(self._running) >= self.slots:
+            return False
+        if ticket.priority == PRIORITY_INTERACTIVE:
+            return True
+        bulk = sum(1 for t in self._running if t.priority != PRIORITY_INTERACTIVE)
+        return bulk < self._bulk_limit()
+
+    def acquire(
+        self,
+        priority: int,
+        estimate_s: float,
+        cancelled: Callable[[], bool],
+        on_wait: Optional[Callable[[str], None]] = None
+    ) -> Optional[_Ticket]:
+        """Block until a slot is free; None if cancelled while queued."""
+        with self._cond:
+            ticket = _Ticket(priority, next(self._seq), estimate_s)
+            heapq.heappush(self._waiting, ticket)
+            reported = None
+            while not self._can_start(ticket):
+                if cancelled():
+                    self._waiting.remove(ticket)
+                    heapq.heapify(self._waiting)
+                    self._cond.notify_all()
+                    return None
+                if on_wait:
+                    ahead = len(self._running) + sum(1 for t in self._waiting if t < ticket)
+                    message = f"⏳ Queued behind {ahead} request(s), ~{self._wait_s(ticket):.0f} s"
+                    if message != reported:
+                        on_wait(message)
+                        reported = message
+                self._cond.wait(QUEUE_POLL_SECONDS)
+            heapq.heappop(self._waiting)
+            ticket.started_at = time.monotonic()
+            self._running.append(ticket)
+            self._cond.notify_all()
+            return ticket
+
+    def release(self, ticket: _Ticket) -> None:
+        with self._cond:
+            self._running.remove(ticket)
+            self._cond.notify_all()
+
+    def should_yield(self, ticket: _Ticket) -> bool:
+        """Whether a higher-priority request is waiting for the slot this one holds."""
+        with self._cond:
+            if len(self._running) < self.slots:
+                return False
+            return any(t.priority < ticket.priority for t in self._waiting)
+
+    # Estimates
+
+    def _wait_s(self, ticket: _Ticket) -> float:
+        """Work ahead of ticket spread over the slots (call with the lock held)."""
+        now = time.monotonic()
+        work = sum(t.remaining_s(now) for t in self._running)
+        work += sum(t.estimate_s for t in self._waiting if t < ticket)
+        return work / self.slots
+
+    def status(self) -> QueueStatus:
+        with self._cond:
+            probe = _Ticket(PRIORITY_BULK, next(self._seq), 0.0)
+            return QueueStatus(
+                slots=self.slots,
+                running=len(self._running),
+                queued=len(self._waiting),
+                expected_wait_s=self._wait_s(probe)
+            )
+
+    # Execution
+
+    def complete(
+        self,
+        config: BitNetConfig,
+        client,
+        payload: dict,
+        priority: int,
+        cancelled: Callable[[], bool],
+        on_wait: Optional[Callable[[str], None]] = None
+    ) -> APIResponse:
+        """
+        Run a completion through the queue. Identical in-flight requests share
+        one queue entry and one inference.
+        """
+        key = payload_key(backend_id(config), payload)
+        return single_flight.run(
+            key,
+            lambda: self._run(client, payload, priority, config.timeout_seconds, cancelled, on_wait),
+            cancelled
+        )
+
+    def wait_s(self) -> float:
+        """Expected wait before a new note request would start."""
+        return self.status().expected_wait_s
+
+    def _run(self, client, payload, priority, min_timeout, cancelled, on_wait) -> APIResponse:
+        prompt = payload["prompt"]
+        n_predict = int(payload.get("n_predict", 0))
+        ticket = self.acquire(priority, self.throughput.expected_seconds(prompt, n_predict), cancelled, on_wait)
+        if ticket is None:
+            return cancelled_response()
+        holder = [ticket]
+        detector = DegenerationDetector(payload.get("stop") or ())
+        chunked = priority != PRIORITY_INTERACTIVE and 0 < self.chunk_tokens < n_predict
+        try:
+            if chunked:
+                response = self._run_chunked(client, payload, holder, detector, min_timeout, cancelled, on_wait)
+            else:
+                timeout = self.throughput.timeout(prompt, n_predict, min_timeout)
+                response = client.post_completion(payload, timeout=timeout, watch=detector.check)
+        finally:
+            if holder[0] is not None:
+                self.release(holder[0])
+        if response.success:
+            data = response.data or {}
+            if data.get("stopped_client"):
+                self._record_stopped(n_predict, data)
+            # A chunked request's last prompt includes generated text, so skip chars-per-token
+            prompt_tokens = None if chunked else data.get("tokens_evaluated")
+            self.throughput.observe(prompt, n_predict, response.get_metrics(), prompt_tokens)
+        return response
+
+    def _record_stopped(self, n_predict: int, data: dict) -> None:
+        """Count a generation the detector cut short and the decoding it would have run to n_predict."""
+        tokens_saved = max(n_predict - int(data.get("tokens_predicted", n_predict)), 0)
+        seconds_saved = self.throughput.seconds(0, tokens_saved)
+        degeneration_stats.record(tokens_saved, seconds_saved)
+        logger.info(
+            "Stopped generation early (%s), ~%d tokens / %.0f s saved",
+            data["stopped_client"], tokens_saved, seconds_saved
+        )
+
+    def _run_chunked(self, client, payload, holder, detector, min_timeout, cancelled, on_wait) -> APIResponse:
+        """
+        Generate n_predict tokens chunk_tokens at a time, each chunk continuing
+        the prompt plus the text so far (llama-server reuses the cached prefix).
+        Between chunks the slot goes to any higher-priority request waiting.
+        The detector sees the whole note, so loops and stop strings that span
+        chunks are caught too.
+        """
+        start = time.monotonic()
+        remaining = int(payload["n_predict"])
+        text = ""
+        data: dict = {}
+        totals = {"predicted_n": 0, "predicted_ms": 0.0}
+        first_timings: dict = {}
+
+        while True:
+            n_chunk = min(self.chunk_tokens, remaining)
+            chunk = dict(payload, prompt=payload["prompt"] + text, n_predict=n_chunk, cache_prompt=True)
+            found: list[Degeneration] = []
+
+            def watch(piece: str, before: str = text) -> Optional[Degeneration]:
+                # Detect on the whole note, cut in this chunk's coordinates
+                detection = detector.check(before + piece)
+                if detection is None:
+                    return None
+                found.append(detection)
+                return Degeneration(detection.reason, max(detection.keep - len(before), 0))
+
+            response = client.post_completion(
+                chunk, timeout=self.throughput.timeout(chunk["prompt"], n_chunk, min_timeout), watch=watch
+            )
+            if not response.success:
+                return response
+            data = response.data or {}
+            timings = data.get("timings") or {}
+            first_timings = first_timings or timings
+            predicted = int(data.get("tokens_predicted", timings.get("predicted_n", 0)))
+            totals["predicted_n"] += predicted
+            totals["predicted_ms"] += float(timings.get("predicted_ms", 0.0))
+            text += str(data.get("content", ""))
+            remaining -= predicted
+
+            if found:
+                # The cut may fall in an earlier chunk (a stop string across the boundary)
+                text = text[:found[0].keep]
+                break
+            hit_limit = data.get("stopped_limit", predicted >= n_chunk)
+            if not hit_limit or predicted == 0 or remaining <= 0:
+                break
+            if cancelled():
+                return cancelled_response()
+            if self.should_yield(holder[0]):
+                estimate = holder[0].remaining_s(time.monotonic())
+                self.release(holder[0])
+                holder[0] = None        # nothing to release if acquire is cancelled
+                holder[0] = self.acquire(PRIORITY_BULK, estimate, cancelled, on_wait)
+                if holder[0] is None:
+                    return cancelled_response()
+
+        merged = dict(data, content=text, tokens_predicted=totals["predicted_n"])
+        if first_timings:
+            merged["timings"] = dict(
+                first_timings,
+                predicted_n=totals["predicted_n"],
+                predicted_ms=totals["predicted_ms"]
+            )
+        return APIResponse(success=True, data=merged, latency_ms=(time.monotonic() - start) * 1000)
+
+
+# One scheduler per backend, shared by the chat and note services
+_schedulers: dict[str, RequestScheduler] = {}
+_schedulers_lock = threading.Lock()
+
+
+def scheduler_for(config: BitNetConfig) -> RequestScheduler:
+    """The shared scheduler for config's backend (slot count follows the config)."""
+    key = backend_id(config)
+    with _schedulers_lock:
+        scheduler = _schedulers.get(key)
+        if scheduler is None:
+            scheduler = RequestScheduler(config.parallel_requests, config.preempt_chunk_tokens)
+            _schedulers[key] = scheduler
+        else:
+            scheduler.slots = max(config.parallel_requests, 1)
+            scheduler.chunk_tokens = config.preempt_chunk_tokens
+        return scheduler
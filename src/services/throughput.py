@@ -0,0 +1,110 @@
+"""
+Throughput model for sizing requests.
+Learns prompt-evaluation and decode rates, characters per token and how much
+of n_predict replies actually use from the timings of finished requests, and
+turns them into token budgets, timeouts and ETAs.
+"""
+
+import threading
+from typing import Optional
+
+from ..core.models import GenerationMetrics
+
+
+# Starting points until the first requests have been measured
+DEFAULT_PROMPT_TPS = 60.0
+DEFAULT_DECODE_TPS = 8.5       # a 2048-token note in about 240 s on a 4-core laptop
+DEFAULT_CHARS_PER_TOKEN = 4.0
+DEFAULT_FILL = 0.8             # share of n_predict a reply uses before stopping
+# Weight of the newest measurement in each running estimate
+SMOOTHING = 0.3
+
+# Notes condense the transcript: budget a fraction of its length
+NOTE_LENGTH_RATIO = 0.6
+MIN_NOTE_TOKENS = 128
+# Chat replies are sized to arrive in about this long
+CHAT_TARGET_SECONDS = 12.0
+MIN_CHAT_TOKENS = 48
+MAX_CHAT_TOKENS = 256
+
+# Request timeout: every token of n_predict at the learned rates, with margin
+TIMEOUT_MARGIN = 1.5
+TIMEOUT_SLACK_SECONDS = 10.0
+
+
+class ThroughputModel:
+    """Running estimates for one backend; thread-safe."""
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self.prompt_tps = DEFAULT_PROMPT_TPS
+        self.decode_tps = DEFAULT_DECODE_TPS
+        self.chars_per_token = DEFAULT_CHARS_PER_TOKEN
+        self.fill = DEFAULT_FILL
+        self.samples = 0
+
+    def observe(
+        self,
+        prompt: str,
+        n_predict: int,
+        metrics: Optional[GenerationMetrics],
+        prompt_tokens: Optional[int] = None
+    ) -> None:
+        """
+        Fold in a finished request. prompt_tokens is the full prompt length
+        (llama-server's tokens_evaluated); metrics.prompt_tokens only counts
+        what was not served from the prompt cache.
+        """
+        if metrics is None or metrics.predicted_ms <= 0:
+            return
+
+        def blend(previous: float, value: float) -> float:
+            return previous + SMOOTHING * (value - previous)
+
+        with self._lock:
+            self.samples += 1
+            if metrics.predicted_tokens:
+                self.decode_tps = blend(self.decode_tps, metrics.tokens_per_second)
+            if metrics.prompt_ms > 0 and metrics.prompt_tokens:
+                self.prompt_tps = blend(self.prompt_tps, metrics.prompt_tokens / (metrics.prompt_ms / 1000))
+            if prompt_tokens:
+                self.chars_per_token = blend(self.chars_per_token, len(prompt) / prompt_tokens)
+            if n_predict > 0:
+                self.fill = blend(self.fill, min(metrics.predicted_tokens / n_predict, 1.0))
+
+    def tokens(self, text: str) -> int:
+        """Approximate token count of text."""
+        with self._lock:
+            return int(len(text) / self.chars_per_token) + 1
+
+    def seconds(self, prompt_tokens: int, output_tokens: int) -> float:
+        """Time to evaluate a prompt and decode output_tokens."""
+        with self._lock:
+            return prompt_tokens / self.prompt_tps + output_tokens / self.decode_tps
+
+    def note_tokens(self, transcript: str, max_tokens: int) -> int:
+        """n_predict for a note: shorter than the transcript, within the configured maximum."""
+        budget = int(self.tokens(transcript) * NOTE_LENGTH_RATIO)
+        return max(min(budget, max_tokens), min(MIN_NOTE_TOKENS, max_tokens))
+
+    def chat_tokens(self) -> int:
+        """n_predict for a chat reply that arrives in about CHAT_TARGET_SECONDS."""
+        with self._lock:
+            budget = int(self.decode_tps * CHAT_TARGET_SECONDS)
+        return max(MIN_CHAT_TOKENS, min(budget, MAX_CHAT_TOKENS))
+
+    def expected_seconds(self, prompt: str, n_predict: int) -> float:
+        """Likely duration: replies usually stop before n_predict."""
+        with self._lock:
+            fill = self.fill
+        return self.seconds(self.tokens(prompt), int(n_predict * fill))
+
+    def timeout(self, prompt: str, n_predict: int, floor: float) -> float:
+        """Per-request timeout: all of n_predict with margin, never below floor."""
+        worst = self.seconds(self.tokens(prompt), n_predict)
+        return max(floor, worst * TIMEOUT_MARGIN + TIMEOUT_SLACK_SECONDS)
+
+    def summary(self) -> str:
+        with self._lock:
+            text = f"{self.decode_tps:.1f} tok/s decode, {self.prompt_tps:.0f} tok/s prompt"
+            return text + (f" ({self.samples} measured)" if self.samples else " (defaults)")
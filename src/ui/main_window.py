@@ -4,23 +4,28 @@ Delegates to services, never contains business logic.
 """
 
 from typing import Optional
+import logging
 import os
+import threading
 
 from PyQt6.QtWidgets import (
     QMainWindow, QWidget, QVBoxLayout, QHBoxLayout,
     QPushButton, QTextEdit, QLabel, QMessageBox, QTabWidget, QLineEdit,
     QSpinBox, QDoubleSpinBox, QFormLayout, QGroupBox, QCheckBox
 )
-from PyQt6.QtCore import Qt, pyqtSignal, QObject, QThread, QUrl
+from PyQt6.QtCore import Qt, pyqtSignal, QObject, QThread, QTimer, QUrl
 from PyQt6.QtGui import QTextCursor, QPixmap
-from PyQt6.QtMultimedia import QSoundEffect
 
 from ..core.config import Config
 from ..core.models import TranscriptionResult, ProcessingRequest, ProcessingResult
+from ..core.startup import startup, FIRST_PAINT_TARGET_MS
 from ..services import AudioService, InferenceService, ClipboardService, ChatService
 from .styles import get_stylesheet, get_recording_button_style
 
 
+logger = logging.getLogger(__name__)
+
+
 class InferenceWorker(QObject):
     """Worker for running inference in background QThread."""
     
@@ -72,6 +77,7 @@ class MainWindow(QMainWindow):
     _partial_received = pyqtSignal(str)
     _final_received = pyqtSignal(str)
     _error_received = pyqtSignal(str)
+    _speech_model_loaded = pyqtSignal(bool, str)        # success, error
     
     def __init__(self, config: Config):
         super().__init__()
@@ -89,28 +95,20 @@ class MainWindow(QMainWindow):
         self._chat_thread: Optional[QThread] = None
         self._chat_worker: Optional[ChatWorker] = None
         
-        # Sound effect
-        self._goat_sound = QSoundEffect()
-        goat_sound_path = os.path.join(
-            os.path.dirname(os.path.dirname(os.path.dirname(__file__))),
-            "assets", "sounds", "goat_scream.wav"
-        )
-        # Only set source if file exists
-        if os.path.exists(goat_sound_path):
-            self._goat_sound.setSource(QUrl.fromLocalFile(goat_sound_path))
-            self._goat_sound.setVolume(0.5)
-        else:
-            # Disable goat sound if file doesn't exist
-            self._goat_sound = None
+        # Sound effect (QtMultimedia is loaded after the first paint)
+        self._goat_sound = None
+        self._health_timer: Optional[QTimer] = None
+        self._model_cache_timer: Optional[QTimer] = None
         
         # Connect internal signals to UI update slots
         self._partial_received.connect(self._update_partial_display)
         self._final_received.connect(self._update_transcript_display)
         self._error_received.connect(lambda msg: self._show_error("Audio Error", msg))
+        self._speech_model_loaded.connect(self._handle_speech_model_loaded)
         
-        # Initialize UI
+        # Initialize UI now, services once the window is on screen
         self._init_ui()
-        self._init_services()
+        QTimer.singleShot(0, self._on_first_paint)
     
     def _init_ui(self) -> None:
         """Initialize user interface."""
@@ -334,6 +332,14 @@ class MainWindow(QMainWindow):
         self._bitnet_status_label.setProperty("status", True)
         status_layout.addWidget(self._bitnet_status_label)
         
+        self._model_cache_label = QLabel("Model cache: not prewarmed")
+        self._model_cache_label.setWordWrap(True)
+        status_layout.addWidget(self._model_cache_label)
+        
+        self._request_stats_label = QLabel("Requests: none yet")
+        self._request_stats_label.setWordWrap(True)
+        status_layout.addWidget(self._request_stats_label)
+        
         check_button = QPushButton("Check BitNet Status")
         check_button.setMaximumHeight(28)
         check_button.clicked.connect(self._check_bitnet_status)
@@ -341,7 +347,22 @@ class MainWindow(QMainWindow):
         
         status_group.setLayout(status_layout)
         scroll_layout.addWidget(status_group)
-        
+
+        # Host CPU profile from setup_env.py
+        hardware_group = QGroupBox("Hardware")
+        hardware_layout = QFormLayout()
+        hardware_layout.setSpacing(6)
+
+        hardware = self._config.hardware
+        cpu_label = QLabel(hardware.summary() if hardware else "Not profiled (run setup_env.py)")
+        cpu_label.setWordWrap(True)
+        hardware_layout.addRow("CPU:", cpu_label)
+        threads = self._config.bitnet.threads if self._config.bitnet else 0
+        hardware_layout.addRow("Threads:", QLabel(str(threads) if threads else "All CPUs"))
+
+        hardware_group.setLayout(hardware_layout)
+        scroll_layout.addWidget(hardware_group)
+
         # Connection settings - compact
         conn_group = QGroupBox("Connection")
         conn_layout = QFormLayout()
@@ -381,7 +402,7 @@ class MainWindow(QMainWindow):
         self._timeout_spin.setSingleStep(5.0)
         self._timeout_spin.setDecimals(1)
         self._timeout_spin.setSuffix(" seconds")
-        form_layout.addRow("Timeout:", self._timeout_spin)
+        form_layout.addRow("Minimum timeout:", self._timeout_spin)
         
         # Repeat penalty
         self._repeat_penalty_spin = QDoubleSpinBox()
@@ -476,37 +497,108 @@ class MainWindow(QMainWindow):
         
         return widget
     
+    def _on_first_paint(self) -> None:
+        """First event loop turn: the window is painted, start the slow work."""
+        elapsed = startup.mark("first paint")
+        if elapsed > FIRST_PAINT_TARGET_MS:
+            logger.warning(
+                "First paint after %.0f ms (target %.0f ms): %s",
+                elapsed, FIRST_PAINT_TARGET_MS, startup.summary()
+            )
+        self._init_services()
+        self._init_goat_sound()
+    
+    def _init_goat_sound(self) -> None:
+        """Load the sound effect (imports QtMultimedia)."""
+        goat_sound_path = os.path.join(
+            os.path.dirname(os.path.dirname(os.path.dirname(__file__))),
+            "assets", "sounds", "goat_scream.wav"
+        )
+        # Only set source if file exists
+        if os.path.exists(goat_sound_path):
+            from PyQt6.QtMultimedia import QSoundEffect
+            
+            self._goat_sound = QSoundEffect()
+            self._goat_sound.setSource(QUrl.fromLocalFile(goat_sound_path))
+            self._goat_sound.setVolume(0.5)
+    
     def _init_services(self) -> None:
-        """Initialize backend services."""
-        # Audio service
+        """Initialize backend services; model loading and health checks run in the background."""
+        # Audio service: the VOSK model loads off the GUI thread
         self._audio_service = AudioService(
             vosk_config=self._config.vosk,
             audio_config=self._config.audio
         )
-        
-        success, error = self._audio_service.initialize()
-        if not success:
-            self._show_error(f"Audio Service Error", error or "Unknown error")
-            return
-        
         self._audio_service.set_callbacks(
             on_partial=self._handle_partial_transcript,
             on_final=self._handle_final_transcript,
             on_error=self._handle_audio_error
         )
+        self._record_button.setEnabled(False)
+        self._record_button.setText("Loading Speech Model...")
+        self._update_status("⏳ Loading speech model...")
+        threading.Thread(
+            target=self._load_speech_model,
+            args=(self._audio_service,),
+            name="vosk-loader",
+            daemon=True
+        ).start()
         
         # Inference service
         if self._config.bitnet:
+            # Page the model in while the user is still recording
+            InferenceService.prewarm_model(self._config.bitnet)
+            self._model_cache_timer = QTimer(self)
+            self._model_cache_timer.timeout.connect(self._show_model_cache_status)
+            self._model_cache_timer.start(500)
             self._inference_service = InferenceService(self._config.bitnet)
             self._chat_service = ChatService(self._config.bitnet)
-            # Check BitNet status on startup
-            self._check_bitnet_status()
+            # Backend state is cached by the clients; showing it never blocks
+            self._health_timer = QTimer(self)
+            self._health_timer.timeout.connect(self._show_bitnet_status)
+            self._health_timer.timeout.connect(self._show_request_stats)
+            self._health_timer.timeout.connect(self._show_note_estimate)
+            self._health_timer.start(1000)
+            self._show_bitnet_status()
         else:
             self._show_warning(
                 "BitNet Not Configured",
                 "BitNet model path not set. Set BITNET_MODEL_PATH environment variable."
             )
     
+    def _load_speech_model(self, audio_service: AudioService) -> None:
+        """Background thread: load VOSK, report through a signal."""
+        success, error = audio_service.initialize()
+        self._speech_model_loaded.emit(success, error or "")
+    
+    def _handle_speech_model_loaded(self, success: bool, error: str) -> None:
+        """Enable recording once the speech model is in memory."""
+        startup.mark("speech model")
+        logger.info("Startup: %s", startup.summary())
+        if not success:
+            self._record_button.setText("Speech Unavailable")
+            self._update_status("❌ Speech model failed to load")
+            self._show_error("Audio Service Error", error or "Unknown error")
+            return
+        self._record_button.setText("Start Recording")
+        self._record_button.setEnabled(True)
+        self._update_status("Ready")
+    
+    def _show_model_cache_status(self) -> None:
+        """Refresh the prewarm line; polling stops once the read is over."""
+        status = InferenceService.model_cache_status()
+        self._model_cache_label.setText(status.summary())
+        if status.is_warm:
+            self._model_cache_label.setStyleSheet("color: #2D5016;")
+        elif status.error:
+            self._model_cache_label.setStyleSheet("color: #C41E3A;")
+        else:
+            self._model_cache_label.setStyleSheet("color: #606060;")
+        if not status.is_running and self._model_cache_timer is not None:
+            self._model_cache_timer.stop()
+            if status.is_warm:
+                startup.mark("model cached")
+    
     # Event handlers
     
     def _toggle_recording(self) -> None:
@@ -660,15 +752,37 @@ class MainWindow(QMainWindow):
         # Enable processing button
         if self._inference_service:
             self._process_button.setEnabled(True)
+        self._show_note_estimate()
+    
+    def _show_note_estimate(self) -> None:
+        """Expected time for the current transcript, shown on the Generate button."""
+        transcript = self._transcript_display.toPlainText().strip()
+        if not self._inference_service or not transcript:
+            self._process_button.setText("Generate Notes")
+            self._process_button.setToolTip("")
+            return
+        custom_prompt = self._prompt_input.toPlainText().strip()
+        estimate = self._inference_service.estimate(
+            ProcessingRequest(transcript=transcript, custom_prompt=custom_prompt or None)
+        )
+        self._process_button.setText(f"Generate Notes ({estimate.summary()})")
+        self._process_button.setToolTip(
+            f"Up to {estimate.n_predict} tokens: ~{estimate.generation_seconds:.0f} s to generate, "
+            f"~{estimate.wait_seconds:.0f} s in the queue"
+        )
     
     def _handle_processing_complete(self, result: ProcessingResult) -> None:
         """Handle inference completion."""
         self._process_button.setEnabled(True)
+        self._show_model_cache_status()
         
         if result.is_success:
             self._output_display.setPlainText(result.processed_text or "")
             time_ms = result.processing_time_ms or 0
-            self._status_label.setText(f"✅ Complete ({time_ms:.0f}ms)")
+            details = f"{time_ms:.0f}ms"
+            if result.metrics and result.metrics.predicted_tokens:
+                details += f", {result.metrics.summary()}"
+            self._status_label.setText(f"✅ Complete ({details})")
             self._status_label.setStyleSheet("color: #2D5016;")
             # Play goat scream on successful note generation (if enabled)
             if self._config.ui.goat_sound_enabled and self._goat_sound is not None:
@@ -739,6 +853,7 @@ class MainWindow(QMainWindow):
         self._chat_send_button.setEnabled(True)
         self._chat_input.setEnabled(True)
         self._chat_input.setFocus()
+        self._show_model_cache_status()
         
         if success:
             self._append_chat_message("Assistant", message)
@@ -796,25 +911,63 @@ class MainWindow(QMainWindow):
     # Settings handlers
     
     def _check_bitnet_status(self) -> None:
-        """Check if BitNet is available."""
+        """Ask for a fresh probe now; the result shows on the next status refresh."""
+        if self._inference_service:
+            self._inference_service.check_health(refresh=True)
+        self._show_bitnet_status()
+    
+    def _show_bitnet_status(self) -> None:
+        """Display the cached backend state (HTTP server or local worker)."""
         if not self._config.bitnet:
             self._bitnet_status_label.setText("❌ Not configured")
             self._bitnet_status_label.setStyleSheet("color: #C41E3A;")
             return
         
-        endpoint = self._endpoint_input.text().strip() if hasattr(self, '_endpoint_input') else self._config.bitnet.endpoint_url
+        backend = self._config.bitnet.backend
+        if not self._inference_service:
+            self._bitnet_status_label.setText(f"❌ Backend ({backend}) not initialized")
+            self._bitnet_status_label.setStyleSheet("color: #C41E3A;")
+            return
         
-        # Check availability
-        is_available, error = InferenceService.check_availability(endpoint)
+        is_available, error = self._inference_service.check_health()
         
         if is_available:
-            self._bitnet_status_label.setText(f"✅ Connected to {endpoint}")
+            startup.mark("health check")
+            if self._config.bitnet.is_local:
+                self._bitnet_status_label.setText(f"✅ Local backend ready ({backend})")
+            else:
+                self._bitnet_status_label.setText(f"✅ Connected to {self._config.bitnet.endpoint_url}")
             self._bitnet_status_label.setStyleSheet("color: #2D5016;")
+        elif error and error.startswith(("Loading", "Checking")):
+            self._bitnet_status_label.setText(f"⏳ {error}")
+            self._bitnet_status_label.setStyleSheet("color: #606060;")
         else:
-            error_msg = f"❌ {error or 'Not available'}\n\nTo start BitNet backend:\n1. Open terminal\n2. cd bitnet_backend\n3. Build and run the server (see INSTALL_VA_WORKSTATION.md)"
-            self._bitnet_status_label.setText(error_msg)
+            startup.mark("health check")
+            if self._config.bitnet.is_local:
+                hint = (
+                    "Check BITNET_MODEL_PATH / BITNET_REFERENCE_MODEL_DIR, "
+                    "or set BITNET_BACKEND=http to use llama-server"
+                )
+            else:
+                hint = (
+                    "To start BitNet backend:\n1. Open terminal\n2. cd bitnet_backend\n"
+                    "3. Build and run the server (see INSTALL_VA_WORKSTATION.md)"
+                )
+            self._bitnet_status_label.setText(f"❌ {error or 'Not available'}\n\n{hint}")
             self._bitnet_status_label.setStyleSheet("color: #C41E3A;")
     
+    def _show_request_stats(self) -> None:
+        """Queue depth and expected wait, inferences sent, duplicates coalesced and runaways stopped."""
+        if not self._inference_service:
+            return
+        sent, saved = InferenceService.request_stats()
+        text = f"Requests: {self._inference_service.queue_status().summary()}"
+        if sent or saved:
+            text += f" · {sent} inferences, {saved} duplicates coalesced"
+        text += f" · {self._inference_service.throughput_summary()}"
+        text += f" · {InferenceService.degeneration_summary()}"
+        self._request_stats_label.setText(text)
+    
     def _toggle_goat_sound(self, state: int) -> None:
         """Toggle goat sound on/off."""
         self._config.ui.goat_sound_enabled = (state == Qt.CheckState.Checked.value)
@@ -845,11 +998,15 @@ class MainWindow(QMainWindow):
         
         self._config = replace(self._config, bitnet=new_bitnet_config)
         
-        # Recreate services with new config
+        # Recreate services with new config (new clients first so a shared local worker stays up)
         if self._inference_service:
+            old_service = self._inference_service
             self._inference_service = InferenceService(new_bitnet_config)
+            old_service.close()
         if self._chat_service:
+            old_chat = self._chat_service
             self._chat_service = ChatService(new_bitnet_config)
+            old_chat.close()
         
         # Check status with new endpoint
         self._check_bitnet_status()
@@ -884,4 +1041,11 @@ class MainWindow(QMainWindow):
         if self._audio_service:
             self._audio_service.shutdown()
         
+        # Release backend clients (stops the local worker process if any)
+        if self._inference_service:
+            self._inference_service.close()
+        if self._chat_service:
+            self._chat_service.close()
+        InferenceService.release_model_cache()
+        
         event.accept()
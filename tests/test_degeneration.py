@@ -0,0 +1,94 @@
+"""Degeneration detector: realistic notes pass through, runaway output is cut."""
+
+from src.services.degeneration import (
+    DegenerationDetector,
+    REASON_LINE,
+    REASON_LOOP,
+    REASON_STOP,
+    REASON_WHITESPACE,
+)
+
+
+NOTE = """SUBJECTIVE:
+Chief complaint: follow-up for hypertension.
+- Denies pain.
+- Denies chest pain or shortness of breath.
+- Medication adherence: not discussed.
+
+Review of systems:
+- Cardiac: Denies pain.
+- Respiratory: Not discussed.
+- GI: Not discussed.
+- Not discussed.
+- Not discussed.
+- Not discussed.
+
+--------------------------------------------------------------------------------
+
+OBJECTIVE:
+- Vitals: Not discussed.
+- Exam: Not discussed.
+- Denies pain.
+
+| Test | Result | Test | Result |
+| ---- | ------ | ---- | ------ |
+| Na   | 140    | K    | 4.1    |
+
+ASSESSMENT:
+- Hypertension, stable. Not discussed.
+- Not discussed.
+
+PLAN:
+- Continue lisinopril 10 mg daily.
+- Denies pain.
+- Follow up in 3 months.
+"""
+
+
+def stream(detector, text, step=7):
+    """Feed text the way it streams in; return the first detection."""
+    for end in range(step, len(text) + step, step):
+        detection = detector.check(text[:end])
+        if detection is not None:
+            return detection
+    return None
+
+
+def test_realistic_note_passes_through():
+    assert stream(DegenerationDetector(), NOTE) is None
+
+
+def test_repeated_lines_in_different_sections_pass_through():
+    text = "".join(f"SECTION {i}:\n- Not discussed.\n- Denies pain.\n\n" for i in range(20))
+    assert stream(DegenerationDetector(), text) is None
+
+
+def test_consecutive_repeated_line_is_cut_after_first_copy():
+    head = "PLAN:\n"
+    line = "- Continue lisinopril 10 mg daily.\n"
+    detection = stream(DegenerationDetector(), head + line * 6, step=1)
+    assert detection is not None
+    assert detection.reason in (REASON_LINE, REASON_LOOP)
+    assert (head + line * 6)[:detection.keep].rstrip() == (head + line).rstrip()
+
+
+def test_long_loop_is_cut():
+    text = "Assessment: " + "the patient reports that the patient reports that " * 12
+    detection = stream(DegenerationDetector(), text)
+    assert detection is not None
+    assert detection.reason == REASON_LOOP
+    assert detection.keep < len(text)
+
+
+def test_stop_sequence_split_across_pieces():
+    detector = DegenerationDetector(stop=["</note>"])
+    assert detector.check("Plan: follow up.</no") is None
+    detection = detector.check("Plan: follow up.</note> trailing")
+    assert detection.reason == REASON_STOP
+    assert detection.keep == len("Plan: follow up.")
+
+
+def test_whitespace_run_is_cut():
+    detection = DegenerationDetector().check("Plan: follow up." + " " * 200)
+    assert detection.reason == REASON_WHITESPACE
+    assert detection.keep == len("Plan: follow up.")
@@ -0,0 +1,94 @@
+"""SDPA attention matches the eager implementation of the reference Bitnet model."""
+
+import importlib
+from pathlib import Path
+
+import pytest
+
+torch = pytest.importorskip("torch")
+pytest.importorskip("transformers")
+
+from src.infrastructure.local_backend import _import_model_package
+
+
+MODEL_DIR = Path(__file__).resolve().parent.parent / "bitnet_backend" / "models" / "bitnet_b1_58-large"
+PROMPT_LEN = 10
+DECODE_STEPS = 3
+
+
+@pytest.fixture(scope="module")
+def bitnet():
+    package = _import_model_package("bitnet_reference", MODEL_DIR)
+    configuration = importlib.import_module(f"{package}.configuration_bitnet")
+    modeling = importlib.import_module(f"{package}.modeling_bitnet")
+    return configuration, modeling
+
+
+def tiny_models(bitnet, num_key_value_heads):
+    """Eager and SDPA models with the same random weights."""
+    configuration, modeling = bitnet
+    config = configuration.BitnetConfig(
+        vocab_size=128,
+        hidden_size=64,
+        intermediate_size=128,
+        num_hidden_layers=2,
+        num_attention_heads=4,
+        num_key_value_heads=num_key_value_heads,
+        max_position_embeddings=32,
+        # a fine activation grid, so the kernels' float rounding cannot flip a quantization step
+        input_bits=24,
+    )
+    torch.manual_seed(0)
+    eager = modeling.BitnetForCausalLM._from_config(config, attn_implementation="eager", torch_dtype=torch.float32)
+    sdpa = modeling.BitnetForCausalLM._from_config(config, attn_implementation="sdpa", torch_dtype=torch.float32)
+    sdpa.load_state_dict(eager.state_dict())
+    return eager.eval(), sdpa.eval()
+
+
+def run_dynamic(model, input_ids):
+    """Prefill then greedy decode on the dynamic cache; last-position logits of every step."""
+    out = model(input_ids, use_cache=True)
+    logits = [out.logits[:, -1]]
+    for _ in range(DECODE_STEPS):
+        out = model(logits[-1].argmax(-1, keepdim=True), past_key_values=out.past_key_values, use_cache=True)
+        logits.append(out.logits[:, -1])
+    return torch.stack(logits, dim=1)
+
+
+def run_static(model, input_ids):
+    """Same as `run_dynamic` on a preallocated static cache."""
+    from transformers.cache_utils import StaticCache
+
+    model._setup_cache(StaticCache, input_ids.shape[0], max_cache_len=model.config.max_position_embeddings)
+    try:
+        out = model(input_ids, cache_position=torch.arange(PROMPT_LEN), use_cache=False)
+        logits = [out.logits[:, -1]]
+        for step in range(DECODE_STEPS):
+            next_ids = logits[-1].argmax(-1, keepdim=True)
+            out = model(next_ids, cache_position=torch.tensor([PROMPT_LEN + step]), use_cache=False)
+            logits.append(out.logits[:, -1])
+        return torch.stack(logits, dim=1)
+    finally:
+        model._reset_cache()
+
+
+@pytest.mark.parametrize("num_key_value_heads", [4, 2], ids=["mha", "gqa"])
+@pytest.mark.parametrize("runner", [run_dynamic, run_static], ids=["dynamic", "static"])
+@torch.no_grad()
+def test_sdpa_matches_eager(bitnet, num_key_value_heads, runner):
+    eager, sdpa = tiny_models(bitnet, num_key_value_heads)
+    input_ids = torch.randint(0, eager.config.vocab_size, (2, PROMPT_LEN))
+    torch.testing.assert_close(runner(sdpa, input_ids), runner(eager, input_ids), atol=1e-4, rtol=1e-4)
+
+
+@pytest.mark.parametrize("num_key_value_heads", [4, 2], ids=["mha", "gqa"])
+@torch.no_grad()
+def test_sdpa_without_mask_is_causal(bitnet, num_key_value_heads):
+    eager, sdpa = tiny_models(bitnet, num_key_value_heads)
+    hidden = torch.randn(2, PROMPT_LEN, eager.config.hidden_size)
+    position_ids = torch.arange(PROMPT_LEN)[None].expand(2, -1)
+    mask = torch.full((PROMPT_LEN, PROMPT_LEN), torch.finfo(torch.float32).min).triu(1)[None, None]
+
+    expected = eager.model.layers[0].self_attn(hidden, attention_mask=mask, position_ids=position_ids)[0]
+    actual = sdpa.model.layers[0].self_attn(hidden, attention_mask=None, position_ids=position_ids)[0]
+    torch.testing.assert_close(actual, expected, atol=1e-4, rtol=1e-4)
@@ -0,0 +1,41 @@
+"""sweep_launch.py builds its defaults with or without a setup_env.py CPU profile."""
+
+import importlib.util
+import os
+from pathlib import Path
+
+import pytest
+
+
+SCRIPT = Path(__file__).resolve().parent.parent / "bitnet_backend" / "utils" / "sweep_launch.py"
+
+
+@pytest.fixture(scope="module")
+def sweep_launch():
+    spec = importlib.util.spec_from_file_location("sweep_launch", SCRIPT)
+    module = importlib.util.module_from_spec(spec)
+    spec.loader.exec_module(module)
+    return module
+
+
+def test_parser_builds_without_profile(sweep_launch, tmp_path):
+    profile = sweep_launch.read_profile(tmp_path / "cpu_profile.env")
+    assert profile == {}
+
+    args = sweep_launch.build_parser(profile).parse_args([])
+    assert max(args.threads) == (os.cpu_count() or 4)
+
+    with pytest.raises(SystemExit) as exit_info:
+        sweep_launch.build_parser(profile).parse_args(["--help"])
+    assert exit_info.value.code == 0
+
+
+def test_default_threads_from_profile(sweep_launch, tmp_path):
+    path = tmp_path / "cpu_profile.env"
+    path.write_text(
+        "# written by setup_env.py\n"
+        "BITNET_PROFILE_LOGICAL_CPUS=12\n"
+        "BITNET_PROFILE_PERFORMANCE_CORES=6\n"
+        "BITNET_PROFILE_PHYSICAL_CORES=unknown\n"
+    )
+    assert sweep_launch.default_threads(sweep_launch.read_profile(path)) == [1, 2, 4, 6, 8, 12]